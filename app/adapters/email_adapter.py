@@ -1,10 +1,18 @@
+import os
 import smtplib
 from email.mime.text import MIMEText
 from ssl import create_default_context
 
+# Servidor SMTP; para pruebas locales puede apuntarse a un servidor como aiosmtpd (SMTP_SSL=false)
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_SSL = os.getenv("SMTP_SSL", "true").lower() == "true"
+
+
 class ExternalService:
     """Interfaz base para adaptadores externos."""
-    def enviar_correo(self, destinatario: str, asunto: str, mensaje: str):
+    def enviar_correo(self, destinatario: str, asunto: str, mensaje: str) -> bool:
+        """Retorna True si el correo se envió o quedó aceptado para enviarse."""
         raise NotImplementedError("Este método debe ser implementado por subclases")
 
 class EmailAdapter(ExternalService):
@@ -15,20 +23,33 @@ class EmailAdapter(ExternalService):
         self.sender_email = sender_email
         self.password = password
 
-    def enviar_correo(self, destinatario: str, asunto: str, mensaje: str):
+    def enviar_correo(self, destinatario: str, asunto: str, mensaje: str) -> bool:
         try:
-            # Configuración del mensaje
-            msg = MIMEText(mensaje)
-            msg["Subject"] = asunto
-            msg["From"] = self.sender_email
-            msg["To"] = destinatario
+            with self.conectar() as server:
+                self.enviar_con_conexion(server, destinatario, asunto, mensaje)
+            return True
+        except Exception as e:
+            print(f"Error al enviar correo: {str(e)}")
+            return False
 
+    def conectar(self) -> smtplib.SMTP:
+        """Abre una conexión SMTP autenticada que puede reutilizarse para varios correos."""
+        if SMTP_SSL:
             # Contexto SSL para la conexión segura
-            context = create_default_context()
+            server = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, context=create_default_context())
+        else:
+            server = smtplib.SMTP(SMTP_HOST, SMTP_PORT)
+        if self.password:
+            server.login(self.sender_email, self.password)
+        return server
 
-            with smtplib.SMTP_SSL("smtp.gmail.com", 465, context=context) as server:
-                server.login(self.sender_email, self.password)
-                server.sendmail(self.sender_email, destinatario, msg.as_string())
-                print(f"Correo enviado a {destinatario}")
-        except Exception as e:
-            print(f"Error al enviar correo: {str(e)}")
+    def enviar_con_conexion(self, server: smtplib.SMTP, destinatario: str, asunto: str, mensaje: str):
+        """Envía un correo usando una conexión ya abierta; propaga los errores SMTP."""
+        # Configuración del mensaje
+        msg = MIMEText(mensaje)
+        msg["Subject"] = asunto
+        msg["From"] = self.sender_email
+        msg["To"] = destinatario
+
+        server.sendmail(self.sender_email, destinatario, msg.as_string())
+        print(f"Correo enviado a {destinatario}")
@@ -0,0 +1,166 @@
+import queue
+import threading
+import time
+from typing import Hashable, Iterable, List, Optional
+from app.utils.metricas import Metrica
+from .email_adapter import EmailAdapter, ExternalService
+
+
+class ColaCorreos(ExternalService):
+    """
+    Adaptador que encola los correos y los envía desde un hilo en segundo plano.
+
+    El hilo reutiliza una sola conexión SMTP autenticada para enviar los correos por
+    lotes, reintenta con espera exponencial ante errores y cierra la conexión tras un
+    período de inactividad.
+    """
+
+    def __init__(
+        self,
+        adapter: EmailAdapter,
+        tamano_lote: int = 20,
+        max_reintentos: int = 5,
+        espera_base: float = 1.0,
+        inactividad: float = 30.0,
+        capacidad: int = 1000,
+    ):
+        self.adapter = adapter
+        self.tamano_lote = tamano_lote
+        self.max_reintentos = max_reintentos
+        self.espera_base = espera_base
+        self.inactividad = inactividad
+        self._cola: queue.Queue = queue.Queue(maxsize=capacidad)
+        self._hilo: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._servidor = None
+        self.enviados = 0
+        self.fallidos = 0
+        self.descartados = 0
+
+    def enviar_correo(self, destinatario: str, asunto: str, mensaje: str) -> bool:
+        """Encola el correo y retorna de inmediato; False si se descartó por estar la cola llena."""
+        self._iniciar()
+        try:
+            self._cola.put_nowait((destinatario, asunto, mensaje, 0))
+            return True
+        except queue.Full:
+            self.descartados += 1
+            print(f"Cola de correos llena, se descarta el correo a {destinatario}")
+            return False
+
+    def pendientes(self) -> int:
+        return self._cola.qsize()
+
+    def exportar_metricas(self) -> List[Metrica]:
+        return [
+            ("cola_correos_pending", "gauge", "Correos pendientes de enviar.", self.pendientes()),
+            ("cola_correos_capacity", "gauge", "Capacidad de la cola de correos.", self._cola.maxsize),
+            ("cola_correos_sent_total", "counter", "Correos enviados.", self.enviados),
+            ("cola_correos_failed_total", "counter", "Correos perdidos tras agotar los reintentos.", self.fallidos),
+            ("cola_correos_dropped_total", "counter", "Correos descartados por estar la cola llena.", self.descartados),
+        ]
+
+    def detener(self, timeout: float = 10.0):
+        """Envía los correos pendientes y detiene el hilo, esperando a lo sumo `timeout` segundos."""
+        if self._hilo is None:
+            return
+        limite = time.monotonic() + timeout
+        try:
+            self._cola.put(None, timeout=timeout)
+        except queue.Full:
+            print(f"No se pudo detener la cola de correos: sigue llena; se pierden {self.pendientes()} correos")
+        else:
+            self._hilo.join(max(0.0, limite - time.monotonic()))
+        self._hilo = None
+
+    def _iniciar(self):
+        if self._hilo is not None:
+            return
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._trabajar, name="cola-correos", daemon=True)
+                self._hilo.start()
+
+    def _trabajar(self):
+        while True:
+            try:
+                primero = self._cola.get(timeout=self.inactividad)
+            except queue.Empty:
+                self._cerrar_conexion()
+                continue
+
+            lote = [primero]
+            while len(lote) < self.tamano_lote:
+                try:
+                    lote.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+
+            detener = None in lote
+            self._enviar_lote([correo for correo in lote if correo is not None])
+            if detener:
+                self._cerrar_conexion()
+                return
+
+    def _enviar_lote(self, lote: List[tuple]):
+        pendientes = list(lote)
+        while pendientes:
+            destinatario, asunto, mensaje, intentos = pendientes[0]
+            try:
+                if self._servidor is None:
+                    self._servidor = self.adapter.conectar()
+                self.adapter.enviar_con_conexion(self._servidor, destinatario, asunto, mensaje)
+                self.enviados += 1
+                pendientes.pop(0)
+            except Exception as e:
+                self._cerrar_conexion()
+                if intentos + 1 >= self.max_reintentos:
+                    self.fallidos += 1
+                    print(f"Error al enviar correo a {destinatario} tras {intentos + 1} intentos: {str(e)}")
+                    pendientes.pop(0)
+                else:
+                    pendientes[0] = (destinatario, asunto, mensaje, intentos + 1)
+                    time.sleep(min(self.espera_base * (2 ** intentos), 60.0))
+
+    def _cerrar_conexion(self):
+        if self._servidor is not None:
+            try:
+                self._servidor.quit()
+            except Exception:
+                pass
+            self._servidor = None
+
+
+class VentanaDeduplicacion:
+    """
+    Recuerda claves recientes para no repetir alertas dentro de una ventana de tiempo.
+
+    `filtrar_nuevas` reserva las claves de forma atómica, para que dos pedidos
+    simultáneos no envíen la misma alerta; si la alerta no se pudo encolar, quien
+    la reservó debe llamar a `liberar` para que el próximo pedido la reintente.
+    """
+
+    def __init__(self, segundos: float):
+        self.segundos = segundos
+        self._vistas = {}
+        self._lock = threading.Lock()
+
+    def filtrar_nuevas(self, claves: Iterable[Hashable]) -> List[Hashable]:
+        """Devuelve las claves no vistas en la ventana y las reserva como vistas."""
+        ahora = time.monotonic()
+        nuevas = []
+        with self._lock:
+            for clave in claves:
+                vista = self._vistas.get(clave)
+                if vista is None or ahora - vista >= self.segundos:
+                    self._vistas[clave] = ahora
+                    nuevas.append(clave)
+            if len(self._vistas) > 10000:
+                self._vistas = {c: t for c, t in self._vistas.items() if ahora - t < self.segundos}
+        return nuevas
+
+    def liberar(self, claves: Iterable[Hashable]):
+        """Olvida las claves reservadas por una alerta que finalmente no se envió."""
+        with self._lock:
+            for clave in claves:
+                self._vistas.pop(clave, None)
@@ -0,0 +1,295 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+try:
+    import redis
+except ImportError:  # redis es opcional; solo se necesita con CACHE_BACKEND=redis
+    redis = None
+
+# Backend de caché: "memoria" (por proceso) o "redis" (compartido entre workers)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memoria").lower()
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+CACHE_PREFIJO = os.getenv("CACHE_PREFIJO", "restaurante")
+CACHE_MAX_ENTRADAS = int(os.getenv("CACHE_MAX_ENTRADAS", "10000"))
+CACHE_TTL_SEGUNDOS = float(os.getenv("CACHE_TTL_SEGUNDOS", "3600"))
+
+
+class CacheBackend:
+    """
+    Almacenamiento clave -> bytes compartido por las cachés de la aplicación, junto
+    con un canal para difundir invalidaciones a los demás procesos.
+
+    Cada caché conserva además sus estructuras en memoria; el backend es la segunda
+    capa y el medio por el que una escritura en un worker invalida a todos los demás.
+    """
+
+    def obtener(self, clave: str) -> Optional[bytes]:
+        raise NotImplementedError("Este método debe ser implementado por subclases")
+
+    def leer(self, clave: str) -> Optional[bytes]:
+        """Como obtener, pero lanza la excepción si el backend no responde."""
+        raise NotImplementedError("Este método debe ser implementado por subclases")
+
+    def guardar(self, clave: str, valor: bytes, ttl: Optional[float] = None):
+        raise NotImplementedError("Este método debe ser implementado por subclases")
+
+    def guardar_si_no_existe(self, clave: str, valor: bytes, ttl: Optional[float] = None) -> bool:
+        """
+        Guarda la clave solo si no existe, de forma atómica entre procesos; retorna si
+        se guardó. Lanza la excepción si el backend no responde.
+        """
+        raise NotImplementedError("Este método debe ser implementado por subclases")
+
+    def eliminar(self, claves: Iterable[str]):
+        raise NotImplementedError("Este método debe ser implementado por subclases")
+
+    def listar_vigencias(self, prefijo: str) -> Dict[str, float]:
+        """
+        Claves vigentes que comienzan con `prefijo` y los segundos que les quedan de
+        vida. Lanza la excepción si el backend no responde.
+        """
+        raise NotImplementedError("Este método debe ser implementado por subclases")
+
+    def difundir(self, cache: str, clave: Any = None):
+        """Avisa a los demás procesos que deben invalidar `clave` en la caché `cache`."""
+        raise NotImplementedError("Este método debe ser implementado por subclases")
+
+    def al_recibir(self, cache: str, manejador: Callable[[Any], None]):
+        """Registra la función que invalida localmente la caché `cache` al recibir un aviso."""
+        raise NotImplementedError("Este método debe ser implementado por subclases")
+
+    def al_suscribirse(self, callback: Callable[[], None]):
+        """
+        Registra una función a ejecutar cada vez que se (re)establece la suscripción
+        de invalidaciones, para recuperar los avisos que pudieron perderse.
+        """
+        raise NotImplementedError("Este método debe ser implementado por subclases")
+
+
+class MemoriaBackend(CacheBackend):
+    """
+    Backend en proceso, LRU con expiración. Sirve para un único worker y como
+    sustituto local en pruebas; no hay otros procesos a los que difundir.
+    """
+
+    def __init__(self, max_entradas: int = CACHE_MAX_ENTRADAS, ttl: float = CACHE_TTL_SEGUNDOS):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._entradas: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave: str) -> Optional[bytes]:
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            expira, valor = entrada
+            if expira <= time.monotonic():
+                del self._entradas[clave]
+                return None
+            self._entradas.move_to_end(clave)
+            return valor
+
+    def leer(self, clave: str) -> Optional[bytes]:
+        return self.obtener(clave)
+
+    def guardar(self, clave: str, valor: bytes, ttl: Optional[float] = None):
+        expira = time.monotonic() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._entradas[clave] = (expira, valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def guardar_si_no_existe(self, clave: str, valor: bytes, ttl: Optional[float] = None) -> bool:
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada[0] > time.monotonic():
+                return False
+        # Entre procesos no hay nada que coordinar; dentro del proceso basta el lock del llamador
+        self.guardar(clave, valor, ttl)
+        return True
+
+    def eliminar(self, claves: Iterable[str]):
+        with self._lock:
+            for clave in claves:
+                self._entradas.pop(clave, None)
+
+    def listar_vigencias(self, prefijo: str) -> Dict[str, float]:
+        ahora = time.monotonic()
+        with self._lock:
+            return {
+                clave: expira - ahora
+                for clave, (expira, _) in self._entradas.items()
+                if clave.startswith(prefijo) and expira > ahora
+            }
+
+    def difundir(self, cache: str, clave: Any = None):
+        pass
+
+    def al_recibir(self, cache: str, manejador: Callable[[Any], None]):
+        pass
+
+    def al_suscribirse(self, callback: Callable[[], None]):
+        pass
+
+
+class RedisBackend(CacheBackend):
+    """
+    Backend sobre el protocolo Redis, compartido entre workers.
+
+    Las invalidaciones se publican en un canal pub/sub; un hilo en segundo plano
+    las recibe y ejecuta el manejador local de cada caché, ignorando los avisos
+    publicados por el propio proceso. El cliente puede inyectarse (por ejemplo,
+    fakeredis en pruebas).
+    """
+
+    def __init__(self, cliente=None, url: str = REDIS_URL, prefijo: str = CACHE_PREFIJO, ttl: float = CACHE_TTL_SEGUNDOS):
+        if cliente is None:
+            if redis is None:
+                raise RuntimeError("CACHE_BACKEND=redis requiere el paquete 'redis'.")
+            cliente = redis.Redis.from_url(url)
+        self.cliente = cliente
+        self.prefijo = prefijo
+        self.ttl = ttl
+        self.canal = f"{prefijo}:invalidaciones"
+        self.origen = uuid.uuid4().hex
+        self._manejadores: Dict[str, Callable[[Any], None]] = {}
+        self._al_suscribirse: List[Callable[[], None]] = []
+        self._hilo: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _clave(self, clave: str) -> str:
+        return f"{self.prefijo}:{clave}"
+
+    def obtener(self, clave: str) -> Optional[bytes]:
+        try:
+            return self.cliente.get(self._clave(clave))
+        except Exception as e:
+            # Si Redis no responde, las cachés siguen funcionando con la base de datos
+            print(f"Error al leer la caché compartida: {str(e)}")
+            return None
+
+    def leer(self, clave: str) -> Optional[bytes]:
+        return self.cliente.get(self._clave(clave))
+
+    def guardar(self, clave: str, valor: bytes, ttl: Optional[float] = None):
+        try:
+            self.cliente.set(self._clave(clave), valor, px=int((ttl if ttl is not None else self.ttl) * 1000))
+        except Exception as e:
+            print(f"Error al escribir la caché compartida: {str(e)}")
+
+    def guardar_si_no_existe(self, clave: str, valor: bytes, ttl: Optional[float] = None) -> bool:
+        # SET NX: solo un proceso gana aunque varios lo intenten a la vez
+        milisegundos = max(1, int((ttl if ttl is not None else self.ttl) * 1000))
+        return bool(self.cliente.set(self._clave(clave), valor, px=milisegundos, nx=True))
+
+    def eliminar(self, claves: Iterable[str]):
+        claves = [self._clave(clave) for clave in claves]
+        if not claves:
+            return
+        try:
+            self.cliente.delete(*claves)
+        except Exception as e:
+            print(f"Error al eliminar de la caché compartida: {str(e)}")
+
+    def listar_vigencias(self, prefijo: str) -> Dict[str, float]:
+        # SCAN por lotes (no bloquea Redis como KEYS) y PTTL de cada lote en un pipeline
+        inicio = len(self._clave(""))
+        vigencias: Dict[str, float] = {}
+        lote: List = []
+        for clave in self.cliente.scan_iter(match=self._clave(prefijo) + "*", count=1000):
+            lote.append(clave)
+            if len(lote) >= 1000:
+                self._agregar_vigencias(lote, inicio, vigencias)
+                lote = []
+        self._agregar_vigencias(lote, inicio, vigencias)
+        return vigencias
+
+    def _agregar_vigencias(self, claves: List, inicio: int, vigencias: Dict[str, float]):
+        if not claves:
+            return
+        pipeline = self.cliente.pipeline(transaction=False)
+        for clave in claves:
+            pipeline.pttl(clave)
+        for clave, milisegundos in zip(claves, pipeline.execute()):
+            # -2: la clave venció entre SCAN y PTTL; -1: sin vencimiento
+            if milisegundos == -2:
+                continue
+            if isinstance(clave, bytes):
+                clave = clave.decode()
+            vigencias[clave[inicio:]] = milisegundos / 1000 if milisegundos >= 0 else self.ttl
+
+    def difundir(self, cache: str, clave: Any = None):
+        mensaje = json.dumps({"origen": self.origen, "cache": cache, "clave": clave})
+        try:
+            self.cliente.publish(self.canal, mensaje)
+        except Exception as e:
+            print(f"Error al difundir la invalidación de '{cache}': {str(e)}")
+
+    def al_recibir(self, cache: str, manejador: Callable[[Any], None]):
+        self._manejadores[cache] = manejador
+        self._iniciar()
+
+    def al_suscribirse(self, callback: Callable[[], None]):
+        self._al_suscribirse.append(callback)
+
+    def _iniciar(self):
+        if self._hilo is not None:
+            return
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._escuchar, name="cache-invalidaciones", daemon=True)
+                self._hilo.start()
+
+    def _escuchar(self):
+        espera = 1.0
+        while True:
+            try:
+                pubsub = self.cliente.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.canal)
+                espera = 1.0
+                # Los avisos publicados mientras no había suscripción se perdieron
+                for callback in self._al_suscribirse:
+                    try:
+                        callback()
+                    except Exception as e:
+                        print(f"Error al resincronizar tras la suscripción: {str(e)}")
+                for mensaje in pubsub.listen():
+                    if mensaje.get("type") == "message":
+                        self._despachar(mensaje["data"])
+            except Exception as e:
+                print(f"Error en la suscripción de invalidaciones: {str(e)}")
+            time.sleep(espera)
+            espera = min(espera * 2, 30.0)
+
+    def _despachar(self, datos):
+        try:
+            mensaje = json.loads(datos)
+        except (TypeError, ValueError):
+            return
+        if mensaje.get("origen") == self.origen:
+            return
+        manejador = self._manejadores.get(mensaje.get("cache"))
+        if manejador is not None:
+            try:
+                manejador(mensaje.get("clave"))
+            except Exception as e:
+                print(f"Error al invalidar la caché '{mensaje.get('cache')}': {str(e)}")
+
+
+def crear_backend() -> CacheBackend:
+    """Crea el backend configurado en CACHE_BACKEND."""
+    if CACHE_BACKEND == "redis":
+        return RedisBackend()
+    if CACHE_BACKEND == "memoria":
+        return MemoriaBackend()
+    raise ValueError(f"Backend de caché no válido: {CACHE_BACKEND}")
+
+
+cache_backend = crear_backend()
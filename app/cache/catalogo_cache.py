@@ -0,0 +1,87 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+from app.cache.backend import CacheBackend, cache_backend
+from app.cache.receta_cache import receta_cache
+
+# Catálogos conocidos, para poder invalidarlos todos también en el backend compartido
+CATALOGOS = ("productos", "categorias", "platos")
+# Segundos que un catálogo se conserva, en memoria y en el backend. Acota cuánto se
+# sirve un catálogo obsoleto si un worker guardó una lectura anterior a una
+# invalidación de otro proceso que todavía no le había llegado.
+CATALOGO_CACHE_TTL_SEGUNDOS = float(os.getenv("CATALOGO_CACHE_TTL_SEGUNDOS", "300"))
+
+
+class EntradaCatalogo:
+    """Respuesta de un catálogo ya serializada a JSON, con su ETag y su vencimiento."""
+
+    __slots__ = ("cuerpo", "etag", "vence")
+
+    def __init__(self, cuerpo: bytes, vence: float = float("inf")):
+        self.cuerpo = cuerpo
+        self.etag = '"' + hashlib.sha256(cuerpo).hexdigest()[:32] + '"'
+        self.vence = vence
+
+
+class CatalogoCache:
+    """
+    Caché de los listados de catálogo (productos, categorías, platos), en memoria y
+    en el backend compartido.
+
+    Guarda el cuerpo JSON ya serializado para que un acierto no consulte la base de
+    datos ni vuelva a serializar. Las fachadas invalidan el catálogo después de cada
+    escritura confirmada; además cada entrada vence a los `ttl` segundos.
+    """
+
+    def __init__(self, backend: CacheBackend = cache_backend, ttl: float = CATALOGO_CACHE_TTL_SEGUNDOS):
+        self._entradas: Dict[str, EntradaCatalogo] = {}
+        self._generaciones: Dict[str, int] = {}
+        self._generacion = 0
+        self._lock = threading.Lock()
+        self.backend = backend
+        self.ttl = ttl
+        backend.al_recibir("catalogo", lambda nombre: self.invalidar(nombre, difundir=False))
+
+    def obtener(self, nombre: str, cargar: Callable[[], bytes]) -> EntradaCatalogo:
+        """Devuelve el catálogo desde la caché o lo carga con `cargar`."""
+        entrada = self._entradas.get(nombre)
+        if entrada is not None and entrada.vence > time.monotonic():
+            return entrada
+
+        generacion = (self._generacion, self._generaciones.get(nombre, 0))
+        cuerpo = self.backend.obtener(f"catalogo:{nombre}")
+        compartido = cuerpo is not None
+        if not compartido:
+            cuerpo = cargar()
+        entrada = EntradaCatalogo(cuerpo, time.monotonic() + self.ttl)
+        with self._lock:
+            # No guardar una lectura que una invalidación concurrente ya dejó obsoleta
+            if generacion == (self._generacion, self._generaciones.get(nombre, 0)):
+                self._entradas[nombre] = entrada
+                if not compartido:
+                    self.backend.guardar(f"catalogo:{nombre}", cuerpo, ttl=self.ttl)
+        return entrada
+
+    def invalidar(self, nombre: Optional[str] = None, difundir: bool = True):
+        """
+        Elimina un catálogo de la caché y del backend compartido, o todos si no se
+        indica ninguno. Con `difundir` se avisa además a los demás procesos.
+        """
+        with self._lock:
+            if nombre is None:
+                self._generacion += 1
+                self._entradas.clear()
+            else:
+                self._generaciones[nombre] = self._generaciones.get(nombre, 0) + 1
+                self._entradas.pop(nombre, None)
+        self.backend.eliminar(f"catalogo:{actual}" for actual in ([nombre] if nombre else CATALOGOS))
+        if difundir:
+            self.backend.difundir("catalogo", nombre)
+
+
+catalogo_cache = CatalogoCache()
+
+# El listado de platos se arma a partir de las recetas
+receta_cache.al_invalidar(lambda: catalogo_cache.invalidar("platos", difundir=False))
@@ -0,0 +1,128 @@
+import threading
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.models.unidad_medida import ConversionUnidades
+from app.cache.backend import CacheBackend, cache_backend
+
+
+class ConversionCache:
+    """
+    Matriz de factores de conversión entre unidades de medida.
+
+    Se construye una sola vez a partir de ConversionUnidades e incluye los factores
+    inversos y transitivos (p. ej. kg -> g -> mg), de modo que cada conversión es una
+    búsqueda en memoria. Se invalida al confirmar cambios sobre ConversionUnidades.
+    """
+
+    def __init__(self, backend: CacheBackend = cache_backend):
+        self._matriz: Optional[Dict[int, Dict[int, float]]] = None
+        self._generacion = 0
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self.backend = backend
+        backend.al_recibir("conversion", lambda _: self.invalidar(difundir=False))
+
+    def factor(self, db: Session, id_unidad_origen: int, id_unidad_destino: int) -> Optional[float]:
+        """Factor para convertir de origen a destino, o None si no existe camino."""
+        if id_unidad_origen == id_unidad_destino:
+            return 1.0
+        return self._obtener_matriz(db).get(id_unidad_origen, {}).get(id_unidad_destino)
+
+    def convertir(self, db: Session, cantidad, id_unidad_origen: int, id_unidad_destino: int) -> float:
+        """Convierte una cantidad entre unidades."""
+        factor = self.factor(db, id_unidad_origen, id_unidad_destino)
+        if factor is None:
+            raise ValueError(f"No existe factor de conversión entre las unidades {id_unidad_origen} y {id_unidad_destino}")
+        return float(cantidad) * factor
+
+    def convertir_lote(self, db: Session, conversiones: Iterable[Tuple[float, int, int]]) -> List[float]:
+        """Convierte un lote de tripletas (cantidad, unidad_origen, unidad_destino)."""
+        matriz = self._obtener_matriz(db)
+        resultado = []
+        for cantidad, origen, destino in conversiones:
+            factor = 1.0 if origen == destino else matriz.get(origen, {}).get(destino)
+            if factor is None:
+                raise ValueError(f"No existe factor de conversión entre las unidades {origen} y {destino}")
+            resultado.append(float(cantidad) * factor)
+        return resultado
+
+    def invalidar(self, difundir: bool = True):
+        """Descarta la matriz (en todos los procesos si `difundir`); se reconstruye en la siguiente consulta."""
+        with self._lock:
+            self._generacion += 1
+            self._matriz = None
+        for callback in self._callbacks:
+            callback()
+        if difundir:
+            self.backend.difundir("conversion")
+
+    def al_invalidar(self, callback: Callable[[], None]):
+        """Registra una función a ejecutar cuando cambian las conversiones."""
+        self._callbacks.append(callback)
+
+    def _obtener_matriz(self, db: Session) -> Dict[int, Dict[int, float]]:
+        matriz = self._matriz
+        if matriz is None:
+            generacion = self._generacion
+            conversiones = db.query(
+                ConversionUnidades.id_unidad_base,
+                ConversionUnidades.id_unidad_convertida,
+                ConversionUnidades.factor_conversion,
+            ).all()
+            matriz = self._construir_matriz(conversiones)
+            with self._lock:
+                # No guardar una matriz que una invalidación concurrente ya dejó obsoleta;
+                # se usa para esta consulta y la siguiente la reconstruye
+                if generacion == self._generacion:
+                    self._matriz = matriz
+        return matriz
+
+    @staticmethod
+    def _construir_matriz(conversiones) -> Dict[int, Dict[int, float]]:
+        """
+        Calcula el cierre transitivo del grafo de conversiones. Los factores registrados
+        explícitamente tienen prioridad sobre los inversos calculados.
+        """
+        aristas: Dict[int, Dict[int, float]] = {}
+        for origen, destino, factor in conversiones:
+            factor = float(factor)
+            if factor <= 0:
+                continue
+            aristas.setdefault(origen, {})[destino] = factor
+        for origen, destinos in list(aristas.items()):
+            for destino, factor in destinos.items():
+                aristas.setdefault(destino, {}).setdefault(origen, 1.0 / factor)
+
+        matriz = {}
+        for origen in aristas:
+            alcanzables = {origen: 1.0}
+            pendientes = deque([origen])
+            while pendientes:
+                actual = pendientes.popleft()
+                for vecino, factor in aristas.get(actual, {}).items():
+                    if vecino not in alcanzables:
+                        alcanzables[vecino] = alcanzables[actual] * factor
+                        pendientes.append(vecino)
+            matriz[origen] = alcanzables
+        return matriz
+
+
+conversion_cache = ConversionCache()
+
+
+@event.listens_for(ConversionUnidades, "after_insert")
+@event.listens_for(ConversionUnidades, "after_update")
+@event.listens_for(ConversionUnidades, "after_delete")
+def _marcar_conversiones_modificadas(mapper, connection, target):
+    """Marca la sesión para invalidar la matriz cuando se confirme la transacción."""
+    sesion = Session.object_session(target)
+    if sesion is not None:
+        sesion.info["conversiones_modificadas"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_tras_commit(sesion):
+    if sesion.info.pop("conversiones_modificadas", False):
+        conversion_cache.invalidar()
@@ -0,0 +1,53 @@
+import os
+import threading
+import time
+from typing import Dict, List, Tuple
+from sqlalchemy.orm import Session
+from app.models.rol import Rol
+from app.models.usuario import Usuario
+
+# Segundos que se conserva la lista de destinatarios de un rol antes de volver a consultarla
+DESTINATARIOS_TTL_SEGUNDOS = float(os.getenv("DESTINATARIOS_TTL_SEGUNDOS", "300"))
+
+
+class DestinatariosCache:
+    """
+    Caché en proceso de nombre de rol -> correos de sus usuarios, con expiración.
+
+    Se usa para las alertas que se envían tras cada pedido; los cambios de usuarios
+    la invalidan, y la expiración cubre los cambios hechos fuera de la aplicación.
+    """
+
+    def __init__(self, ttl: float = DESTINATARIOS_TTL_SEGUNDOS):
+        self.ttl = ttl
+        self._correos: Dict[str, Tuple[float, List[str]]] = {}
+        self._generacion = 0
+        self._lock = threading.Lock()
+
+    def obtener(self, db: Session, nombre_rol: str) -> List[str]:
+        """Devuelve los correos de los usuarios del rol; una lista vacía si el rol no existe."""
+        ahora = time.monotonic()
+        entrada = self._correos.get(nombre_rol)
+        if entrada is not None and entrada[0] > ahora:
+            return entrada[1]
+
+        generacion = self._generacion
+        correos = [
+            email for (email,) in db.query(Usuario.email)
+            .join(Rol, Rol.id_rol == Usuario.id_rol)
+            .filter(Rol.nombre == nombre_rol)
+            .all()
+        ]
+        with self._lock:
+            # No guardar una lectura que una invalidación concurrente ya dejó obsoleta
+            if generacion == self._generacion:
+                self._correos[nombre_rol] = (ahora + self.ttl, correos)
+        return correos
+
+    def invalidar(self):
+        with self._lock:
+            self._generacion += 1
+            self._correos.clear()
+
+
+destinatarios_cache = DestinatariosCache()
@@ -0,0 +1,136 @@
+import math
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from app.models.inventario import Inventario
+from app.cache.backend import CacheBackend, cache_backend
+from app.cache.receta_cache import receta_cache
+
+
+class _VistaSucursal:
+    """Stock, porciones preparables e índice producto -> platos de una sucursal."""
+    __slots__ = ("recetas", "stock", "porciones", "platos_por_producto", "resultado")
+
+    def __init__(self, stock: Dict[int, float], recetas: dict):
+        self.recetas = recetas
+        self.stock = stock
+        self.porciones: Dict[int, int] = {}
+        self.platos_por_producto: Dict[int, set] = defaultdict(set)
+        self.resultado: Optional[List[dict]] = None
+        for receta in recetas.values():
+            for id_producto in receta.id_productos:
+                self.platos_por_producto[id_producto].add(receta.id_plato)
+
+
+class DisponibilidadCache:
+    """
+    Índice por sucursal de las porciones preparables de cada plato.
+
+    Se calcula una vez por sucursal a partir del inventario y de la caché de recetas,
+    y luego se mantiene de forma incremental: cada cambio de inventario recalcula solo
+    los platos que usan los productos modificados.
+    """
+
+    def __init__(self, backend: CacheBackend = cache_backend):
+        self._vistas: Dict[int, _VistaSucursal] = {}
+        self._generaciones: Dict[int, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        # Los demás procesos no conocen el cambio exacto: descartan la vista de la sucursal
+        self.backend = backend
+        backend.al_recibir("disponibilidad", lambda id_sucursal: self.invalidar(id_sucursal, difundir=False))
+
+    def listar_preparables(self, db: Session, id_sucursal: int) -> List[dict]:
+        """Platos con al menos una porción preparable en la sucursal."""
+        vista = self._vistas.get(id_sucursal)
+        if vista is None:
+            vista = self._construir(db, id_sucursal)
+
+        resultado = vista.resultado
+        if resultado is None:
+            resultado = [
+                {"id_plato": id_plato, "nombre": vista.recetas[id_plato].nombre, "cantidad_preparable": porciones}
+                for id_plato, porciones in sorted(vista.porciones.items())
+                if porciones > 0
+            ]
+            vista.resultado = resultado
+        return resultado
+
+    def aplicar_cambios(self, id_sucursal: int, cambios: Dict[int, float]):
+        """Suma a la existencia de cada producto la cantidad indicada (positiva o negativa)."""
+        with self._lock:
+            self._generaciones[id_sucursal] += 1
+            vista = self._vistas.get(id_sucursal)
+            if vista is not None:
+                for id_producto, cantidad in cambios.items():
+                    vista.stock[id_producto] = vista.stock.get(id_producto, 0.0) + float(cantidad)
+                self._recalcular(vista, cambios.keys())
+        self.backend.difundir("disponibilidad", id_sucursal)
+
+    def establecer_stock(self, id_sucursal: int, existencias: Dict[int, float]):
+        """Fija la existencia de cada producto indicado."""
+        with self._lock:
+            self._generaciones[id_sucursal] += 1
+            vista = self._vistas.get(id_sucursal)
+            if vista is not None:
+                for id_producto, cantidad in existencias.items():
+                    vista.stock[id_producto] = float(cantidad)
+                self._recalcular(vista, existencias.keys())
+        self.backend.difundir("disponibilidad", id_sucursal)
+
+    def invalidar(self, id_sucursal: Optional[int] = None, difundir: bool = True):
+        """Descarta la vista de una sucursal, o de todas (en todos los procesos si `difundir`)."""
+        with self._lock:
+            if id_sucursal is None:
+                for id_vista in self._generaciones:
+                    self._generaciones[id_vista] += 1
+                self._vistas.clear()
+            else:
+                self._generaciones[id_sucursal] += 1
+                self._vistas.pop(id_sucursal, None)
+        if difundir:
+            self.backend.difundir("disponibilidad", id_sucursal)
+
+    def _construir(self, db: Session, id_sucursal: int) -> _VistaSucursal:
+        generacion = self._generaciones[id_sucursal]
+        recetas = receta_cache.obtener_todas(db)
+        inventario = (
+            db.query(Inventario.id_producto, Inventario.cantidad_disponible)
+            .filter(Inventario.id_sucursal == id_sucursal)
+            .all()
+        )
+        vista = _VistaSucursal({i.id_producto: float(i.cantidad_disponible) for i in inventario}, recetas)
+        for receta in recetas.values():
+            if len(receta):
+                vista.porciones[receta.id_plato] = self._porciones(receta, vista.stock)
+
+        # Si el inventario cambió mientras se construía, la vista se usa pero no se guarda
+        with self._lock:
+            if generacion == self._generaciones[id_sucursal]:
+                self._vistas[id_sucursal] = vista
+        return vista
+
+    def _recalcular(self, vista: _VistaSucursal, ids_producto):
+        afectados = set()
+        for id_producto in ids_producto:
+            afectados |= vista.platos_por_producto.get(id_producto, set())
+        if not afectados:
+            return
+        for id_plato in afectados:
+            vista.porciones[id_plato] = self._porciones(vista.recetas[id_plato], vista.stock)
+        vista.resultado = None
+
+    @staticmethod
+    def _porciones(receta, stock: Dict[int, float]) -> int:
+        porciones = math.inf
+        for id_producto, cantidad_base in receta.ingredientes_base():
+            if math.isnan(cantidad_base) or cantidad_base <= 0:
+                return 0
+            porciones = min(porciones, stock.get(id_producto, 0.0) / cantidad_base)
+        return max(int(math.floor(porciones)), 0) if porciones != math.inf else 0
+
+
+disponibilidad_cache = DisponibilidadCache()
+
+# Si cambia una receta, los índices de todas las sucursales se reconstruyen
+receta_cache.al_invalidar(lambda: disponibilidad_cache.invalidar(difundir=False))
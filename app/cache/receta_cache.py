@@ -0,0 +1,193 @@
+import math
+import threading
+from array import array
+from typing import Callable, Dict, Iterable, List, Optional
+from sqlalchemy.orm import Session
+from app.models.plato import Plato, PlatoProducto
+from app.models.producto import Producto
+from app.cache.backend import CacheBackend, cache_backend
+from app.cache.conversion_cache import conversion_cache
+from app.utils.metricas import Metrica, registro_metricas
+
+
+class Receta:
+    """
+    Lista de ingredientes de un plato en forma compacta.
+
+    Cada ingrediente ocupa una posición en arreglos paralelos: producto, cantidad y
+    unidad tal como se registraron, y la cantidad convertida a la unidad del producto
+    (NaN si no existe factor de conversión).
+    """
+    __slots__ = ("id_plato", "nombre", "descripcion", "precio", "id_productos", "cantidades", "id_unidades", "cantidades_base")
+
+    def __init__(self, id_plato: int, nombre: str, descripcion: Optional[str], precio: float):
+        self.id_plato = id_plato
+        self.nombre = nombre
+        self.descripcion = descripcion
+        self.precio = precio
+        self.id_productos = array("l")
+        self.cantidades = array("d")
+        self.id_unidades = array("l")
+        self.cantidades_base = array("d")
+
+    def agregar_ingrediente(self, id_producto: int, cantidad: float, id_unidad: int, cantidad_base: float):
+        self.id_productos.append(id_producto)
+        self.cantidades.append(cantidad)
+        self.id_unidades.append(id_unidad)
+        self.cantidades_base.append(cantidad_base)
+
+    def __len__(self):
+        return len(self.id_productos)
+
+    def ingredientes_base(self):
+        """Itera (id_producto, cantidad en la unidad del producto)."""
+        return zip(self.id_productos, self.cantidades_base)
+
+    def como_respuesta(self) -> dict:
+        """Formatea la receta con el esquema PlatoResponse."""
+        return {
+            "id_plato": self.id_plato,
+            "nombre": self.nombre,
+            "descripcion": self.descripcion,
+            "precio": self.precio,
+            "ingredientes": [
+                {"id_producto": id_producto, "cantidad": cantidad, "id_unidad_medida": id_unidad}
+                for id_producto, cantidad, id_unidad in zip(self.id_productos, self.cantidades, self.id_unidades)
+            ],
+        }
+
+
+class RecetaCache:
+    """
+    Caché en proceso de las recetas (Plato + PlatoProducto).
+
+    Se carga bajo demanda y se invalida desde PlatoFacade cuando cambia un plato; la
+    invalidación se difunde a los demás procesos por el backend de caché.
+    """
+
+    def __init__(self, backend: CacheBackend = cache_backend):
+        self._recetas: Dict[int, Receta] = {}
+        self._completa = False
+        self._generacion = 0
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self.aciertos = 0
+        self.fallos = 0
+        self.backend = backend
+        backend.al_recibir("receta", lambda id_plato: self.invalidar(id_plato, difundir=False))
+
+    def obtener(self, db: Session, ids_plato: Iterable[int]) -> Dict[int, Receta]:
+        """Devuelve las recetas de los platos indicados; los que no existen se omiten."""
+        recetas = {}
+        faltantes = []
+        for id_plato in set(ids_plato):
+            receta = self._recetas.get(id_plato)
+            if receta is None:
+                faltantes.append(id_plato)
+            else:
+                recetas[id_plato] = receta
+
+        self.aciertos += len(recetas)
+        if faltantes:
+            self.fallos += len(faltantes)
+            recetas.update(self._cargar(db, faltantes))
+        return recetas
+
+    def obtener_todas(self, db: Session) -> Dict[int, Receta]:
+        """Devuelve las recetas de todo el menú."""
+        if self._completa:
+            self.aciertos += 1
+            return dict(self._recetas)
+
+        self.fallos += 1
+        generacion = self._generacion
+        recetas = self._cargar(db, None)
+        with self._lock:
+            if generacion == self._generacion:
+                self._completa = True
+        return recetas
+
+    def invalidar(self, id_plato: Optional[int] = None, difundir: bool = True):
+        """
+        Elimina la receta de un plato, o todas si no se indica ninguno. Con `difundir`
+        se avisa además a los demás procesos.
+        """
+        with self._lock:
+            if id_plato is None:
+                self._recetas.clear()
+            else:
+                self._recetas.pop(id_plato, None)
+            self._completa = False
+            self._generacion += 1
+        for callback in self._callbacks:
+            callback()
+        if difundir:
+            self.backend.difundir("receta", id_plato)
+
+    def al_invalidar(self, callback: Callable[[], None]):
+        """Registra una función a ejecutar cuando se invalida alguna receta."""
+        self._callbacks.append(callback)
+
+    def estadisticas(self) -> dict:
+        """Contadores de aciertos y fallos para monitoreo."""
+        total = self.aciertos + self.fallos
+        return {
+            "recetas": len(self._recetas),
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": self.aciertos / total if total else 0.0,
+        }
+
+    def exportar_metricas(self) -> List[Metrica]:
+        return [
+            ("receta_cache_entries", "gauge", "Recetas en caché.", len(self._recetas)),
+            ("receta_cache_hits_total", "counter", "Aciertos de la caché de recetas.", self.aciertos),
+            ("receta_cache_misses_total", "counter", "Fallos de la caché de recetas.", self.fallos),
+        ]
+
+    def _cargar(self, db: Session, ids_plato: Optional[list]) -> Dict[int, Receta]:
+        """Carga las recetas indicadas (o todas) con dos consultas y las guarda en caché."""
+        generacion = self._generacion
+        consulta_platos = db.query(Plato.id_plato, Plato.nombre, Plato.descripcion, Plato.precio)
+        consulta_ingredientes = (
+            db.query(
+                PlatoProducto.id_plato,
+                PlatoProducto.id_producto,
+                PlatoProducto.cantidad,
+                PlatoProducto.id_unidad_medida,
+                Producto.id_unidad_medida.label("id_unidad_producto"),
+            )
+            .join(Producto, Producto.id_producto == PlatoProducto.id_producto)
+        )
+        if ids_plato is not None:
+            consulta_platos = consulta_platos.filter(Plato.id_plato.in_(ids_plato))
+            consulta_ingredientes = consulta_ingredientes.filter(PlatoProducto.id_plato.in_(ids_plato))
+
+        recetas = {
+            plato.id_plato: Receta(plato.id_plato, plato.nombre, plato.descripcion, float(plato.precio))
+            for plato in consulta_platos.all()
+        }
+
+        for ingrediente in consulta_ingredientes.all():
+            receta = recetas.get(ingrediente.id_plato)
+            if receta is None:
+                continue
+            cantidad = float(ingrediente.cantidad)
+            factor = conversion_cache.factor(db, ingrediente.id_unidad_medida, ingrediente.id_unidad_producto)
+            cantidad_base = cantidad * factor if factor is not None else math.nan
+            receta.agregar_ingrediente(
+                ingrediente.id_producto, cantidad, ingrediente.id_unidad_medida, cantidad_base
+            )
+
+        # Si hubo una invalidación durante la carga, no se guarda un resultado posiblemente obsoleto
+        with self._lock:
+            if generacion == self._generacion:
+                self._recetas.update(recetas)
+        return recetas
+
+
+receta_cache = RecetaCache()
+registro_metricas.registrar_exportador(receta_cache.exportar_metricas)
+
+# Las recetas guardan cantidades ya convertidas: se recalculan si cambian las conversiones
+conversion_cache.al_invalidar(lambda: receta_cache.invalidar(difundir=False))
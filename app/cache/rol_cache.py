@@ -0,0 +1,84 @@
+import json
+import os
+import threading
+import time
+from typing import Optional, Tuple
+from app.cache.backend import CacheBackend, cache_backend
+
+# Segundos que un rol se conserva en memoria; acota cuánto dura una entrada obsoleta
+# si se perdió un aviso de invalidación (p. ej. durante una reconexión a Redis)
+ROL_CACHE_TTL_SEGUNDOS = float(os.getenv("ROL_CACHE_TTL_SEGUNDOS", "60"))
+
+
+class RolCache:
+    """
+    Caché de rol -> (versión, permisos), en memoria y en el backend compartido.
+
+    La versión del rol se incrementa cada vez que cambian sus permisos, lo que
+    permite validar los permisos firmados en el token sin consultar la base de datos.
+    Las entradas en memoria vencen a los `ttl` segundos y se vuelven a leer del backend.
+    """
+
+    def __init__(self, backend: CacheBackend = cache_backend, ttl: float = ROL_CACHE_TTL_SEGUNDOS):
+        self._roles = {}
+        self._lock = threading.Lock()
+        self.backend = backend
+        self.ttl = ttl
+        backend.al_recibir("rol", self._invalidar_local)
+
+    def obtener(self, id_rol: int) -> Optional[Tuple[int, frozenset]]:
+        """Devuelve (versión, permisos) del rol o None si no está en caché."""
+        local = self._roles.get(id_rol)
+        if local is not None and local[2] > time.monotonic():
+            return local[0], local[1]
+        entrada = None
+        datos = self.backend.obtener(f"rol:{id_rol}")
+        if datos is not None:
+            datos = json.loads(datos)
+            entrada = (datos["version"], frozenset(datos["permisos"]))
+            self._guardar_local(id_rol, *entrada)
+        elif local is not None:
+            self._invalidar_local(id_rol)
+        return entrada
+
+    def guardar(self, id_rol: int, version: int, permisos: frozenset):
+        """
+        Guarda la versión y los permisos de un rol, sin retroceder de versión. Se llama
+        en cada petición autenticada: el backend solo se escribe si la versión cambió
+        o la entrada local no estaba vigente.
+        """
+        if self._guardar_local(id_rol, version, permisos):
+            datos = json.dumps({"version": version, "permisos": sorted(permisos)})
+            self.backend.guardar(f"rol:{id_rol}", datos.encode())
+
+    def invalidar(self, id_rol: Optional[int] = None):
+        """Elimina un rol de la caché, o todos si no se indica ninguno, en todos los procesos."""
+        claves = [id_rol] if id_rol is not None else list(self._roles)
+        self._invalidar_local(id_rol)
+        self.backend.eliminar(f"rol:{clave}" for clave in claves)
+        self.backend.difundir("rol", id_rol)
+
+    def _guardar_local(self, id_rol: int, version: int, permisos: frozenset) -> bool:
+        """
+        Guarda el rol en memoria. Retorna True solo si la entrada es nueva, había
+        vencido o la versión es más reciente, es decir, si hay que escribirla en el
+        backend; con la misma versión solo se renueva el vencimiento local.
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            actual = self._roles.get(id_rol)
+            vigente = actual is not None and actual[2] > ahora
+            if vigente and actual[0] > version:
+                return False
+            self._roles[id_rol] = (version, permisos, ahora + self.ttl)
+            return not vigente or actual[0] < version
+
+    def _invalidar_local(self, id_rol: Optional[int] = None):
+        with self._lock:
+            if id_rol is None:
+                self._roles.clear()
+            else:
+                self._roles.pop(id_rol, None)
+
+
+rol_cache = RolCache()
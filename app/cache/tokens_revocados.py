@@ -0,0 +1,114 @@
+import threading
+import time
+from typing import Dict, List, Optional
+from app.cache.backend import CacheBackend, cache_backend
+from app.utils.metricas import Metrica, registro_metricas
+
+# Segundos entre purgas de las entradas ya vencidas
+PURGA_INTERVALO_SEGUNDOS = 60.0
+# Segundos entre intentos de leer la instantánea compartida mientras no se haya podido
+SINCRONIZACION_REINTENTO_SEGUNDOS = 5.0
+
+
+class RevocacionNoDisponibleError(RuntimeError):
+    """La lista de revocación todavía no pudo leerse del backend compartido."""
+
+
+class TokensRevocados:
+    """
+    Lista de revocación de tokens JWT por su claim jti, con vencimiento.
+
+    Cada entrada se conserva solo hasta el vencimiento (exp) del token revocado: a
+    partir de ahí el token ya es rechazado por expirado. La consulta es una búsqueda
+    en un diccionario en memoria, sin acceder a la base de datos ni al backend.
+
+    Con un backend compartido, cada revocación se registra con SET NX en la clave
+    `revocado:{jti}`, que vence junto con el token (lo que hace atómica la rotación
+    de refresh tokens entre procesos), y se difunde a los demás procesos. Al arrancar
+    y cada vez que se restablece la suscripción de invalidaciones, la lista se
+    reconstruye recorriendo esas claves con SCAN. Mientras no se haya podido leer,
+    la consulta falla cerrada (RevocacionNoDisponibleError) en lugar de aceptar
+    tokens que otro proceso pudo haber revocado; la lectura se reintenta cada
+    SINCRONIZACION_REINTENTO_SEGUNDOS y cada fallo queda en el log.
+    """
+
+    PREFIJO = "revocado:"
+
+    def __init__(self, backend: CacheBackend = cache_backend):
+        self._revocados: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._ultima_purga = time.time()
+        self._sincronizado = False
+        self._proximo_intento = 0.0
+        self.backend = backend
+        backend.al_recibir("tokens_revocados", lambda datos: self._agregar(datos["jti"], datos["exp"]))
+        backend.al_suscribirse(self._sincronizar)
+
+    def esta_revocado(self, jti: Optional[str]) -> bool:
+        """
+        Indica si el token fue revocado. Lanza RevocacionNoDisponibleError si la lista
+        aún no se pudo leer del backend.
+        """
+        if not self._sincronizado:
+            if time.monotonic() >= self._proximo_intento:
+                self._sincronizar()
+            if not self._sincronizado:
+                raise RevocacionNoDisponibleError("No se pudo verificar si el token fue revocado. Intente nuevamente.")
+        if jti is None:
+            return False
+        expira = self._revocados.get(jti)
+        return expira is not None and expira > time.time()
+
+    def revocar(self, jti: str, expira: float) -> bool:
+        """
+        Revoca el token `jti` hasta `expira` (epoch en segundos), en todos los procesos.
+        Retorna False si ya estaba revocado, aquí o en otro proceso: la verificación y
+        la revocación son un único paso atómico.
+        """
+        ahora = time.time()
+        if expira <= ahora:
+            return False
+        with self._lock:
+            vigente = self._revocados.get(jti)
+            if vigente is not None and vigente > ahora:
+                return False
+            self._revocados[jti] = expira
+        try:
+            if not self.backend.guardar_si_no_existe(self.PREFIJO + jti, b"1", ttl=expira - ahora):
+                return False
+        except Exception as e:
+            # Sin backend la revocación sigue siendo atómica dentro de este proceso
+            print(f"Error al registrar la revocación de {jti} en la caché compartida: {str(e)}")
+        self.backend.difundir("tokens_revocados", {"jti": jti, "exp": expira})
+        return True
+
+    def __len__(self):
+        return len(self._revocados)
+
+    def exportar_metricas(self) -> List[Metrica]:
+        return [("revoked_tokens", "gauge", "Tokens revocados aún vigentes en la lista de revocación.", len(self))]
+
+    def _agregar(self, jti: str, expira: float):
+        ahora = time.time()
+        with self._lock:
+            self._revocados[jti] = expira
+            if ahora - self._ultima_purga >= PURGA_INTERVALO_SEGUNDOS:
+                self._ultima_purga = ahora
+                self._revocados = {clave: vence for clave, vence in self._revocados.items() if vence > ahora}
+
+    def _sincronizar(self):
+        """Incorpora las revocaciones del backend; solo se da por sincronizada si se pudo leer."""
+        try:
+            vigencias = self.backend.listar_vigencias(self.PREFIJO)
+        except Exception as e:
+            self._proximo_intento = time.monotonic() + SINCRONIZACION_REINTENTO_SEGUNDOS
+            print(f"No se pudo leer la lista de tokens revocados; las revocaciones previas no se conocen aún: {str(e)}")
+            return
+        ahora = time.time()
+        for clave, segundos in vigencias.items():
+            self._agregar(clave[len(self.PREFIJO):], ahora + segundos)
+        self._sincronizado = True
+
+
+tokens_revocados = TokensRevocados()
+registro_metricas.registrar_exportador(tokens_revocados.exportar_metricas)
@@ -0,0 +1,21 @@
+"""
+Recalcula los totales materializados (total, cantidad_items) de los pedidos existentes.
+
+Uso: python -m app.commands.recalcular_totales_pedidos
+"""
+from app.adapters.email_adapter import ExternalService
+from app.facades.pedido_facade import PedidoFacade
+from app.utils.database import DatabaseManager
+
+
+def main():
+    db = DatabaseManager.get_instance().SessionLocal()
+    try:
+        actualizados = PedidoFacade(db, ExternalService()).recalcular_totales()
+        print(f"Pedidos actualizados: {actualizados}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
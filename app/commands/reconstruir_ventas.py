@@ -0,0 +1,26 @@
+"""
+Reconstruye el resumen de ventas (VentaResumen) a partir de los pedidos.
+
+Uso: python -m app.commands.reconstruir_ventas [--desde 2024-01-01]
+"""
+import argparse
+from datetime import datetime
+from app.managers.ventas_manager import VentasManager
+from app.utils.database import DatabaseManager
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruye el resumen de ventas.")
+    parser.add_argument("--desde", type=datetime.fromisoformat, default=None, help="Reconstruir solo desde esta fecha (ISO 8601).")
+    argumentos = parser.parse_args()
+
+    db = DatabaseManager.get_instance().SessionLocal()
+    try:
+        filas = VentasManager(db).reconstruir(argumentos.desde)
+        print(f"Filas de resumen escritas: {filas}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from app.models.usuario import Usuario
 from app.models.rol import Rol
@@ -5,6 +6,7 @@ from app.models.permiso import Permiso
 
 from app.schemas.user_schema import UsuarioCreate, UsuarioResponse, RolBase
 from app.managers.seguridad_manager import SeguridadManager
+from app.cache.rol_cache import rol_cache
 
 
 class AdministrationFacade:
@@ -43,6 +45,10 @@ class AdministrationFacade:
             permission = self.db.query(Permiso).get(perm_id)
             if permission:
                 role.permisos.append(permission)
+        # Nueva versión del rol: los tokens emitidos antes dejan de ser confiables. El
+        # incremento se hace en SQL para no perder versiones con asignaciones simultáneas
+        self.db.execute(update(Rol).where(Rol.id_rol == role_id).values(version=Rol.version + 1))
         self.db.commit()
+        rol_cache.invalidar(role_id)
         return {"message": f"Permisos asignados al rol '{role.nombre}'."}
 
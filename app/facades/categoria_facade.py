@@ -1,7 +1,11 @@
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import NoResultFound
-from app.models import CategoriaProducto
-from app.schemas import CategoriaCreate
+from app.models import CategoriaProducto, Inventario, PlatoProducto, Producto
+from app.schemas import CategoriaCreate, CategoriaResponse
+from app.cache.catalogo_cache import catalogo_cache, EntradaCatalogo
+from app.cache.disponibilidad_cache import disponibilidad_cache
+from app.cache.receta_cache import receta_cache
+from app.utils.respuestas import serializar_lista
 
 class CategoriaFacade:
     def __init__(self, db: Session):
@@ -12,6 +16,7 @@ class CategoriaFacade:
         categoria = CategoriaProducto(nombre=categoria_data.nombre)
         self.db.add(categoria)
         self.db.commit()
+        catalogo_cache.invalidar("categorias")
         self.db.refresh(categoria)
         return categoria
 
@@ -19,6 +24,12 @@ class CategoriaFacade:
         """Lista todas las categorías."""
         return self.db.query(CategoriaProducto).all()
 
+    def listar_categorias_catalogo(self) -> EntradaCatalogo:
+        """Lista todas las categorías ya serializadas, desde la caché de catálogo."""
+        return catalogo_cache.obtener(
+            "categorias", lambda: serializar_lista(CategoriaResponse, self.listar_categorias())
+        )
+
     def obtener_categoria(self, id_categoria: int):
         """Obtiene una categoría por su ID."""
         categoria = self.db.query(CategoriaProducto).filter_by(id_categoria=id_categoria).first()
@@ -31,12 +42,25 @@ class CategoriaFacade:
         categoria = self.obtener_categoria(id_categoria)
         categoria.nombre = categoria_data.nombre
         self.db.commit()
+        catalogo_cache.invalidar("categorias")
         self.db.refresh(categoria)
         return categoria
 
     def eliminar_categoria(self, id_categoria: int):
-        """Elimina una categoría."""
+        """
+        Elimina una categoría. Sus productos se eliminan en cascada, por lo que también
+        se invalidan el catálogo de productos y las recetas y la disponibilidad que los usan.
+        """
         categoria = self.obtener_categoria(id_categoria)
+        productos = self.db.query(Producto.id_producto).filter(Producto.id_categoria == id_categoria)
+        platos = {id_plato for (id_plato,) in self.db.query(PlatoProducto.id_plato).filter(PlatoProducto.id_producto.in_(productos))}
+        sucursales = {id_sucursal for (id_sucursal,) in self.db.query(Inventario.id_sucursal).filter(Inventario.id_producto.in_(productos)).distinct()}
         self.db.delete(categoria)
         self.db.commit()
+        catalogo_cache.invalidar("categorias")
+        catalogo_cache.invalidar("productos")
+        for id_plato in platos:
+            receta_cache.invalidar(id_plato)
+        for id_sucursal in sucursales:
+            disponibilidad_cache.invalidar(id_sucursal)
         return {"message": f"Categoría con ID {id_categoria} eliminada exitosamente."}
@@ -1,18 +1,93 @@
+import asyncio
+import csv
+import io
+import json
+import math
+import os
+import random
+import time
+from collections import defaultdict
+from sqlalchemy import bindparam, func, insert, update
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy.exc import SQLAlchemyError
-from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from sqlalchemy.orm.exc import StaleDataError
+from typing import Awaitable, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
 from app.models.inventario import Inventario
-from app.models.plato import PlatoProducto
 from app.models.producto import Producto
+from app.models.sucursal import Sucursal
+from app.models.categoria_producto import CategoriaProducto
+from app.models.unidad_medida import UnidadMedida
+from app.schemas import RecepcionItem
 from datetime import datetime
-from app.models import ConversionUnidades
+from app.cache.receta_cache import receta_cache
+from app.cache.conversion_cache import conversion_cache
+from app.cache.disponibilidad_cache import disponibilidad_cache
+
+# Reintentos ante conflictos de concurrencia sobre una fila de inventario
+INVENTARIO_MAX_REINTENTOS = int(os.getenv("INVENTARIO_MAX_REINTENTOS", "5"))
+
+# Errores de MySQL que indican un conflicto de bloqueo: espera agotada e interbloqueo
+ERRORES_BLOQUEO = (1205, 1213)
+
+# Columnas obligatorias del archivo de conteo de inventario
+COLUMNAS_CONTEO = ("id_sucursal", "id_producto", "cantidad_disponible")
+
+T = TypeVar("T")
+
+
+def _espera_reintento(intento: int) -> float:
+    """Espera exponencial con variación aleatoria, para que las estaciones no choquen de nuevo."""
+    return random.uniform(0, 0.01 * (2 ** intento))
+
+
+def _esperar_reintento(intento: int):
+    time.sleep(_espera_reintento(intento))
+
+
+class ConflictoInventarioError(ValueError):
+    """Otra transacción modificó el inventario mientras se aplicaba la operación."""
+
+
+def _es_conflicto_de_bloqueo(error: OperationalError) -> bool:
+    argumentos = getattr(error.orig, "args", ())
+    return bool(argumentos) and argumentos[0] in ERRORES_BLOQUEO
+
+
+async def con_reintentos_async(operacion: Callable[[], Awaitable[T]]) -> T:
+    """
+    Reintenta una operación asíncrona (típicamente un run_sync) ante un
+    ConflictoInventarioError, esperando con asyncio.sleep: run_sync se ejecuta en el
+    hilo del event loop, por lo que ahí no se puede dormir con time.sleep.
+    """
+    for intento in range(INVENTARIO_MAX_REINTENTOS):
+        try:
+            return await operacion()
+        except ConflictoInventarioError:
+            if intento + 1 == INVENTARIO_MAX_REINTENTOS:
+                raise
+            await asyncio.sleep(_espera_reintento(intento))
+
+
+class InventarioInsuficienteError(ValueError):
+    """Inventario insuficiente para un pedido; incluye el detalle de los productos faltantes."""
+    def __init__(self, faltantes: List[dict]):
+        self.faltantes = faltantes
+        detalle = ", ".join(
+            f"{f['nombre']} (disponible: {f['cantidad_disponible']}, requerido: {f['cantidad_requerida']})"
+            for f in faltantes
+        )
+        super().__init__(f"No hay suficiente inventario para: {detalle}")
 
 
 class InventarioFacade:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, reintentar: bool = True):
+        # Con reintentar=False (uso desde run_sync) un conflicto se propaga como
+        # ConflictoInventarioError para reintentarlo sin bloquear el event loop
         self.db = db
+        self.reintentar = reintentar
 
-    def crear_inventario(self, id_producto: int, id_sucursal: int, cantidad_disponible: int, cantidad_maxima: int):
+    def crear_inventario(self, id_producto: int, id_sucursal: int, cantidad_disponible: int, cantidad_maxima: int, umbral_stock_bajo: Optional[int] = None):
         """Crea un registro de inventario."""
         try:
             inventario = Inventario(
@@ -20,28 +95,38 @@ class InventarioFacade:
                 id_sucursal=id_sucursal,
                 cantidad_disponible=cantidad_disponible,
                 cantidad_maxima=cantidad_maxima,
+                umbral_stock_bajo=umbral_stock_bajo,
                 fecha_ultima_actualizacion=datetime.utcnow()
             )
             self.db.add(inventario)
             self.db.commit()
+            disponibilidad_cache.establecer_stock(id_sucursal, {id_producto: cantidad_disponible})
             return inventario
         except SQLAlchemyError as e:
             self.db.rollback()
             raise ValueError(f"Error al crear inventario: {str(e)}")
 
-    def actualizar_inventario(self, id_inventario: int, cantidad_disponible: Optional[int] = None, cantidad_maxima: Optional[int] = None):
+    def actualizar_inventario(self, id_inventario: int, cantidad_disponible: Optional[int] = None, cantidad_maxima: Optional[int] = None, umbral_stock_bajo: Optional[int] = None):
         """Actualiza un registro de inventario."""
-        inventario = self.db.query(Inventario).filter_by(id_inventario=id_inventario).first()
-        if not inventario:
-            raise ValueError("El registro de inventario no existe.")
+        def actualizar() -> Inventario:
+            inventario = self.db.query(Inventario).filter_by(id_inventario=id_inventario).first()
+            if not inventario:
+                raise ValueError("El registro de inventario no existe.")
+
+            if cantidad_disponible is not None:
+                inventario.cantidad_disponible = cantidad_disponible
+            if cantidad_maxima is not None:
+                inventario.cantidad_maxima = cantidad_maxima
+            if umbral_stock_bajo is not None:
+                inventario.umbral_stock_bajo = umbral_stock_bajo
+
+            inventario.fecha_ultima_actualizacion = datetime.utcnow()
+            self.db.commit()
+            return inventario
 
+        inventario = self._con_reintentos(actualizar)
         if cantidad_disponible is not None:
-            inventario.cantidad_disponible = cantidad_disponible
-        if cantidad_maxima is not None:
-            inventario.cantidad_maxima = cantidad_maxima
-
-        inventario.fecha_ultima_actualizacion = datetime.utcnow()
-        self.db.commit()
+            disponibilidad_cache.establecer_stock(inventario.id_sucursal, {inventario.id_producto: cantidad_disponible})
         return inventario
 
     def obtener_inventario_por_sucursal(self, id_sucursal: int):
@@ -54,88 +139,275 @@ class InventarioFacade:
 
     def eliminar_inventario(self, id_inventario: int):
         """Elimina un registro de inventario."""
-        inventario = self.db.query(Inventario).filter_by(id_inventario=id_inventario).first()
-        if not inventario:
-            raise ValueError("El registro de inventario no existe.")
+        def eliminar() -> tuple:
+            inventario = self.db.query(Inventario).filter_by(id_inventario=id_inventario).first()
+            if not inventario:
+                raise ValueError("El registro de inventario no existe.")
 
-        self.db.delete(inventario)
-        self.db.commit()
+            claves = (inventario.id_sucursal, inventario.id_producto)
+            self.db.delete(inventario)
+            self.db.commit()
+            return claves
 
+        id_sucursal, id_producto = self._con_reintentos(eliminar)
+        disponibilidad_cache.establecer_stock(id_sucursal, {id_producto: 0})
 
-    def verificar_stock_bajo(self, id_sucursal: int):
-        """Verifica el stock bajo de una sucursal."""
-        productos_bajo_stock = self.db.query(Inventario).filter(
-            Inventario.id_sucursal == id_sucursal,
-            Inventario.cantidad_disponible <= (Inventario.cantidad_maxima * 0.25)
-        ).all()
+
+    def verificar_stock_bajo(self, id_sucursal: int, ids_producto: Optional[Iterable[int]] = None):
+        """
+        Verifica el stock bajo de una sucursal.
+
+        Si se indican productos, solo se evalúan esas filas (por el índice único
+        producto-sucursal), de modo que el costo depende del pedido y no del catálogo.
+        """
+        umbral = func.coalesce(Inventario.umbral_stock_bajo, Inventario.cantidad_maxima * 0.25)
+        consulta = (
+            self.db.query(Inventario.id_producto, Inventario.cantidad_disponible, Inventario.cantidad_maxima, Producto.nombre)
+            .join(Producto, Producto.id_producto == Inventario.id_producto)
+            .filter(Inventario.id_sucursal == id_sucursal, Inventario.cantidad_disponible <= umbral)
+        )
+        if ids_producto is not None:
+            ids_producto = list(ids_producto)
+            if not ids_producto:
+                return []
+            consulta = consulta.filter(Inventario.id_producto.in_(ids_producto))
 
         return [
             {
                 "id_producto": p.id_producto,
+                "nombre": p.nombre,
                 "cantidad_disponible": p.cantidad_disponible,
                 "cantidad_maxima": p.cantidad_maxima
             }
-            for p in productos_bajo_stock
+            for p in consulta.all()
         ]
-        
-    def convertir_unidades(self, cantidad, id_unidad_origen: int, id_unidad_destino: int) -> float:
-        if id_unidad_origen == id_unidad_destino:
-            return float(cantidad)
 
-        conversion = self.db.query(ConversionUnidades).filter_by(
-            id_unidad_base=id_unidad_origen,
-            id_unidad_convertida=id_unidad_destino
-        ).first()
+    def convertir_unidades(self, cantidad, id_unidad_origen: int, id_unidad_destino: int) -> float:
+        """Convierte una cantidad entre unidades usando la matriz de conversiones en memoria."""
+        return conversion_cache.convertir(self.db, cantidad, id_unidad_origen, id_unidad_destino)
 
-        if not conversion:
-            raise ValueError(f"No existe factor de conversión entre las unidades {id_unidad_origen} y {id_unidad_destino}")
+    def convertir_unidades_lote(self, conversiones: List[tuple]) -> List[float]:
+        """Convierte un lote de tripletas (cantidad, unidad_origen, unidad_destino)."""
+        return conversion_cache.convertir_lote(self.db, conversiones)
 
-        return float(cantidad) * float(conversion.factor_conversion)
+    def ajustar_inventario_por_pedido(self, id_sucursal: int, detalles_pedido: List[dict]) -> Dict[int, float]:
+        """
+        Descuenta del inventario de la sucursal los ingredientes de un pedido.
 
+        Calcula el requerimiento total por producto (en la unidad del producto) y lo
+        descuenta con una actualización atómica condicionada por producto. Si el stock
+        no alcanza se deshace la transacción completa. Devuelve el requerimiento
+        aplicado por producto.
+        """
+        requerimientos = self._calcular_requerimientos(detalles_pedido)
+        self._descontar_inventario(id_sucursal, requerimientos)
+        self.db.commit()
+        disponibilidad_cache.aplicar_cambios(
+            id_sucursal, {id_producto: -cantidad for id_producto, cantidad in requerimientos.items()}
+        )
+        return requerimientos
 
+    def _calcular_requerimientos(self, detalles_pedido: List[dict]) -> Dict[int, float]:
+        """
+        Calcula la cantidad requerida de cada producto para un pedido, agregando el mismo
+        producto entre platos. Las recetas ya convertidas a la unidad del producto se
+        toman de la caché de recetas.
+        """
+        cantidades_plato = defaultdict(int)
+        for detalle in detalles_pedido:
+            cantidades_plato[detalle["id_plato"]] += detalle["cantidad"]
 
-    
-    def ajustar_inventario_por_pedido(self, id_sucursal: int, detalles_pedido: List[dict]):
+        recetas = receta_cache.obtener(self.db, cantidades_plato.keys())
 
-        for detalle in detalles_pedido:
-            ingredientes = self.db.query(PlatoProducto).filter_by(id_plato=detalle["id_plato"]).all()
+        requerimientos = defaultdict(float)
+        for id_plato, cantidad_plato in cantidades_plato.items():
+            receta = recetas.get(id_plato)
+            if not receta:
+                raise ValueError(f"El plato con ID {id_plato} no tiene ingredientes asociados.")
 
-            if not ingredientes:
-                raise ValueError(f"El plato con ID {detalle['id_plato']} no tiene ingredientes asociados.")
-            for ingrediente in ingredientes:
-                producto = self.db.query(Producto).filter_by(id_producto=ingrediente.id_producto).first()
+            for id_producto, cantidad_base in receta.ingredientes_base():
+                if math.isnan(cantidad_base):
+                    raise ValueError(f"No existe factor de conversión para el producto con ID {id_producto} en el plato {id_plato}")
+                requerimientos[id_producto] += cantidad_plato * cantidad_base
 
-                if not producto:
-                    raise ValueError(f"El producto con ID {ingrediente.id_producto} no existe.")
-                
-                inventario = self.db.query(Inventario).filter_by(
-                    id_producto=ingrediente.id_producto,
-                    id_sucursal=id_sucursal
-                ).first()
+        return dict(requerimientos)
 
-                if not inventario:
-                    raise ValueError(f"No hay inventario para el producto con ID {ingrediente.id_producto} en la sucursal {id_sucursal}")
+    def _descontar_inventario(self, id_sucursal: int, requerimientos: Dict[int, float]):
+        """
+        Descuenta los requerimientos con un UPDATE atómico por producto
+        (cantidad_disponible - requerido, version + 1), condicionado a que la existencia
+        alcance, sin bloquear las filas de antemano.
+
+        En InnoDB el UPDATE evalúa la condición sobre la versión confirmada de la fila y
+        espera a las demás escrituras sobre ella: una fila no actualizada significa que
+        el stock no alcanza (o que no hay inventario), nunca un conflicto pasajero.
+        En ese caso se deshace la transacción completa de quien llama (incluido, por
+        ejemplo, el cambio de estado del pedido) y se lanza InventarioInsuficienteError.
+        Un interbloqueo o una espera de bloqueo agotada se lanza como
+        ConflictoInventarioError: solo tiene sentido reintentar la transacción completa.
+        """
+        if not requerimientos:
+            return
+
+        tabla = Inventario.__table__
+        sentencia = (
+            update(tabla)
+            .where(
+                tabla.c.id_sucursal == id_sucursal,
+                tabla.c.id_producto == bindparam("b_id_producto"),
+                tabla.c.cantidad_disponible >= bindparam("b_cantidad"),
+            )
+            .values(
+                cantidad_disponible=tabla.c.cantidad_disponible - bindparam("b_cantidad"),
+                version=tabla.c.version + 1,
+                fecha_ultima_actualizacion=datetime.utcnow(),
+            )
+        )
+        # Siempre en el mismo orden, para que dos pedidos no se bloqueen mutuamente
+        parametros = [
+            {"b_id_producto": id_producto, "b_cantidad": cantidad}
+            for id_producto, cantidad in sorted(requerimientos.items())
+        ]
 
-                cantidad_requerida = float(detalle["cantidad"]) * float(ingrediente.cantidad)
+        try:
+            actualizadas = self._filas_actualizadas(sentencia, parametros)
+        except OperationalError as e:
+            self.db.rollback()
+            if _es_conflicto_de_bloqueo(e):
+                raise ConflictoInventarioError("El inventario cambió mientras se procesaba el pedido. Intente nuevamente.") from e
+            raise
+        if actualizadas == len(parametros):
+            return
+
+        self._verificar_existencias(id_sucursal, requerimientos)
+        # No debería ocurrir: las filas quedaron bloqueadas por el UPDATE
+        self.db.rollback()
+        raise ConflictoInventarioError("El inventario cambió mientras se procesaba el pedido. Intente nuevamente.")
+
+    def _filas_actualizadas(self, sentencia, parametros: List[dict]) -> int:
+        """Ejecuta la sentencia para cada juego de parámetros y devuelve las filas afectadas."""
+        if self.db.get_bind().dialect.supports_sane_multi_rowcount:
+            return self.db.execute(sentencia, parametros).rowcount
+        return sum(self.db.execute(sentencia, parametro).rowcount for parametro in parametros)
+
+    def _verificar_existencias(self, id_sucursal: int, requerimientos: Dict[int, float]):
+        """
+        Lanza el error correspondiente si algún producto no tiene inventario o no alcanza,
+        deshaciendo la transacción. La lectura es con bloqueo (FOR UPDATE) para ver los
+        valores vigentes y no la instantánea de la transacción.
+        """
+        inventarios = (
+            self.db.query(Inventario.id_producto, Inventario.cantidad_disponible, Producto.nombre)
+            .join(Producto, Producto.id_producto == Inventario.id_producto)
+            .filter(Inventario.id_sucursal == id_sucursal, Inventario.id_producto.in_(requerimientos.keys()))
+            .with_for_update(of=Inventario)
+            .all()
+        )
+        por_producto = {inventario.id_producto: inventario for inventario in inventarios}
 
+        for id_producto in requerimientos:
+            if id_producto not in por_producto:
+                self.db.rollback()
+                raise ValueError(f"No hay inventario para el producto con ID {id_producto} en la sucursal {id_sucursal}")
 
+        faltantes = [
+            {
+                "id_producto": id_producto,
+                "nombre": por_producto[id_producto].nombre,
+                "cantidad_disponible": por_producto[id_producto].cantidad_disponible,
+                "cantidad_requerida": cantidad,
+            }
+            for id_producto, cantidad in requerimientos.items()
+            if por_producto[id_producto].cantidad_disponible < cantidad
+        ]
+        if faltantes:
+            self.db.rollback()
+            raise InventarioInsuficienteError(faltantes)
 
-                cantidad_convertida = self.convertir_unidades(
-                    cantidad=cantidad_requerida,
-                    id_unidad_origen=ingrediente.id_unidad_medida,
-                    id_unidad_destino=producto.id_unidad_medida
-                )
-                
-                if inventario.cantidad_disponible < cantidad_convertida:
-                    raise ValueError(f"No hay suficiente inventario para el producto {producto.nombre}. Disponible: {inventario.cantidad_disponible}, Requerido: {cantidad_convertida}")
+    def _con_reintentos(self, operacion: Callable[[], T]) -> T:
+        """
+        Ejecuta una modificación ORM de Inventario y la reintenta si otra transacción
+        cambió la fila entre la lectura y la escritura (versión obsoleta).
+        """
+        intentos = INVENTARIO_MAX_REINTENTOS if self.reintentar else 1
+        for intento in range(intentos):
+            try:
+                return operacion()
+            except StaleDataError:
+                self.db.rollback()
+                if intento + 1 < intentos:
+                    _esperar_reintento(intento)
+        raise ConflictoInventarioError("El inventario cambió mientras se actualizaba. Intente nuevamente.")
+
+    def valorizar_inventario(self, id_sucursal: Optional[int] = None) -> dict:
+        """
+        Valoriza el inventario de una sucursal, o de todas si no se indica ninguna.
 
-                # Descontar del inventario
-                inventario.cantidad_disponible -= cantidad_convertida
+        Una sola consulta une producto, unidad, categoría y sucursal, calcula el costo
+        de cada línea y, con funciones de ventana, el subtotal por categoría, el total
+        por sucursal y el total general. Aquí solo se agrupan las filas ya calculadas.
+        """
+        costo = (Inventario.cantidad_disponible * Producto.precio).label("costo_total")
+        consulta = (
+            self.db.query(
+                Inventario.id_inventario,
+                Inventario.id_sucursal,
+                Sucursal.nombre.label("sucursal"),
+                Inventario.id_producto,
+                Producto.nombre.label("producto"),
+                UnidadMedida.nombre.label("unidad_medida"),
+                Producto.precio,
+                Inventario.cantidad_disponible,
+                CategoriaProducto.id_categoria,
+                CategoriaProducto.nombre.label("categoria"),
+                costo,
+                func.sum(costo).over(partition_by=(Inventario.id_sucursal, CategoriaProducto.id_categoria)).label("subtotal_categoria"),
+                func.sum(costo).over(partition_by=Inventario.id_sucursal).label("total_sucursal"),
+                func.sum(costo).over().label("total_general"),
+            )
+            .join(Producto, Producto.id_producto == Inventario.id_producto)
+            .join(Sucursal, Sucursal.id_sucursal == Inventario.id_sucursal)
+            .outerjoin(UnidadMedida, UnidadMedida.id_unidad == Producto.id_unidad_medida)
+            .outerjoin(CategoriaProducto, CategoriaProducto.id_categoria == Producto.id_categoria)
+        )
+        if id_sucursal is not None:
+            consulta = consulta.filter(Inventario.id_sucursal == id_sucursal)
+        filas = consulta.order_by(Inventario.id_sucursal, CategoriaProducto.nombre, Producto.nombre).all()
+
+        sucursales = {}
+        for fila in filas:
+            sucursal = sucursales.get(fila.id_sucursal)
+            if sucursal is None:
+                sucursal = sucursales[fila.id_sucursal] = {
+                    "id_sucursal": fila.id_sucursal,
+                    "nombre": fila.sucursal,
+                    "total": fila.total_sucursal,
+                    "categorias": {},
+                }
+            categoria = sucursal["categorias"].get(fila.id_categoria)
+            if categoria is None:
+                categoria = sucursal["categorias"][fila.id_categoria] = {
+                    "id_categoria": fila.id_categoria,
+                    "nombre": fila.categoria,
+                    "subtotal": fila.subtotal_categoria,
+                    "productos": [],
+                }
+            categoria["productos"].append({
+                "id_inventario": fila.id_inventario,
+                "id_producto": fila.id_producto,
+                "nombre": fila.producto,
+                "unidad_medida": fila.unidad_medida,
+                "precio": fila.precio,
+                "cantidad_disponible": fila.cantidad_disponible,
+                "costo_total": fila.costo_total,
+            })
 
-        # Mover el commit fuera de los bucles
-        self.db.commit()
-        
-    
+        for sucursal in sucursales.values():
+            sucursal["categorias"] = list(sucursal["categorias"].values())
+        return {
+            "total_general": filas[0].total_general if filas else 0,
+            "sucursales": list(sucursales.values()),
+        }
 
     def obtener_inventario_con_detalles(self, id_sucursal: int):
         """
@@ -143,7 +415,7 @@ class InventarioFacade:
         """
         inventario = (
             self.db.query(Inventario)
-            .options(joinedload(Inventario.producto))  # Cargar detalles de producto
+            .options(joinedload(Inventario.producto).joinedload(Producto.unidad))  # Cargar producto y su unidad en la misma consulta
             .filter(Inventario.id_sucursal == id_sucursal)
             .all()
         )
@@ -158,6 +430,7 @@ class InventarioFacade:
                 "id_sucursal": item.id_sucursal,
                 "cantidad_disponible": item.cantidad_disponible,
                 "cantidad_maxima": item.cantidad_maxima,
+                "umbral_stock_bajo": item.umbral_stock_bajo,
                 "fecha_ultima_actualizacion": item.fecha_ultima_actualizacion,
                 "producto": {
                     "nombre": producto.nombre,
@@ -175,7 +448,7 @@ class InventarioFacade:
         """
         inventario = (
             self.db.query(Inventario)
-            .options(joinedload(Inventario.producto))  # Cargar detalles de producto
+            .options(joinedload(Inventario.producto).joinedload(Producto.unidad))  # Cargar producto y su unidad en la misma consulta
             .filter(Inventario.id_inventario == id_inventario)
             .first()
         )
@@ -191,6 +464,7 @@ class InventarioFacade:
             "id_sucursal": inventario.id_sucursal,
             "cantidad_disponible": inventario.cantidad_disponible,
             "cantidad_maxima": inventario.cantidad_maxima,
+            "umbral_stock_bajo": inventario.umbral_stock_bajo,
             "fecha_ultima_actualizacion": inventario.fecha_ultima_actualizacion,
             "producto": {
                 "nombre": producto.nombre,
@@ -202,15 +476,26 @@ class InventarioFacade:
         
     def recepcionar_unidades(self, id_inventario: int, cantidad: int):
         """
-        Incrementa la cantidad disponible en el inventario.
+        Incrementa la cantidad disponible en el inventario con un UPDATE atómico
+        (cantidad_disponible + cantidad), sin leer la fila antes.
         """
-        inventario = self.db.query(Inventario).filter(Inventario.id_inventario == id_inventario).first()
-        if not inventario:
+        tabla = Inventario.__table__
+        resultado = self.db.execute(
+            update(tabla)
+            .where(tabla.c.id_inventario == id_inventario)
+            .values(
+                cantidad_disponible=tabla.c.cantidad_disponible + cantidad,
+                version=tabla.c.version + 1,
+                fecha_ultima_actualizacion=datetime.utcnow(),
+            )
+        )
+        if resultado.rowcount == 0:
+            self.db.rollback()
             raise ValueError(f"Inventario con ID {id_inventario} no encontrado.")
-
-        inventario.cantidad_disponible += cantidad
-        inventario.fecha_ultima_actualizacion = datetime.utcnow()
         self.db.commit()
+
+        inventario = self.db.query(Inventario).filter(Inventario.id_inventario == id_inventario).first()
+        disponibilidad_cache.aplicar_cambios(inventario.id_sucursal, {inventario.id_producto: cantidad})
         # Retornar el inventario actualizado con los datos completos
         return {
             "id_inventario": inventario.id_inventario,
@@ -218,9 +503,230 @@ class InventarioFacade:
             "id_sucursal": inventario.id_sucursal,
             "cantidad_disponible": inventario.cantidad_disponible,
             "cantidad_maxima": inventario.cantidad_maxima,
+            "umbral_stock_bajo": inventario.umbral_stock_bajo,
             "fecha_ultima_actualizacion": inventario.fecha_ultima_actualizacion,
         }
 
+    def recepcionar_lote(self, id_sucursal: int, items: List[RecepcionItem]) -> dict:
+        """
+        Recepciona varios productos en una sucursal en una sola transacción.
 
+        Los productos se validan contra el inventario de la sucursal, leído en una sola
+        consulta, y los válidos se incrementan con un UPDATE atómico ejecutado por lotes.
+        Devuelve un reporte por ítem.
+        """
+        existentes = self._inventarios_existentes({id_sucursal}, {item.id_producto for item in items})
+
+        resultados, parametros = [], []
+        for indice, item in enumerate(items):
+            resultado = {"indice": indice, "id_sucursal": id_sucursal, "id_producto": item.id_producto, "accion": None, "error": None}
+            if (id_sucursal, item.id_producto) not in existentes:
+                resultado["error"] = f"No hay inventario para el producto con ID {item.id_producto} en la sucursal {id_sucursal}"
+            else:
+                resultado["accion"] = "recepcionado"
+                parametros.append({"b_id_sucursal": id_sucursal, "b_id_producto": item.id_producto, "b_cantidad": item.cantidad})
+            resultados.append(resultado)
+
+        if parametros:
+            tabla = Inventario.__table__
+            self.db.execute(
+                update(tabla)
+                .where(
+                    tabla.c.id_sucursal == bindparam("b_id_sucursal"),
+                    tabla.c.id_producto == bindparam("b_id_producto"),
+                )
+                .values(
+                    cantidad_disponible=tabla.c.cantidad_disponible + bindparam("b_cantidad"),
+                    version=tabla.c.version + 1,
+                    fecha_ultima_actualizacion=datetime.utcnow(),
+                ),
+                parametros,
+            )
+            self.db.commit()
+
+            cambios = defaultdict(float)
+            for parametro in parametros:
+                cambios[parametro["b_id_producto"]] += parametro["b_cantidad"]
+            disponibilidad_cache.aplicar_cambios(id_sucursal, dict(cambios))
+
+        return _reporte_lote(resultados)
+
+    def importar_conteo(self, filas: Iterable, max_filas: Optional[int] = None) -> dict:
+        """
+        Aplica un conteo físico de inventario (id_sucursal, id_producto, cantidad_disponible
+        y opcionalmente cantidad_maxima) en una sola transacción.
+
+        Las filas se recorren una vez; sucursales, productos e inventarios existentes se
+        validan contra conjuntos precargados. Los inventarios existentes se actualizan
+        por lotes y los nuevos (que requieren cantidad_maxima) se insertan por lotes.
+        Devuelve un reporte por fila.
+        """
+        resultados = {}
+        conteos = {}
+        for indice, fila in enumerate(filas):
+            if max_filas is not None and indice >= max_filas:
+                raise ValueError(f"El conteo no puede superar {max_filas} filas.")
+            try:
+                registro = _registro_conteo(fila)
+            except (TypeError, ValueError) as e:
+                resultados[indice] = {"indice": indice, "error": str(e)}
+                continue
+
+            clave = (registro["id_sucursal"], registro["id_producto"])
+            if clave in conteos:
+                resultados[indice] = {"indice": indice, "id_sucursal": clave[0], "id_producto": clave[1], "error": f"Producto repetido; ya aparece en la fila {conteos[clave][0]}."}
+                continue
+            conteos[clave] = (indice, registro)
+
+        ids_sucursal = {id_sucursal for id_sucursal, _ in conteos}
+        ids_producto = {id_producto for _, id_producto in conteos}
+        sucursales = {id_sucursal for (id_sucursal,) in self.db.query(Sucursal.id_sucursal).filter(Sucursal.id_sucursal.in_(ids_sucursal))} if ids_sucursal else set()
+        productos = {id_producto for (id_producto,) in self.db.query(Producto.id_producto).filter(Producto.id_producto.in_(ids_producto))} if ids_producto else set()
+        existentes = self._inventarios_existentes(ids_sucursal, ids_producto)
+
+        actualizaciones, inserciones = [], []
+        existencias = defaultdict(dict)
+        ahora = datetime.utcnow()
+        for (id_sucursal, id_producto), (indice, registro) in conteos.items():
+            resultado = {"indice": indice, "id_sucursal": id_sucursal, "id_producto": id_producto, "accion": None, "error": None}
+            if id_sucursal not in sucursales:
+                resultado["error"] = f"La sucursal con ID {id_sucursal} no existe."
+            elif id_producto not in productos:
+                resultado["error"] = f"El producto con ID {id_producto} no existe."
+            elif (id_sucursal, id_producto) in existentes:
+                resultado["accion"] = "actualizado"
+                actualizaciones.append({
+                    "b_id_sucursal": id_sucursal,
+                    "b_id_producto": id_producto,
+                    "b_cantidad_disponible": registro["cantidad_disponible"],
+                    "b_cantidad_maxima": registro["cantidad_maxima"],
+                })
+            elif registro["cantidad_maxima"] is None:
+                resultado["error"] = "Se requiere cantidad_maxima para crear el inventario."
+            else:
+                resultado["accion"] = "creado"
+                inserciones.append({
+                    "id_sucursal": id_sucursal,
+                    "id_producto": id_producto,
+                    "cantidad_disponible": registro["cantidad_disponible"],
+                    "cantidad_maxima": registro["cantidad_maxima"],
+                    "fecha_ultima_actualizacion": ahora,
+                    "version": 1,
+                })
+            if resultado["accion"]:
+                existencias[id_sucursal][id_producto] = registro["cantidad_disponible"]
+            resultados[indice] = resultado
+
+        tabla = Inventario.__table__
+        if actualizaciones:
+            self.db.execute(
+                update(tabla)
+                .where(
+                    tabla.c.id_sucursal == bindparam("b_id_sucursal"),
+                    tabla.c.id_producto == bindparam("b_id_producto"),
+                )
+                .values(
+                    cantidad_disponible=bindparam("b_cantidad_disponible"),
+                    cantidad_maxima=func.coalesce(bindparam("b_cantidad_maxima"), tabla.c.cantidad_maxima),
+                    version=tabla.c.version + 1,
+                    fecha_ultima_actualizacion=ahora,
+                ),
+                actualizaciones,
+            )
+        if inserciones:
+            self.db.execute(insert(tabla), inserciones)
+        if actualizaciones or inserciones:
+            self.db.commit()
+            for id_sucursal, stock in existencias.items():
+                disponibilidad_cache.establecer_stock(id_sucursal, stock)
+
+        return _reporte_lote([resultados[indice] for indice in sorted(resultados)])
 
-                
+    def _inventarios_existentes(self, ids_sucursal: set, ids_producto: set) -> set:
+        """Pares (id_sucursal, id_producto) con registro de inventario, en una consulta."""
+        if not ids_sucursal or not ids_producto:
+            return set()
+        return {
+            (id_sucursal, id_producto)
+            for id_sucursal, id_producto in self.db.query(Inventario.id_sucursal, Inventario.id_producto).filter(
+                Inventario.id_sucursal.in_(ids_sucursal), Inventario.id_producto.in_(ids_producto)
+            )
+        }
+
+
+def leer_conteo(archivo: BinaryIO, formato: str) -> Iterator:
+    """
+    Recorre un archivo de conteo CSV (con encabezado) o NDJSON fila por fila, sin
+    cargarlo completo en memoria.
+    """
+    texto = io.TextIOWrapper(archivo, encoding="utf-8-sig", newline="")
+    if formato == "csv":
+        lector = csv.DictReader(texto)
+        faltantes = [columna for columna in COLUMNAS_CONTEO if columna not in (lector.fieldnames or [])]
+        if faltantes:
+            raise ValueError(f"Faltan columnas en el archivo: {', '.join(faltantes)}")
+        yield from lector
+    elif formato == "ndjson":
+        for linea in texto:
+            if not linea.strip():
+                continue
+            try:
+                yield json.loads(linea)
+            except ValueError:
+                yield linea
+    else:
+        raise ValueError(f"Formato de conteo no válido: {formato}")
+
+
+def _registro_conteo(fila) -> dict:
+    """Valida y convierte una fila de conteo; lanza ValueError si es inválida."""
+    if not isinstance(fila, dict):
+        raise ValueError("Fila con formato inválido.")
+    registro = {}
+    for columna in COLUMNAS_CONTEO + ("cantidad_maxima",):
+        valor = fila.get(columna)
+        if valor is None or valor == "":
+            if columna == "cantidad_maxima":
+                registro[columna] = None
+                continue
+            raise ValueError(f"Falta el valor de {columna}.")
+        try:
+            registro[columna] = int(valor)
+        except (TypeError, ValueError):
+            raise ValueError(f"Valor no válido para {columna}: {valor}")
+    if registro["cantidad_disponible"] < 0:
+        raise ValueError("La cantidad disponible no puede ser negativa.")
+    return registro
+
+
+def _reporte_lote(resultados: List[dict]) -> dict:
+    aplicados = sum(1 for resultado in resultados if not resultado.get("error"))
+    return {
+        "aplicados": aplicados,
+        "fallidos": len(resultados) - aplicados,
+        "resultados": resultados,
+    }
+
+
+class InventarioFacadeAsync:
+    """
+    Variante asíncrona de las lecturas de inventario, ejecutadas con run_sync
+    sobre una AsyncSession.
+    """
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def obtener_inventario_con_detalles(self, id_sucursal: int):
+        return await self.db.run_sync(
+            lambda sesion: InventarioFacade(sesion).obtener_inventario_con_detalles(id_sucursal)
+        )
+
+    async def obtener_inventario_por_id(self, id_inventario: int):
+        return await self.db.run_sync(
+            lambda sesion: InventarioFacade(sesion).obtener_inventario_por_id(id_inventario)
+        )
+
+    async def valorizar_inventario(self, id_sucursal: Optional[int] = None):
+        return await self.db.run_sync(
+            lambda sesion: InventarioFacade(sesion).valorizar_inventario(id_sucursal)
+        )
@@ -1,125 +1,276 @@
-
-from sqlalchemy.orm import Session
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
 from app.CompositePedido.pedido import Pedido
 from app.CompositePedido.pedido_detalle import PedidoDetalle
 from app.models import Plato, Pedido as PedidoORM, PedidoDetalle as PedidoDetalleORM
-from app.models.producto import Producto
-from app.models.rol import Rol
-from app.models.usuario import Usuario
 from app.schemas import PedidoCreate, PedidoUpdate, PedidoResponse, PedidoDetalleResponse
-from .inventario_facade import InventarioFacade
+from .inventario_facade import InventarioFacade, con_reintentos_async
 from app.adapters.email_adapter import ExternalService
+from app.adapters.email_queue import VentanaDeduplicacion
+from app.cache.destinatarios_cache import destinatarios_cache
+from app.managers.ventas_manager import VentasManager
+
+
+
+# Filas por lote al leer de la base de datos y al escribir cada bloque de la exportación
+FILAS_POR_BLOQUE_EXPORTACION = 1000
+
+# Una alerta de stock bajo por producto y sucursal dentro de esta ventana
+alertas_stock_bajo = VentanaDeduplicacion(float(os.getenv("ALERTA_STOCK_VENTANA_SEGUNDOS", "3600")))
 
+COLUMNAS_EXPORTACION = {
+    "pedidos": ["id_pedido", "fecha", "id_sucursal", "mesa", "estado", "cantidad_items", "total"],
+    "lineas": ["id_pedido", "fecha", "id_sucursal", "mesa", "estado", "id_plato", "plato", "cantidad", "precio_unitario", "subtotal"],
+}
 
 
 class PedidoFacade:
-    def __init__(self, db: Session, email_adapter: ExternalService):
+    def __init__(self, db: Session, email_adapter: ExternalService, reintentar_inventario: bool = True):
         self.db = db
-        self.inventario_facade = InventarioFacade(db)
+        self.inventario_facade = InventarioFacade(db, reintentar=reintentar_inventario)
         self.email_adapter = email_adapter
         
     def crear_pedido(self, pedido_data: PedidoCreate):
         """Crea un nuevo pedido con detalles."""
-        pedido = Pedido(
-            mesa=pedido_data.mesa,
-            estado="pendiente",
-            fecha=pedido_data.fecha or "NOW()",
-            sucursal=pedido_data.id_sucursal
-        )
+        platos = self._obtener_platos(detalle.id_plato for detalle in pedido_data.detalles)
+        pedido = self._construir_pedido(pedido_data, platos)
 
-        detalles_response = []  # Para almacenar los detalles que se devolverán
+        # Guardar en la base de datos
+        id_pedido = self._guardar_pedido_en_bd(pedido)
+        self.db.commit()
 
-        for detalle_data in pedido_data.detalles:
-            plato = self.db.query(Plato).filter_by(id_plato=detalle_data.id_plato).first()
-            if not plato:
-                raise ValueError(f"El plato con ID {detalle_data.id_plato} no existe.")
+        return self._formatear_pedido(id_pedido, pedido)
 
-            detalle = PedidoDetalle(
-                id_plato=detalle_data.id_plato,
-                nombre=plato.nombre,
-                cantidad=detalle_data.cantidad,
-                precio_unitario=plato.precio,
-            )
-            pedido.agregar_detalle(detalle)
+    def crear_pedidos_lote(self, pedidos_data: List[PedidoCreate]) -> dict:
+        """
+        Crea varios pedidos en una sola transacción.
 
-            # Añadir el detalle formateado para la respuesta
-            detalles_response.append({
-                "id_plato": detalle.id_plato,
-                "cantidad": detalle.cantidad,
-                "precio_unitario": detalle.precio_unitario,
-                "subtotal": detalle.calcular_total(),
-            })
+        Los platos de todos los pedidos se resuelven con una única consulta y cada
+        pedido se guarda en un savepoint propio, de modo que un pedido inválido se
+        reporta sin descartar los demás.
+        """
+        platos = self._obtener_platos(
+            detalle.id_plato for pedido_data in pedidos_data for detalle in pedido_data.detalles
+        )
 
-        # Guardar en la base de datos
-        pedido_orm = self._guardar_pedido_en_bd(pedido)
+        resultados = []
+        for indice, pedido_data in enumerate(pedidos_data):
+            try:
+                pedido = self._construir_pedido(pedido_data, platos)
+                with self.db.begin_nested():
+                    id_pedido = self._guardar_pedido_en_bd(pedido)
+                resultados.append({"indice": indice, "id_pedido": id_pedido, "error": None})
+            except ValueError as e:
+                resultados.append({"indice": indice, "id_pedido": None, "error": str(e)})
+            except SQLAlchemyError as e:
+                error = getattr(e, "orig", None) or e
+                resultados.append({"indice": indice, "id_pedido": None, "error": f"Error al guardar el pedido: {error}"})
 
-        # Devolver la respuesta
+        self.db.commit()
+        creados = sum(1 for resultado in resultados if resultado["id_pedido"] is not None)
         return {
-            "id_pedido": pedido_orm.id_pedido,
-            "mesa": pedido.mesa,
-            "estado": pedido.estado,
-            "fecha": pedido.fecha,
-            "total": pedido.calcular_total(),
-            "detalles": detalles_response,
+            "creados": creados,
+            "fallidos": len(resultados) - creados,
+            "resultados": resultados,
+        }
+
+    def listar_pedidos(
+        self,
+        id_sucursal: Optional[int] = None,
+        estado: Optional[str] = None,
+        fecha_desde: Optional[datetime] = None,
+        fecha_hasta: Optional[datetime] = None,
+        cursor: Optional[int] = None,
+        limite: int = 50,
+    ) -> dict:
+        """
+        Lista una página de pedidos, del más reciente al más antiguo, utilizando objetos Composite.
+
+        La paginación es por cursor (id_pedido del último pedido de la página anterior),
+        de modo que el costo de cada página no depende del tamaño de la tabla. Los detalles
+        y los nombres de los platos se cargan en una consulta adicional para toda la página.
+        """
+        consulta = self.db.query(PedidoORM).options(
+            selectinload(PedidoORM.detalles).joinedload(PedidoDetalleORM.plato).load_only(Plato.nombre)
+        )
+        if id_sucursal is not None:
+            consulta = consulta.filter(PedidoORM.id_sucursal == id_sucursal)
+        if estado is not None:
+            consulta = consulta.filter(PedidoORM.estado == estado)
+        if fecha_desde is not None:
+            consulta = consulta.filter(PedidoORM.fecha >= fecha_desde)
+        if fecha_hasta is not None:
+            consulta = consulta.filter(PedidoORM.fecha < fecha_hasta)
+        if cursor is not None:
+            consulta = consulta.filter(PedidoORM.id_pedido < cursor)
+
+        # Se pide un registro extra para saber si hay una página siguiente
+        pedidos_orm = consulta.order_by(PedidoORM.id_pedido.desc()).limit(limite + 1).all()
+        hay_mas = len(pedidos_orm) > limite
+        pedidos_orm = pedidos_orm[:limite]
+
+        pedidos = [
+            self._formatear_pedido(pedido_orm.id_pedido, self._convertir_a_composite(pedido_orm))
+            for pedido_orm in pedidos_orm
+        ]
+        return {
+            "pedidos": pedidos,
+            "siguiente_cursor": pedidos_orm[-1].id_pedido if hay_mas else None,
         }
 
-    def listar_pedidos(self):
-        """Lista todos los pedidos utilizando objetos Composite."""
-        pedidos_orm = self.db.query(PedidoORM).all()
-        pedidos = []
+    def exportar_pedidos(
+        self,
+        formato: str = "ndjson",
+        nivel: str = "pedidos",
+        id_sucursal: Optional[int] = None,
+        fecha_desde: Optional[datetime] = None,
+        fecha_hasta: Optional[datetime] = None,
+    ) -> Iterator[str]:
+        """
+        Genera la exportación de pedidos (nivel 'pedidos') o de sus líneas (nivel 'lineas')
+        en formato NDJSON o CSV, por bloques de texto.
 
-        for pedido_orm in pedidos_orm:
-            pedido = self._convertir_a_composite(pedido_orm)
+        Las filas se leen con un cursor del lado del servidor (yield_per), así que la
+        memoria usada no depende del número de pedidos exportados.
+        """
+        if nivel not in COLUMNAS_EXPORTACION:
+            raise ValueError(f"Nivel de exportación no válido: {nivel}")
+        if formato not in ("ndjson", "csv"):
+            raise ValueError(f"Formato de exportación no válido: {formato}")
+
+        consulta = self._consulta_exportacion(nivel)
+        if id_sucursal is not None:
+            consulta = consulta.where(PedidoORM.id_sucursal == id_sucursal)
+        if fecha_desde is not None:
+            consulta = consulta.where(PedidoORM.fecha >= fecha_desde)
+        if fecha_hasta is not None:
+            consulta = consulta.where(PedidoORM.fecha < fecha_hasta)
+
+        columnas = COLUMNAS_EXPORTACION[nivel]
+        filas = self.db.execute(consulta.execution_options(yield_per=FILAS_POR_BLOQUE_EXPORTACION))
+
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer) if formato == "csv" else None
+        if escritor:
+            escritor.writerow(columnas)
+
+        for numero, fila in enumerate(filas, start=1):
+            registro = self._registro_exportacion(nivel, fila)
+            if escritor:
+                escritor.writerow([registro[columna] for columna in columnas])
+            else:
+                buffer.write(json.dumps(registro, default=str, ensure_ascii=False))
+                buffer.write("\n")
+
+            if numero % FILAS_POR_BLOQUE_EXPORTACION == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    def _consulta_exportacion(self, nivel: str):
+        """Construye la consulta de exportación ordenada por pedido."""
+        if nivel == "lineas":
+            return (
+                select(
+                    PedidoORM.id_pedido,
+                    PedidoORM.fecha,
+                    PedidoORM.id_sucursal,
+                    PedidoORM.mesa,
+                    PedidoORM.estado,
+                    PedidoDetalleORM.id_plato,
+                    Plato.nombre.label("plato"),
+                    PedidoDetalleORM.cantidad,
+                    PedidoDetalleORM.precio_unitario,
+                )
+                .join(PedidoDetalleORM, PedidoDetalleORM.id_pedido == PedidoORM.id_pedido)
+                .join(Plato, Plato.id_plato == PedidoDetalleORM.id_plato)
+                .order_by(PedidoORM.id_pedido, PedidoDetalleORM.id_plato)
+            )
 
-            # Formatear los detalles con los campos adicionales
-            detalles_response = [
-                {
-                    "id_plato": detalle.id_plato,
-                    "cantidad": detalle.cantidad,
-                    "precio_unitario": detalle.precio_unitario,
-                    "subtotal": detalle.calcular_total(),
-                }
-                for detalle in pedido.detalles
-            ]
-
-            pedidos.append({
-                "id_pedido": pedido_orm.id_pedido,
-                "mesa": pedido.mesa,
-                "estado": pedido.estado,
-                "fecha": pedido.fecha,
-                "total": pedido.calcular_total(),
-                "detalles": detalles_response,
+        return (
+            select(
+                PedidoORM.id_pedido,
+                PedidoORM.fecha,
+                PedidoORM.id_sucursal,
+                PedidoORM.mesa,
+                PedidoORM.estado,
+                PedidoORM.cantidad_items,
+                PedidoORM.total,
+            )
+            .order_by(PedidoORM.id_pedido)
+        )
+
+    @staticmethod
+    def _registro_exportacion(nivel: str, fila) -> dict:
+        """Convierte una fila de la consulta en un registro serializable."""
+        registro = {
+            "id_pedido": fila.id_pedido,
+            "fecha": fila.fecha.isoformat() if fila.fecha else None,
+            "id_sucursal": fila.id_sucursal,
+            "mesa": fila.mesa,
+            "estado": fila.estado,
+        }
+        if nivel == "lineas":
+            precio_unitario = float(fila.precio_unitario or 0)
+            registro.update({
+                "id_plato": fila.id_plato,
+                "plato": fila.plato,
+                "cantidad": fila.cantidad,
+                "precio_unitario": precio_unitario,
+                "subtotal": fila.cantidad * precio_unitario,
+            })
+        else:
+            registro.update({
+                "cantidad_items": int(fila.cantidad_items),
+                "total": float(fila.total),
             })
+        return registro
 
-        return pedidos
+    def recalcular_totales(self) -> int:
+        """
+        Recalcula total y cantidad_items de todos los pedidos a partir de sus detalles,
+        con una sola sentencia. Sirve para poblar los totales de pedidos existentes.
+        """
+        tabla = PedidoORM.__table__
+        detalle = PedidoDetalleORM.__table__
+        total = (
+            select(func.coalesce(func.sum(detalle.c.cantidad * detalle.c.precio_unitario), 0))
+            .where(detalle.c.id_pedido == tabla.c.id_pedido)
+            .scalar_subquery()
+        )
+        cantidad_items = (
+            select(func.coalesce(func.sum(detalle.c.cantidad), 0))
+            .where(detalle.c.id_pedido == tabla.c.id_pedido)
+            .scalar_subquery()
+        )
+        resultado = self.db.execute(update(tabla).values(total=total, cantidad_items=cantidad_items))
+        self.db.commit()
+        return resultado.rowcount
 
     def obtener_pedido(self, id_pedido: int):
         """Obtiene un pedido por su ID utilizando objetos Composite."""
-        pedido_orm = self.db.query(PedidoORM).filter_by(id_pedido=id_pedido).first()
+        pedido_orm = (
+            self.db.query(PedidoORM)
+            .options(selectinload(PedidoORM.detalles).joinedload(PedidoDetalleORM.plato).load_only(Plato.nombre))
+            .filter_by(id_pedido=id_pedido)
+            .first()
+        )
         if not pedido_orm:
             raise ValueError(f"El pedido con ID {id_pedido} no existe.")
 
         pedido = self._convertir_a_composite(pedido_orm)
-
-        # Formatear los detalles con los campos adicionales
-        detalles_response = [
-            {
-                "id_plato": detalle.id_plato,
-                "cantidad": detalle.cantidad,
-                "precio_unitario": detalle.precio_unitario,
-                "subtotal": detalle.calcular_total(),
-            }
-            for detalle in pedido.detalles
-        ]
-
-        return {
-            "id_pedido": pedido_orm.id_pedido,
-            "mesa": pedido.mesa,
-            "estado": pedido.estado,
-            "fecha": pedido.fecha,
-            "total": pedido.calcular_total(),
-            "detalles": detalles_response,
-        }
+        return self._formatear_pedido(pedido_orm.id_pedido, pedido)
 
     def actualizar_pedido(self, id_pedido: int, pedido_data: PedidoUpdate):
         """Actualiza un pedido completo, incluyendo su estado y detalles."""
@@ -127,27 +278,39 @@ class PedidoFacade:
         if not pedido_orm:
             raise ValueError(f"El pedido con ID {id_pedido} no existe.")
 
+        ventas = VentasManager(self.db)
+        estado_anterior = pedido_orm.estado
+        lineas_anteriores = ventas.lineas_pedido(id_pedido) if pedido_data.detalles else None
+
         pedido_orm.mesa = pedido_data.mesa or pedido_orm.mesa
         pedido_orm.estado = pedido_data.estado or pedido_orm.estado
-        self.db.commit()
 
         # Actualizar detalles si se proporcionan
         if pedido_data.detalles:
-            self.db.query(PedidoDetalleORM).filter_by(id_pedido=id_pedido).delete()
-
+            platos = self._obtener_platos(detalle.id_plato for detalle in pedido_data.detalles)
             for detalle_data in pedido_data.detalles:
-                plato = self.db.query(Plato).filter_by(id_plato=detalle_data.id_plato).first()
-                if not plato:
+                if detalle_data.id_plato not in platos:
                     raise ValueError(f"El plato con ID {detalle_data.id_plato} no existe.")
 
-                nuevo_detalle = PedidoDetalleORM(
-                    id_pedido=id_pedido,
-                    id_plato=detalle_data.id_plato,
-                    cantidad=detalle_data.cantidad,
-                    precio_unitario=plato.precio
-                )
-                self.db.add(nuevo_detalle)
-            self.db.commit()
+            self.db.query(PedidoDetalleORM).filter_by(id_pedido=id_pedido).delete()
+            pedido_orm.total = sum(
+                detalle_data.cantidad * platos[detalle_data.id_plato].precio for detalle_data in pedido_data.detalles
+            )
+            pedido_orm.cantidad_items = sum(detalle_data.cantidad for detalle_data in pedido_data.detalles)
+            self.db.execute(
+                insert(PedidoDetalleORM.__table__),
+                [
+                    {
+                        "id_pedido": id_pedido,
+                        "id_plato": detalle_data.id_plato,
+                        "cantidad": detalle_data.cantidad,
+                        "precio_unitario": platos[detalle_data.id_plato].precio,
+                    }
+                    for detalle_data in pedido_data.detalles
+                ],
+            )
+        ventas.registrar_cambio(pedido_orm, estado_anterior, lineas_anteriores)
+        self.db.commit()
 
         return self.obtener_pedido(id_pedido)
     
@@ -162,13 +325,17 @@ class PedidoFacade:
         if not pedido:
             raise ValueError(f"El pedido con ID {id_pedido} no existe.")
 
-        # Actualizar el estado del pedido
+        # Actualizar el estado del pedido y el resumen de ventas, en la misma transacción
+        estado_anterior = pedido.estado
         pedido.estado = nuevo_estado
-        self.db.commit()
-        
-        # Procesar el pedido si el estado es 'preparado'
+        VentasManager(self.db).registrar_cambio(pedido, estado_anterior)
+
+        # Procesar el pedido si el estado es 'preparado': el cambio de estado se confirma
+        # en la misma transacción que el descuento de inventario
         if nuevo_estado == "preparado":
             self.procesar_pedido(id_pedido)
+        else:
+            self.db.commit()
 
         return pedido
 
@@ -188,50 +355,48 @@ class PedidoFacade:
         
         
         # Ajustar el inventario según el pedido
-        self.inventario_facade.ajustar_inventario_por_pedido(
+        requerimientos = self.inventario_facade.ajustar_inventario_por_pedido(
             id_sucursal=pedido.id_sucursal,
             detalles_pedido=detalles_pedido
         )
         
-        # Verificar productos con bajo stock
-        productos_bajo_stock = self.inventario_facade.verificar_stock_bajo(pedido.id_sucursal)
-        
+        # Verificar el stock bajo solo de los productos que el pedido acaba de descontar
+        productos_bajo_stock = self.inventario_facade.verificar_stock_bajo(pedido.id_sucursal, requerimientos.keys())
+
+        # No repetir la alerta de un producto ya notificado recientemente en la sucursal
+        nuevas = set(alertas_stock_bajo.filtrar_nuevas(
+            (pedido.id_sucursal, producto_info["id_producto"]) for producto_info in productos_bajo_stock
+        ))
+        productos_bajo_stock = [
+            producto_info for producto_info in productos_bajo_stock
+            if (pedido.id_sucursal, producto_info["id_producto"]) in nuevas
+        ]
+
         if productos_bajo_stock:
-            # Obtener información detallada de los productos
-            productos_info = []
-            for producto_info in productos_bajo_stock:
-                producto = self.db.query(Producto).filter_by(id_producto=producto_info["id_producto"]).first()
-                if producto:
-                    productos_info.append({
-                        "nombre": producto.nombre,
-                        "cantidad_disponible": producto_info["cantidad_disponible"],
-                        "cantidad_maxima": producto_info["cantidad_maxima"]
-                    })
-            
-            # Obtener el correo electrónico del jefe de cocina
-            jefe_rol = self.db.query(Rol).filter_by(nombre="Jefe de Cocina").first()
-            if jefe_rol:
-                usuarios_jefe_cocina = self.db.query(Usuario).filter_by(id_rol=jefe_rol.id_rol).all()
-                emails_jefes = [usuario.email for usuario in usuarios_jefe_cocina]
-                
+            # Obtener el correo electrónico de los jefes de cocina
+            emails_jefes = destinatarios_cache.obtener(self.db, "Jefe de Cocina")
+            if emails_jefes:
                 # Formatear el mensaje del correo electrónico
                 mensaje = "Estimado Jefe de Cocina,\n\nLos siguientes productos están bajos en stock:\n\n"
-                for producto in productos_info:
+                for producto in productos_bajo_stock:
                     mensaje += f"- {producto['nombre']}: {producto['cantidad_disponible']} unidades disponibles (máximo {producto['cantidad_maxima']})\n"
                 mensaje += "\nPor favor, considere realizar un pedido de abastecimiento.\n\nAtentamente,\nSistema de Gestión de Inventario"
                 
                 # Enviar el correo electrónico a cada jefe de cocina
+                encolados = 0
                 for email in emails_jefes:
-                    self.email_adapter.enviar_correo(
+                    if self.email_adapter.enviar_correo(
                         destinatario=email,
                         asunto="Alerta: Productos bajos en stock",
                         mensaje=mensaje
-                    )
+                    ):
+                        encolados += 1
+                if not encolados:
+                    # La alerta no salió: no se da por notificada dentro de la ventana
+                    alertas_stock_bajo.liberar(nuevas)
             else:
-                print("No se encontró el rol 'Jefe de Cocina' en la base de datos.")
-
-
-
+                alertas_stock_bajo.liberar(nuevas)
+                print("No se encontraron usuarios con el rol 'Jefe de Cocina' en la base de datos.")
 
 
     def eliminar_pedido(self, id_pedido: int):
@@ -240,32 +405,97 @@ class PedidoFacade:
         if not pedido_orm:
             raise ValueError(f"El pedido con ID {id_pedido} no existe.")
 
+        VentasManager(self.db).registrar_eliminacion(pedido_orm)
         self.db.query(PedidoDetalleORM).filter_by(id_pedido=id_pedido).delete()
         self.db.delete(pedido_orm)
         self.db.commit()
         return {"message": f"Pedido con ID {id_pedido} eliminado exitosamente."}
 
-    def _guardar_pedido_en_bd(self, pedido: Pedido):
-        """Guarda un pedido y sus detalles en la base de datos."""
+    def _obtener_platos(self, ids_plato: Iterable[int]) -> dict:
+        """Obtiene id, nombre y precio de los platos indicados con una sola consulta."""
+        ids = set(ids_plato)
+        if not ids:
+            return {}
+        platos = (
+            self.db.query(Plato.id_plato, Plato.nombre, Plato.precio)
+            .filter(Plato.id_plato.in_(ids))
+            .all()
+        )
+        return {plato.id_plato: plato for plato in platos}
+
+    def _construir_pedido(self, pedido_data: PedidoCreate, platos: dict) -> Pedido:
+        """Construye el Composite del pedido a partir de los platos ya consultados."""
+        pedido = Pedido(
+            mesa=pedido_data.mesa,
+            estado="pendiente",
+            fecha=pedido_data.fecha or "NOW()",
+            sucursal=pedido_data.id_sucursal
+        )
+
+        for detalle_data in pedido_data.detalles:
+            plato = platos.get(detalle_data.id_plato)
+            if not plato:
+                raise ValueError(f"El plato con ID {detalle_data.id_plato} no existe.")
+
+            pedido.agregar_detalle(PedidoDetalle(
+                id_plato=detalle_data.id_plato,
+                nombre=plato.nombre,
+                cantidad=detalle_data.cantidad,
+                precio_unitario=plato.precio,
+            ))
+        pedido.total = pedido.calcular_total()
+        return pedido
+
+    def _formatear_pedido(self, id_pedido: int, pedido: Pedido) -> dict:
+        """Formatea un Composite de pedido con el esquema de respuesta."""
+        return {
+            "id_pedido": id_pedido,
+            "mesa": pedido.mesa,
+            "estado": pedido.estado,
+            "fecha": pedido.fecha,
+            "id_sucursal": pedido.sucursal,
+            "total": pedido.total,
+            "detalles": [
+                {
+                    "id_plato": detalle.id_plato,
+                    "cantidad": detalle.cantidad,
+                    "precio_unitario": detalle.precio_unitario,
+                    "subtotal": detalle.calcular_total(),
+                }
+                for detalle in pedido.detalles
+            ],
+        }
+
+    def _guardar_pedido_en_bd(self, pedido: Pedido) -> int:
+        """
+        Inserta un pedido y sus detalles en la transacción actual, sin confirmarla.
+        Los detalles se insertan con una sola sentencia.
+        """
         nuevo_pedido = PedidoORM(
             mesa=pedido.mesa,
             estado=pedido.estado,
             fecha=pedido.fecha,
-            id_sucursal=pedido.sucursal
+            id_sucursal=pedido.sucursal,
+            total=pedido.total,
+            cantidad_items=sum(detalle.cantidad for detalle in pedido.detalles),
         )
-        # Asociar los detalles al nuevo pedido
-        nuevo_pedido.detalles = [
-            PedidoDetalleORM(
-                id_plato=detalle.id_plato,
-                cantidad=detalle.cantidad,
-                precio_unitario=detalle.precio_unitario,
-            )
-            for detalle in pedido.detalles
-        ]
         self.db.add(nuevo_pedido)
-        self.db.commit()
-        self.db.refresh(nuevo_pedido)
-        return nuevo_pedido
+        self.db.flush()
+
+        if pedido.detalles:
+            self.db.execute(
+                insert(PedidoDetalleORM.__table__),
+                [
+                    {
+                        "id_pedido": nuevo_pedido.id_pedido,
+                        "id_plato": detalle.id_plato,
+                        "cantidad": detalle.cantidad,
+                        "precio_unitario": detalle.precio_unitario,
+                    }
+                    for detalle in pedido.detalles
+                ],
+            )
+        return nuevo_pedido.id_pedido
 
 
     def _convertir_a_composite(self, pedido_orm: PedidoORM):
@@ -273,13 +503,12 @@ class PedidoFacade:
         pedido = Pedido(
             mesa=pedido_orm.mesa,
             estado=pedido_orm.estado,
-            fecha=pedido_orm.fecha
+            fecha=pedido_orm.fecha,
+            sucursal=pedido_orm.id_sucursal
         )
         pedido.id_pedido = pedido_orm.id_pedido  # Asegura que el ID esté presente
 
-        detalles_orm = self.db.query(PedidoDetalleORM).filter_by(id_pedido=pedido_orm.id_pedido).all()
-
-        for detalle_orm in detalles_orm:
+        for detalle_orm in pedido_orm.detalles:
             detalle = PedidoDetalle(
                 id_plato=detalle_orm.id_plato,
                 nombre=detalle_orm.plato.nombre,
@@ -288,19 +517,14 @@ class PedidoFacade:
             )
             pedido.agregar_detalle(detalle)
 
-        # Calcula el total del pedido
-        pedido.total = pedido.calcular_total()
+        # Total materializado al escribir el pedido
+        pedido.total = float(pedido_orm.total)
         return pedido
     
     def obtener_pedido_response(self, pedido: PedidoORM) -> PedidoResponse:
         """
         Convierte un objeto PedidoORM en un modelo PedidoResponse compatible con Pydantic.
         """
-        # Calcular el total del pedido
-        total = sum(
-            detalle.cantidad * detalle.precio_unitario for detalle in pedido.detalles
-        )
-
         # Convertir los detalles al esquema Pydantic
         detalles_response = [
             PedidoDetalleResponse(
@@ -318,10 +542,39 @@ class PedidoFacade:
             mesa=pedido.mesa,
             estado=pedido.estado,
             fecha=pedido.fecha,
-            total=total,
+            total=pedido.total,
             detalles=detalles_response
         )
         
     
 
 
+class PedidoFacadeAsync:
+    """
+    Variante asíncrona de los caminos críticos de PedidoFacade.
+
+    Ejecuta la misma lógica de PedidoFacade sobre una AsyncSession mediante run_sync,
+    de modo que la E/S de base de datos usa el driver asíncrono.
+    """
+    def __init__(self, db: AsyncSession, email_adapter: ExternalService):
+        self.db = db
+        self.email_adapter = email_adapter
+
+    async def crear_pedido(self, pedido_data: PedidoCreate) -> dict:
+        return await self.db.run_sync(
+            lambda sesion: PedidoFacade(sesion, self.email_adapter).crear_pedido(pedido_data)
+        )
+
+    async def actualizar_estado_pedido(self, id_pedido: int, nuevo_estado: str) -> PedidoResponse:
+        """Actualiza el estado del pedido y devuelve su respuesta serializable."""
+        def actualizar(sesion: Session) -> PedidoResponse:
+            facade = PedidoFacade(sesion, self.email_adapter, reintentar_inventario=False)
+            pedido = facade.actualizar_estado_pedido(id_pedido, nuevo_estado)
+            return facade.obtener_pedido_response(pedido)
+        # Los conflictos de inventario se reintentan aquí, sin dormir en el event loop
+        return await con_reintentos_async(lambda: self.db.run_sync(actualizar))
+
+    async def obtener_pedido(self, id_pedido: int) -> dict:
+        return await self.db.run_sync(
+            lambda sesion: PedidoFacade(sesion, self.email_adapter).obtener_pedido(id_pedido)
+        )
@@ -1,11 +1,11 @@
-from sqlalchemy import and_, func, text
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import NoResultFound
-from sqlalchemy.sql.functions import coalesce
 from app.models import Plato, PlatoProducto, Producto
-from app.models.inventario import Inventario
-from app.models.unidad_medida import ConversionUnidades
-from app.schemas import PlatoCreate, PlatoUpdate
+from app.schemas import PlatoCreate, PlatoUpdate, PlatoResponse
+from app.cache.receta_cache import receta_cache
+from app.cache.disponibilidad_cache import disponibilidad_cache
+from app.cache.catalogo_cache import catalogo_cache, EntradaCatalogo
+from app.utils.respuestas import serializar_lista
 
 class PlatoFacade:
     def __init__(self, db: Session):
@@ -36,11 +36,24 @@ class PlatoFacade:
             self.db.add(plato_ingrediente)
 
         self.db.commit()
+        receta_cache.invalidar(plato.id_plato)
         return plato
 
     def listar_platos(self):
-        """Lista todos los platos."""
-        return self.db.query(Plato).all()
+        """Lista todos los platos con sus ingredientes desde la caché de recetas."""
+        recetas = receta_cache.obtener_todas(self.db)
+        return [recetas[id_plato].como_respuesta() for id_plato in sorted(recetas)]
+
+    def listar_platos_catalogo(self) -> EntradaCatalogo:
+        """Lista todos los platos ya serializados; se invalida junto con la caché de recetas."""
+        return catalogo_cache.obtener("platos", lambda: serializar_lista(PlatoResponse, self.listar_platos()))
+
+    def obtener_plato_response(self, id_plato: int) -> dict:
+        """Obtiene un plato con sus ingredientes desde la caché de recetas."""
+        receta = receta_cache.obtener(self.db, [id_plato]).get(id_plato)
+        if not receta:
+            raise NoResultFound(f"El plato con ID {id_plato} no existe.")
+        return receta.como_respuesta()
 
     def obtener_plato(self, id_plato: int):
         """Obtiene un plato por su ID."""
@@ -77,6 +90,7 @@ class PlatoFacade:
                 self.db.add(plato_ingrediente)
 
         self.db.commit()
+        receta_cache.invalidar(id_plato)
         self.db.refresh(plato)
         return plato
 
@@ -85,52 +99,12 @@ class PlatoFacade:
         plato = self.obtener_plato(id_plato)
         self.db.delete(plato)
         self.db.commit()
+        receta_cache.invalidar(id_plato)
         return {"message": f"Plato con ID {id_plato} eliminado exitosamente."}
     
-    def listar_platos_preparables(self):
+    def listar_platos_preparables(self, id_sucursal: int):
         """
-        Lista los platos que pueden ser preparados según el inventario disponible.
+        Lista los platos que pueden ser preparados según el inventario disponible de la sucursal.
         :return: Lista de platos con la cantidad máxima preparable.
         """
-        query = text("""
-            SELECT
-                subquery.id_plato,
-                subquery.nombre AS Plato,
-                FLOOR(MIN(subquery.available_servings)) AS cantidad_preparable
-            FROM
-                (
-                    SELECT
-                        p.id_plato,
-                        p.nombre,
-                        (COALESCE(i.cantidad_disponible, 0) * cu.factor_conversion) / pp.cantidad AS available_servings
-                    FROM
-                        Plato p
-                    JOIN PlatoProducto pp ON
-                        p.id_plato = pp.id_plato
-                    JOIN Producto prod ON
-                        pp.id_producto = prod.id_producto
-                    LEFT JOIN Inventario i ON
-                        prod.id_producto = i.id_producto
-                    JOIN ConversionUnidades cu ON
-                        cu.id_unidad_base = prod.id_unidad_medida
-                        AND cu.id_unidad_convertida = pp.id_unidad_medida
-                ) AS subquery
-            GROUP BY
-                subquery.id_plato,
-                subquery.nombre
-            HAVING
-                FLOOR(MIN(subquery.available_servings)) > 0;
-        """)
-
-        # Ejecutar la consulta directamente usando SQLAlchemy
-        result = self.db.execute(query)
-        platos_preparables = result.fetchall()
-
-        return [
-            {
-                "id_plato": plato.id_plato,
-                "nombre": plato.Plato,
-                "cantidad_preparable": int(plato.cantidad_preparable)
-            }
-            for plato in platos_preparables
-        ]
+        return disponibilidad_cache.listar_preparables(self.db, id_sucursal)
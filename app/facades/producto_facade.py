@@ -4,6 +4,9 @@ from sqlalchemy.exc import NoResultFound
 from app.models import Producto, CategoriaProducto, UnidadMedida
 from app.schemas import ProductoCreate, ProductoBase
 from app.schemas.producto_schema import ProductoResponse
+from app.cache.receta_cache import receta_cache
+from app.cache.catalogo_cache import catalogo_cache, EntradaCatalogo
+from app.utils.respuestas import serializar_lista
 
 
 class ProductoFacade:
@@ -31,6 +34,7 @@ class ProductoFacade:
         )
         self.db.add(producto)
         self.db.commit()
+        catalogo_cache.invalidar("productos")
         self.db.refresh(producto)
 
         return producto
@@ -38,6 +42,12 @@ class ProductoFacade:
     def listar_productos(self):
         """Lista todos los productos."""
         return self.db.query(Producto).all()
+
+    def listar_productos_catalogo(self) -> EntradaCatalogo:
+        """Lista todos los productos ya serializados, desde la caché de catálogo."""
+        return catalogo_cache.obtener(
+            "productos", lambda: serializar_lista(ProductoResponse, self.listar_productos())
+        )
     
     def obtener_productos_batch(self, ids_producto: List[int]) -> List[ProductoResponse]:
         productos = self.db.query(Producto).filter(Producto.id_producto.in_(ids_producto)).all()
@@ -61,6 +71,9 @@ class ProductoFacade:
         producto.precio = producto_data.precio
 
         self.db.commit()
+        catalogo_cache.invalidar("productos")
+        # Las recetas guardan cantidades convertidas a la unidad del producto
+        receta_cache.invalidar()
         self.db.refresh(producto)
         return producto
 
@@ -69,4 +82,6 @@ class ProductoFacade:
         producto = self.obtener_producto(id_producto)
         self.db.delete(producto)
         self.db.commit()
+        catalogo_cache.invalidar("productos")
+        receta_cache.invalidar()
         return {"message": f"Producto con ID {id_producto} eliminado exitosamente."}
@@ -0,0 +1,83 @@
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.models import Plato, Sucursal, VentaResumen
+
+# Agrupaciones disponibles para el reporte de ventas
+AGRUPACIONES_VENTAS = ("sucursal", "plato", "hora", "dia")
+
+
+class ReporteFacade:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def ventas(
+        self,
+        agrupar: List[str],
+        fecha_desde: Optional[datetime] = None,
+        fecha_hasta: Optional[datetime] = None,
+        id_sucursal: Optional[int] = None,
+        id_plato: Optional[int] = None,
+    ) -> List[dict]:
+        """
+        Unidades e ingresos agrupados por sucursal, plato, hora y/o día.
+
+        Se consulta solo el resumen VentaResumen (una fila por sucursal, plato y hora),
+        nunca Pedido ni PedidoDetalle.
+        """
+        invalidas = [agrupacion for agrupacion in agrupar if agrupacion not in AGRUPACIONES_VENTAS]
+        if invalidas or not agrupar:
+            raise ValueError(f"Agrupación no válida; opciones: {', '.join(AGRUPACIONES_VENTAS)}")
+        if "hora" in agrupar and "dia" in agrupar:
+            raise ValueError("No se puede agrupar por hora y por día a la vez.")
+
+        columnas, agrupaciones, orden = [], [], []
+        consulta_joins = []
+        if "sucursal" in agrupar:
+            columnas += [VentaResumen.id_sucursal, Sucursal.nombre.label("sucursal")]
+            agrupaciones += [VentaResumen.id_sucursal, Sucursal.nombre]
+            orden.append(VentaResumen.id_sucursal)
+            consulta_joins.append((Sucursal, Sucursal.id_sucursal == VentaResumen.id_sucursal))
+        if "plato" in agrupar:
+            columnas += [VentaResumen.id_plato, Plato.nombre.label("plato")]
+            agrupaciones += [VentaResumen.id_plato, Plato.nombre]
+            orden.append(VentaResumen.id_plato)
+            consulta_joins.append((Plato, Plato.id_plato == VentaResumen.id_plato))
+        if "hora" in agrupar:
+            columnas.append(VentaResumen.hora.label("periodo"))
+            agrupaciones.append(VentaResumen.hora)
+            orden.insert(0, VentaResumen.hora)
+        elif "dia" in agrupar:
+            dia = func.date(VentaResumen.hora)
+            columnas.append(dia.label("periodo"))
+            agrupaciones.append(dia)
+            orden.insert(0, dia)
+
+        consulta = select(
+            *columnas,
+            func.sum(VentaResumen.cantidad).label("cantidad"),
+            func.sum(VentaResumen.ingresos).label("ingresos"),
+        ).select_from(VentaResumen)
+        for modelo, condicion in consulta_joins:
+            consulta = consulta.join(modelo, condicion)
+        if fecha_desde is not None:
+            consulta = consulta.where(VentaResumen.hora >= fecha_desde)
+        if fecha_hasta is not None:
+            consulta = consulta.where(VentaResumen.hora < fecha_hasta)
+        if id_sucursal is not None:
+            consulta = consulta.where(VentaResumen.id_sucursal == id_sucursal)
+        if id_plato is not None:
+            consulta = consulta.where(VentaResumen.id_plato == id_plato)
+        consulta = consulta.group_by(*agrupaciones).order_by(*orden)
+
+        resultado = []
+        for fila in self.db.execute(consulta).mappings():
+            registro = dict(fila)
+            periodo = registro.get("periodo")
+            if periodo is not None and not isinstance(periodo, str):
+                registro["periodo"] = periodo.isoformat()
+            registro["cantidad"] = int(registro["cantidad"] or 0)
+            registro["ingresos"] = float(registro["ingresos"] or 0)
+            resultado.append(registro)
+        return resultado
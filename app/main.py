@@ -1,14 +1,19 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.utils.database import DatabaseManager
 from .routes.administracion import router as user_router
 from .routes.inventarios import router as inventario_router
 from .routes.platos import router as plato_router
-from .routes.pedidos import router as pedido_router
+from .routes.pedidos import router as pedido_router, email_adapter
 from .routes.auth import router as auth_router
 from .routes.productos import router as producto_router
 from .routes.categorias import router as categoria_router
-from .middlewares.error_handler import ErrorHandler
+from .routes.reportes import router as reporte_router
+from .middlewares.error_handler import ErrorHandler, registrar_manejadores_error, registro_errores
+from .middlewares.metricas import MetricasMiddleware
+from .utils.metricas import registro_metricas
+from .utils.auditoria import auditoria
 
 # Crear instancia de FastAPI
 app = FastAPI(
@@ -19,6 +24,7 @@ app = FastAPI(
 
 # Middleware de CORS
 origins = ["*"]  # Cambiar "*" por dominios específicos para mayor seguridad
+# Por dentro de CORS, para que los errores 500 también lleven los encabezados CORS
 app.add_middleware(ErrorHandler)
 app.add_middleware(
     CORSMiddleware,
@@ -27,6 +33,11 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Se agrega al final para quedar en el exterior y medir la petición completa
+app.add_middleware(MetricasMiddleware)
+
+# Traducción de las excepciones de los facades a respuestas HTTP
+registrar_manejadores_error(app)
 
 # Conectar base de datos
 db_instance = DatabaseManager.get_instance()
@@ -39,8 +50,27 @@ app.include_router(user_router, prefix="/api/usuarios", tags=["Usuarios"])
 app.include_router(auth_router, prefix="/api/auth", tags=["Autenticación"])
 app.include_router(producto_router, prefix="/api/productos", tags=["Productos"])
 app.include_router(categoria_router, prefix="/api/categorias", tags=["categorias"])
+app.include_router(reporte_router, prefix="/api/reportes", tags=["Reportes"])
+
+
+
+@app.on_event("shutdown")
+def detener_cola_correos():
+    """Envía los correos pendientes antes de apagar el servidor."""
+    email_adapter.detener()
+
+
+@app.on_event("shutdown")
+def detener_registro_errores():
+    """Guarda los errores pendientes antes de apagar el servidor."""
+    registro_errores.detener()
 
 
+@app.on_event("shutdown")
+def detener_auditoria():
+    """Guarda los eventos de auditoría pendientes antes de apagar el servidor."""
+    auditoria.detener()
+
 
 # Root Endpoint
 @app.get("/", tags=["Root"])
@@ -48,6 +78,21 @@ async def root():
     return {"message": "¡Bienvenido a la API del Sistema de Restaurante!"}
 
 
+@app.get("/salud/base-datos", tags=["Root"])
+def salud_base_datos():
+    """Métricas del pool de conexiones a la base de datos."""
+    return db_instance.obtener_metricas_pool()
+
+
+@app.get("/metrics", tags=["Root"], response_class=PlainTextResponse, include_in_schema=False)
+def metricas():
+    """
+    Métricas de peticiones, base de datos, cachés y colas en formato de texto de
+    Prometheus; cada componente registra sus propias métricas en registro_metricas.
+    """
+    return PlainTextResponse(registro_metricas.exportar(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
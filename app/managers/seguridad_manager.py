@@ -1,22 +1,46 @@
+import asyncio
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from fastapi import HTTPException, status
 from jwt import encode, decode, exceptions
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.usuario import Usuario
 from app.models.permiso import Permiso
 from app.models.rol import Rol
 from app.schemas.user_schema import UsuarioResponse
+from app.security.principal import UsuarioActual
+from app.cache.rol_cache import rol_cache
+from app.cache.destinatarios_cache import destinatarios_cache
+from app.cache.tokens_revocados import RevocacionNoDisponibleError, tokens_revocados
 from app.utils.database import DatabaseManager
 import os
+from typing import Optional
 
 # Configuración para encriptación y JWT
 # Cargar la clave secreta desde variables de entorno para mayor seguridad
 SECRET_KEY = os.getenv("SECRET_KEY", "my_secrete_key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 360
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Vigencia del refresh token: permite renovar el token de acceso sin volver a verificar la contraseña
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
+# Si está activo, los permisos se toman del token validando la versión del rol en caché
+PERMISOS_DESDE_TOKEN = os.getenv("PERMISOS_DESDE_TOKEN", "false").lower() == "true"
+# Costo de bcrypt; los hashes con otro costo se recalculan en el siguiente inicio de sesión
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+# Hilos dedicados a bcrypt: acotan las verificaciones simultáneas sin ocupar el threadpool de las rutas
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(min(4, os.cpu_count() or 1))))
+bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
 
 
 class SeguridadManager:
@@ -24,28 +48,81 @@ class SeguridadManager:
         self.db = db
     def autenticar_usuario(self, email: str, password: str) -> dict:
         """
-        Autentica un usuario y devuelve un token si las credenciales son válidas.
+        Autentica un usuario y devuelve el token de acceso y el refresh token si las
+        credenciales son válidas. Las rutas async usan SeguridadManagerAsync, que
+        ejecuta bcrypt fuera del event loop.
         """
-        try:
-            user = self.db.query(Usuario).filter(Usuario.email == email).first()
-            if not user:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Credenciales incorrectas. Usuario no encontrado."
-                )
-
-            # Verificar contraseña
-            if not pwd_context.verify(password, user.password):
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Credenciales incorrectas. Contraseña inválida."
-                )
-            token = self._generar_token({"username": user.nombre, "email": user.email, "rol": user.rol.nombre, "permisos": [p.nombre for p in user.rol.permisos]})
-            return token
-        except SQLAlchemyError as e:
-            raise Exception(f"Error en la autenticación: {str(e)}")
+        user = self.cargar_usuario_login(email)
+        nuevo_hash = verificar_password(user.password, password)
+        if nuevo_hash:
+            self.actualizar_hash(user, nuevo_hash)
+        return self.emitir_tokens(user)
+
+    def cargar_usuario_login(self, email: str) -> Usuario:
+        """
+        Carga el usuario con su rol y permisos en una sola consulta, para emitir el
+        token sin cargas perezosas.
+        """
+        user = (
+            self.db.query(Usuario)
+            .options(joinedload(Usuario.rol).joinedload(Rol.permisos))
+            .filter(Usuario.email == email)
+            .first()
+        )
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Credenciales incorrectas. Usuario no encontrado."
+            )
+        return user
+
+    def actualizar_hash(self, usuario: Usuario, nuevo_hash: str):
+        """
+        Guarda el hash recalculado por passlib cuando el almacenado usa un esquema o
+        un costo obsoleto (needs_update).
+        """
+        usuario.password = nuevo_hash
+        self.db.commit()
+
+    def refrescar_token(self, refresh_token: str) -> dict:
+        """
+        Emite un nuevo token de acceso (y un nuevo refresh token) a partir de un
+        refresh token válido, con el rol y los permisos vigentes del usuario.
+        """
+        data = self._decodificar_token(refresh_token, tipo="refresh")
+        # Rotación: el refresh token usado deja de ser válido. Verificar y revocar es un
+        # solo paso atómico, así que de dos renovaciones simultáneas solo una prospera.
+        if not self._revocar_claims(data):
+            raise HTTPException(status_code=401, detail="Token revocado")
+        user = (
+            self.db.query(Usuario)
+            .options(joinedload(Usuario.rol).joinedload(Rol.permisos))
+            .filter(Usuario.id_usuario == data.get("id_usuario"), Usuario.email == data["email"])
+            .first()
+        )
+        if not user:
+            raise HTTPException(status_code=401, detail="Usuario no encontrado")
+        return self.emitir_tokens(user)
+
+    def emitir_tokens(self, usuario: Usuario) -> dict:
+        """Genera el token de acceso con los claims del usuario y su refresh token."""
+        return {
+            "access_token": self._generar_token({
+                "username": usuario.nombre,
+                "email": usuario.email,
+                "id_usuario": usuario.id_usuario,
+                "id_rol": usuario.id_rol,
+                "rol": usuario.rol.nombre,
+                "rol_version": usuario.rol.version,
+                "permisos": [p.nombre for p in usuario.rol.permisos],
+            }),
+            "refresh_token": self._generar_token(
+                {"email": usuario.email, "id_usuario": usuario.id_usuario, "tipo": "refresh"},
+                timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+            ),
+            "token_type": "bearer",
+        }
 
-    
 
     def crear_usuario(self, nombre: str, email: str, password: str, rol_id: int) -> Usuario:
         """
@@ -65,33 +142,111 @@ class SeguridadManager:
             self.db.add(new_user)
             self.db.commit()
             self.db.refresh(new_user)
+            destinatarios_cache.invalidar()
             return new_user
         except SQLAlchemyError as e:
             raise Exception(f"Error creando usuario: {str(e)}")
 
     def validar_token(self, token: str) -> Usuario:
         """Valida el token JWT y devuelve el usuario autenticado."""
-        try:
-            data = decode(token, key=SECRET_KEY, algorithms=["HS256"])
-            email = data.get("email")
-            if not email:
-                raise HTTPException(status_code=401, detail="Token inválido")
-            
-            usuario = self.db.query(Usuario).filter(Usuario.email == email).first()
-            if not usuario:
-                raise HTTPException(status_code=401, detail="Usuario no encontrado")
-            return usuario
-        except exceptions.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token expirado")
-        except exceptions.DecodeError:
+        data = self._decodificar_token(token)
+        usuario = self.db.query(Usuario).filter(Usuario.email == data["email"]).first()
+        if not usuario:
+            raise HTTPException(status_code=401, detail="Usuario no encontrado")
+        return usuario
+
+    def obtener_usuario_autenticado(self, token: str) -> UsuarioActual:
+        """
+        Valida el token y resuelve el usuario con su rol y permisos en una sola consulta.
+        """
+        data = self._decodificar_token(token)
+        if PERMISOS_DESDE_TOKEN and data.get("id_rol") is not None and data.get("rol_version") is not None:
+            return self._usuario_desde_claims(data)
+
+        usuario = (
+            self.db.query(Usuario)
+            .options(joinedload(Usuario.rol).joinedload(Rol.permisos))
+            .filter(Usuario.email == data["email"])
+            .first()
+        )
+        if not usuario:
+            raise HTTPException(status_code=401, detail="Usuario no encontrado")
+
+        rol = usuario.rol
+        permisos = frozenset(p.nombre for p in rol.permisos) if rol else frozenset()
+        if rol:
+            rol_cache.guardar(rol.id_rol, rol.version, permisos)
+        return UsuarioActual(
+            id_usuario=usuario.id_usuario,
+            nombre=usuario.nombre,
+            email=usuario.email,
+            id_rol=usuario.id_rol,
+            rol=rol.nombre if rol else None,
+            permisos=permisos,
+        )
+
+    def _usuario_desde_claims(self, data: dict) -> UsuarioActual:
+        """
+        Construye el usuario a partir de los claims firmados del token.
+
+        Los permisos del token solo se aceptan si la versión del rol coincide con la
+        de la caché; si el rol cambió después de emitir el token, se usan los permisos
+        vigentes. La base de datos solo se consulta cuando el rol no está en caché.
+        """
+        id_rol = data["id_rol"]
+        version_token = data["rol_version"]
+        entrada = rol_cache.obtener(id_rol)
+        if entrada is None or entrada[0] < version_token:
+            entrada = self._cargar_rol(id_rol)
+
+        version, permisos_vigentes = entrada
+        permisos = frozenset(data.get("permisos", [])) if version == version_token else permisos_vigentes
+        return UsuarioActual(
+            id_usuario=data.get("id_usuario"),
+            nombre=data.get("username"),
+            email=data["email"],
+            id_rol=id_rol,
+            rol=data.get("rol"),
+            permisos=permisos,
+        )
+
+    def _cargar_rol(self, id_rol: int) -> tuple:
+        """
+        Carga la versión y los permisos de un rol y los guarda en la caché.
+        """
+        rol = self.db.query(Rol).options(joinedload(Rol.permisos)).filter(Rol.id_rol == id_rol).first()
+        if not rol:
             raise HTTPException(status_code=401, detail="Token inválido")
+        permisos = frozenset(p.nombre for p in rol.permisos)
+        rol_cache.guardar(rol.id_rol, rol.version, permisos)
+        return rol.version, permisos
 
     def revocar_token(self, token: str):
         """
-        Revoca un token (si fuera necesario implementar un mecanismo de lista negra).
+        Revoca un token de acceso o un refresh token hasta su vencimiento, agregando
+        su jti a la lista de revocación.
+        """
+        data = self._decodificar_token(token, tipo=None)
+        self._revocar_claims(data)
+
+    def cerrar_sesion(self, token_acceso: str, refresh_token: Optional[str] = None):
+        """
+        Revoca el token de acceso y, si se indica, el refresh token, que debe
+        pertenecer al mismo usuario.
         """
-        # Aquí se puede implementar lógica para invalidar tokens si es necesario.
-        pass
+        acceso = self._decodificar_token(token_acceso)
+        refresco = self._decodificar_token(refresh_token, tipo="refresh") if refresh_token else None
+        if refresco is not None and refresco.get("id_usuario") != acceso.get("id_usuario"):
+            raise HTTPException(status_code=403, detail="El refresh token no pertenece al usuario autenticado.")
+        self._revocar_claims(acceso)
+        if refresco is not None:
+            self._revocar_claims(refresco)
+
+    def _revocar_claims(self, data: dict) -> bool:
+        """Revoca el jti de los claims; retorna False si ya estaba revocado."""
+        if not data.get("jti"):
+            raise HTTPException(status_code=400, detail="El token no admite revocación.")
+        return tokens_revocados.revocar(data["jti"], data["exp"])
 
     # Métodos privados
     def _validar_formato_password(self, password: str) -> bool:
@@ -115,18 +270,41 @@ class SeguridadManager:
         user = self.db.query(Usuario).filter(Usuario.email == email).first()
         return user is not None
 
-    def _generar_token(self, data: dict) -> str:
+    def _decodificar_token(self, token: str, tipo: Optional[str] = "acceso") -> dict:
+        """
+        Decodifica el token JWT y verifica que contenga el email del usuario, que sea
+        del tipo esperado (un refresh token no sirve como token de acceso ni viceversa;
+        None acepta ambos) y que no haya sido revocado.
+        """
+        try:
+            data = decode(token, key=SECRET_KEY, algorithms=[ALGORITHM])
+        except exceptions.ExpiredSignatureError:
+            raise HTTPException(status_code=401, detail="Token expirado")
+        except exceptions.DecodeError:
+            raise HTTPException(status_code=401, detail="Token inválido")
+        if not data.get("email") or (tipo is not None and data.get("tipo", "acceso") != tipo):
+            raise HTTPException(status_code=401, detail="Token inválido")
+        try:
+            revocado = tokens_revocados.esta_revocado(data.get("jti"))
+        except RevocacionNoDisponibleError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        if revocado:
+            raise HTTPException(status_code=401, detail="Token revocado")
+        return data
+
+    def _generar_token(self, data: dict, vigencia: timedelta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)) -> str:
         """
         Genera un token JWT.
         """
         to_encode = data.copy()
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        to_encode.update({"exp": expire})
-        print(SECRET_KEY)
+        expire = datetime.utcnow() + vigencia
+        to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
         return encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     
-    def verificar_permisos(self, usuario: Usuario, permiso: str) -> bool:
+    def verificar_permisos(self, usuario: Usuario | UsuarioActual, permiso: str) -> bool:
         """Verifica si el usuario tiene el permiso especificado."""
+        if isinstance(usuario, UsuarioActual):
+            return usuario.tiene_permiso(permiso)
         if not usuario.rol or not usuario.rol.permisos:
             return False
         permisos = [p.nombre for p in usuario.rol.permisos]  # Lista de nombres de permisos
@@ -151,3 +329,41 @@ class SeguridadManager:
             return [UsuarioResponse.from_orm(user) for user in users]
         except Exception as e:
             raise ValueError(f"Error al obtener los usuarios: {str(e)}")
+
+
+def verificar_password(hash_almacenado: str, password: str) -> Optional[str]:
+    """
+    Verifica la contraseña con bcrypt y lanza 401 si no coincide. Si el hash usa un
+    esquema o costo obsoleto, devuelve el hash recalculado para guardarlo.
+    """
+    valido, nuevo_hash = pwd_context.verify_and_update(password, hash_almacenado)
+    if not valido:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Credenciales incorrectas. Contraseña inválida."
+        )
+    return nuevo_hash
+
+
+class SeguridadManagerAsync:
+    """
+    Variante asíncrona del inicio de sesión.
+
+    Las consultas usan la AsyncSession mediante run_sync y la verificación bcrypt se
+    ejecuta en bcrypt_executor, de modo que un pico de inicios de sesión no bloquea
+    el event loop ni agota el threadpool de las rutas síncronas.
+    """
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def autenticar_usuario(self, email: str, password: str) -> dict:
+        usuario = await self.db.run_sync(lambda sesion: SeguridadManager(sesion).cargar_usuario_login(email))
+        nuevo_hash = await asyncio.get_running_loop().run_in_executor(
+            bcrypt_executor, verificar_password, usuario.password, password
+        )
+        if nuevo_hash:
+            await self.db.run_sync(lambda sesion: SeguridadManager(sesion).actualizar_hash(usuario, nuevo_hash))
+        return SeguridadManager(None).emitir_tokens(usuario)
+
+    async def refrescar_token(self, refresh_token: str) -> dict:
+        return await self.db.run_sync(lambda sesion: SeguridadManager(sesion).refrescar_token(refresh_token))
@@ -0,0 +1,154 @@
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.models import Pedido, PedidoDetalle, VentaResumen
+
+# Estados en los que un pedido cuenta como venta en el resumen
+ESTADOS_VENTA = frozenset(
+    estado.strip() for estado in os.getenv("VENTAS_ESTADOS", "preparado,entregado,pagado").split(",") if estado.strip()
+)
+
+# Filas por lote al reconstruir el resumen
+FILAS_POR_BLOQUE_RECONSTRUCCION = 1000
+
+Linea = Tuple[int, int, float]
+
+
+def truncar_hora(fecha: datetime) -> datetime:
+    return fecha.replace(minute=0, second=0, microsecond=0)
+
+
+class VentasManager:
+    """
+    Mantiene la tabla VentaResumen (sucursal, plato, hora) de forma incremental.
+
+    Un pedido suma al resumen al entrar en un estado de venta y resta al salir de él,
+    en la misma transacción que el cambio del pedido.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def lineas_pedido(self, id_pedido: int) -> List[Linea]:
+        """Líneas (id_plato, cantidad, precio_unitario) actuales del pedido."""
+        return [
+            (fila.id_plato, fila.cantidad, float(fila.precio_unitario or 0))
+            for fila in self.db.execute(
+                select(PedidoDetalle.id_plato, PedidoDetalle.cantidad, PedidoDetalle.precio_unitario)
+                .where(PedidoDetalle.id_pedido == id_pedido)
+            )
+        ]
+
+    def registrar_cambio(self, pedido: Pedido, estado_anterior: Optional[str], lineas_anteriores: Optional[List[Linea]] = None):
+        """
+        Ajusta el resumen tras un cambio del pedido. `lineas_anteriores` se indica solo
+        si también cambiaron los detalles; None significa que son las actuales.
+        """
+        contaba = estado_anterior in ESTADOS_VENTA
+        cuenta = pedido.estado in ESTADOS_VENTA
+        if not contaba and not cuenta:
+            return
+        if contaba and cuenta and lineas_anteriores is None:
+            return
+
+        lineas_actuales = self.lineas_pedido(pedido.id_pedido)
+        if contaba:
+            self._aplicar(pedido, lineas_actuales if lineas_anteriores is None else lineas_anteriores, -1)
+        if cuenta:
+            self._aplicar(pedido, lineas_actuales, 1)
+
+    def registrar_eliminacion(self, pedido: Pedido):
+        """Descuenta del resumen un pedido que se va a eliminar (antes de borrar sus detalles)."""
+        if pedido.estado in ESTADOS_VENTA:
+            self._aplicar(pedido, self.lineas_pedido(pedido.id_pedido), -1)
+
+    def reconstruir(self, desde: Optional[datetime] = None) -> int:
+        """
+        Recalcula el resumen a partir de Pedido/PedidoDetalle, completo o desde una fecha.
+        Las filas se leen por lotes y el resumen se inserta por lotes. Devuelve las filas escritas.
+        """
+        if desde is not None:
+            desde = truncar_hora(desde)
+
+        borrado = delete(VentaResumen)
+        consulta = (
+            select(Pedido.id_sucursal, Pedido.fecha, PedidoDetalle.id_plato, PedidoDetalle.cantidad, PedidoDetalle.precio_unitario)
+            .join(PedidoDetalle, PedidoDetalle.id_pedido == Pedido.id_pedido)
+            .where(Pedido.estado.in_(ESTADOS_VENTA))
+        )
+        if desde is not None:
+            borrado = borrado.where(VentaResumen.hora >= desde)
+            consulta = consulta.where(Pedido.fecha >= desde)
+
+        acumulado: Dict[tuple, list] = defaultdict(lambda: [0, 0.0])
+        for fila in self.db.execute(consulta.execution_options(yield_per=FILAS_POR_BLOQUE_RECONSTRUCCION)):
+            if fila.fecha is None:
+                continue
+            totales = acumulado[(fila.id_sucursal, fila.id_plato, truncar_hora(fila.fecha))]
+            totales[0] += fila.cantidad
+            totales[1] += fila.cantidad * float(fila.precio_unitario or 0)
+
+        self.db.execute(borrado)
+        filas = [
+            {"id_sucursal": id_sucursal, "id_plato": id_plato, "hora": hora, "cantidad": cantidad, "ingresos": ingresos}
+            for (id_sucursal, id_plato, hora), (cantidad, ingresos) in acumulado.items()
+        ]
+        for inicio in range(0, len(filas), FILAS_POR_BLOQUE_RECONSTRUCCION):
+            self.db.execute(insert(VentaResumen), filas[inicio:inicio + FILAS_POR_BLOQUE_RECONSTRUCCION])
+        self.db.commit()
+        return len(filas)
+
+    def _aplicar(self, pedido: Pedido, lineas: Iterable[Linea], signo: int):
+        """Suma (o resta) las líneas del pedido en su hora, con un upsert por plato."""
+        if pedido.fecha is None or not isinstance(pedido.fecha, datetime):
+            self.db.refresh(pedido, ["fecha"])
+        hora = truncar_hora(pedido.fecha)
+
+        por_plato: Dict[int, list] = defaultdict(lambda: [0, 0.0])
+        for id_plato, cantidad, precio_unitario in lineas:
+            por_plato[id_plato][0] += signo * cantidad
+            por_plato[id_plato][1] += signo * cantidad * precio_unitario
+        if not por_plato:
+            return
+
+        filas = [
+            {"id_sucursal": pedido.id_sucursal, "id_plato": id_plato, "hora": hora, "cantidad": cantidad, "ingresos": ingresos}
+            for id_plato, (cantidad, ingresos) in por_plato.items()
+        ]
+        self._upsert(filas)
+
+    def _upsert(self, filas: List[dict]):
+        """INSERT ... ON DUPLICATE KEY / ON CONFLICT que acumula cantidad e ingresos."""
+        tabla = VentaResumen.__table__
+        dialecto = self.db.get_bind().dialect.name
+        if dialecto == "mysql":
+            sentencia = mysql.insert(tabla)
+            sentencia = sentencia.on_duplicate_key_update(
+                cantidad=tabla.c.cantidad + sentencia.inserted.cantidad,
+                ingresos=tabla.c.ingresos + sentencia.inserted.ingresos,
+            )
+        elif dialecto in ("sqlite", "postgresql"):
+            sentencia = (sqlite if dialecto == "sqlite" else postgresql).insert(tabla)
+            sentencia = sentencia.on_conflict_do_update(
+                index_elements=[tabla.c.id_sucursal, tabla.c.id_plato, tabla.c.hora],
+                set_={
+                    "cantidad": tabla.c.cantidad + sentencia.excluded.cantidad,
+                    "ingresos": tabla.c.ingresos + sentencia.excluded.ingresos,
+                },
+            )
+        else:
+            # Otros motores: actualizar y, si la fila no existía, insertarla
+            for fila in filas:
+                resultado = self.db.execute(
+                    update(tabla)
+                    .where(tabla.c.id_sucursal == fila["id_sucursal"], tabla.c.id_plato == fila["id_plato"], tabla.c.hora == fila["hora"])
+                    .values(cantidad=tabla.c.cantidad + fila["cantidad"], ingresos=tabla.c.ingresos + fila["ingresos"])
+                )
+                if resultado.rowcount == 0:
+                    self.db.execute(insert(tabla).values(**fila))
+            return
+        self.db.execute(sentencia, filas)
@@ -1 +1 @@
-from .jwt_bearer import JWTBearer
+from .jwt_bearer import JWTBearer, get_usuario_actual, get_usuario_actual_async, requiere_permiso
@@ -1,13 +1,86 @@
-from fastapi import FastAPI, Request,Response
-from starlette.middleware.base import BaseHTTPMiddleware, DispatchFunction, RequestResponseEndpoint
+import traceback
+from datetime import datetime
+from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
+from sqlalchemy.exc import NoResultFound, SQLAlchemyError
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.middlewares.metricas import plantilla_ruta
+from app.models.registro_error import RegistroError
+from app.utils.escritura_lotes import EscrituraPorLotes
+from app.utils.metricas import registro_metricas
 
-class ErrorHandler(BaseHTTPMiddleware):
-    def __init__(self, app:FastAPI) -> None:
-        super().__init__(app)    
-        
-    async def dispatch(self, request: Request, call_next) -> Response | JSONResponse:
+# Errores del servidor pendientes de guardar en Registroerror
+registro_errores = EscrituraPorLotes(RegistroError.__table__, "registro-errores")
+registro_metricas.registrar_exportador(registro_errores.exportar_metricas)
+
+
+def registrar_error(request: Request, error: Exception):
+    """Encola el error para guardarlo en Registroerror con el usuario y la ruta de la petición."""
+    usuario = getattr(request.state, "usuario", None)
+    registro_errores.registrar({
+        "id_usuario": usuario.id_usuario if usuario is not None else None,
+        "mensaje": "".join(traceback.format_exception(type(error), error, error.__traceback__)),
+        "fecha": datetime.utcnow(),
+        "modulo": f"{request.method} {plantilla_ruta(request.scope)}"[:100],
+    })
+
+
+async def valor_invalido(request: Request, error: ValueError) -> JSONResponse:
+    return JSONResponse(status_code=400, content={"detail": str(error)})
+
+
+async def no_encontrado(request: Request, error: NoResultFound) -> JSONResponse:
+    return JSONResponse(status_code=404, content={"detail": str(error)})
+
+
+async def error_base_datos(request: Request, error: SQLAlchemyError) -> JSONResponse:
+    registrar_error(request, error)
+    # El detalle puede incluir la sentencia SQL; solo se guarda en el registro
+    return JSONResponse(status_code=500, content={"error": "Error de base de datos."})
+
+
+async def error_inesperado(request: Request, error: Exception) -> JSONResponse:
+    registrar_error(request, error)
+    return JSONResponse(status_code=500, content={"error": str(error)})
+
+
+class ErrorHandler:
+    """
+    Middleware ASGI puro para las excepciones que ningún manejador tradujo.
+
+    Se registra por dentro de CORSMiddleware para que el 500 lleve los encabezados
+    CORS (el manejador de Exception de Starlette corre en ServerErrorMiddleware, por
+    fuera de CORS). No envuelve `send`: en una petición exitosa solo agrega el
+    bloque try. Si la respuesta ya había comenzado, el 500 no se puede enviar y se
+    relanza la excepción original.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         try:
-            return await call_next(request)
-        except Exception as e: 
-            return JSONResponse(status_code = 500, content={'error': str(e)})
\ No newline at end of file
+            await self.app(scope, receive, send)
+        except Exception as error:
+            respuesta = await error_inesperado(Request(scope), error)
+            try:
+                await respuesta(scope, receive, send)
+            except Exception:
+                raise error
+
+
+def registrar_manejadores_error(app: FastAPI):
+    """
+    Registra los manejadores que traducen las excepciones de los facades a respuestas
+    HTTP: ValueError -> 400, NoResultFound -> 404 y SQLAlchemyError -> 500, guardando
+    esta última en Registroerror por lotes. Las demás excepciones las atiende
+    ErrorHandler, que debe agregarse antes que CORSMiddleware.
+
+    Los manejadores solo se ejecutan cuando hay una excepción.
+    """
+    app.add_exception_handler(ValueError, valor_invalido)
+    app.add_exception_handler(NoResultFound, no_encontrado)
+    app.add_exception_handler(SQLAlchemyError, error_base_datos)
@@ -1,33 +1,57 @@
-from fastapi.security import HTTPBearer
-from fastapi import Request, HTTPException
-from app.managers.seguridad_manager import SeguridadManager
-from app.utils.database import DatabaseManager
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi import Depends, HTTPException, Request
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.managers.seguridad_manager import SeguridadManager
+from app.security.principal import UsuarioActual
+from app.utils.database import get_async_db, get_db
+
 
 class JWTBearer(HTTPBearer):
     """
-    Clase para la verificación de tokens JWT en las rutas protegidas.
+    Esquema Bearer para las rutas protegidas: extrae el token del encabezado Authorization.
     """
-    async def __call__(self, request: Request):
-        # Obtener las credenciales del encabezado Authorization
-        auth = await super().__call__(request)
-        
-        # Obtener la sesión de base de datos
-        db_instance = DatabaseManager.get_instance()
-        db: Session = db_instance.SessionLocal()
 
-        try:
-            # Crear el SecurityManager con la sesión de base de datos
-            seguridad_manager = SeguridadManager(db)
 
-            # Validar el token y devolver el objeto Usuario
-            usuario = seguridad_manager.validar_token(auth.credentials)
-            
+jwt_bearer = JWTBearer()
+
+
+def get_usuario_actual(
+    request: Request,
+    credenciales: HTTPAuthorizationCredentials = Depends(jwt_bearer),
+    db: Session = Depends(get_db),
+) -> UsuarioActual:
+    """
+    Dependencia de autenticación: decodifica el token una sola vez y resuelve el
+    usuario con sus permisos. Comparte la sesión de base de datos con la ruta.
+    El usuario queda en request.state para el registro de errores.
+    """
+    request.state.usuario = SeguridadManager(db).obtener_usuario_autenticado(credenciales.credentials)
+    return request.state.usuario
 
-            # Verificar que el usuario exista
-            if not usuario:
-                raise HTTPException(status_code=403, detail="Usuario no encontrado o token inválido")
 
-            return usuario  # Retornar el objeto Usuario
-        finally:
-            db.close()
+async def get_usuario_actual_async(
+    request: Request,
+    credenciales: HTTPAuthorizationCredentials = Depends(jwt_bearer),
+    db: AsyncSession = Depends(get_async_db),
+) -> UsuarioActual:
+    """
+    Variante asíncrona de get_usuario_actual para las rutas async: la consulta se
+    ejecuta con el driver asíncrono sin bloquear el event loop.
+    """
+    request.state.usuario = await db.run_sync(
+        lambda sesion: SeguridadManager(sesion).obtener_usuario_autenticado(credenciales.credentials)
+    )
+    return request.state.usuario
+
+
+def requiere_permiso(permiso: str, mensaje: str, autenticacion=get_usuario_actual):
+    """
+    Crea una dependencia que exige el permiso indicado al usuario autenticado.
+    Las rutas async deben pasar autenticacion=get_usuario_actual_async.
+    """
+    async def verificar(usuario: UsuarioActual = Depends(autenticacion)) -> UsuarioActual:
+        if not usuario.tiene_permiso(permiso):
+            raise HTTPException(status_code=403, detail=mensaje)
+        return usuario
+    return verificar
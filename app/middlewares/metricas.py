@@ -0,0 +1,62 @@
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.utils.metricas import MedicionPeticion, medicion_actual, registro_metricas
+
+
+class MetricasMiddleware:
+    """
+    Middleware ASGI puro que mide cada petición HTTP: latencia, sentencias SQL y
+    tiempo en base de datos, agrupados por la plantilla de la ruta (p. ej.
+    /api/platos/{id_plato}) para no crear una serie por cada identificador.
+
+    A diferencia de BaseHTTPMiddleware, no envuelve la respuesta en otra tarea ni
+    la vuelve a transmitir, por lo que el costo por petición es mínimo.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        medicion = MedicionPeticion()
+        token = medicion_actual.set(medicion)
+        estado = 500
+        inicio = time.perf_counter()
+
+        async def enviar(mensaje: Message):
+            nonlocal estado
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracion = time.perf_counter() - inicio
+            medicion_actual.reset(token)
+            registro_metricas.registrar_peticion(scope["method"], plantilla_ruta(scope), estado, duracion, medicion)
+
+
+def plantilla_ruta(scope: Scope) -> str:
+    """
+    Plantilla completa de la ruta atendida, o "sin_ruta" si ninguna coincidió.
+
+    El enrutador deja en el scope la ruta original del router incluido, cuya
+    plantilla no lleva el prefijo con el que se registró en main.py; el prefijo se
+    recupera como la parte de la URL anterior al tramo que coincide con la ruta.
+    """
+    ruta = scope.get("route")
+    plantilla = getattr(ruta, "path_format", None)
+    expresion = getattr(ruta, "path_regex", None)
+    if plantilla is None or expresion is None:
+        return "sin_ruta"
+    camino = scope["path"]
+    inicio = camino.find("/")
+    while inicio != -1:
+        if expresion.match(camino[inicio:]):
+            return camino[:inicio] + plantilla
+        inicio = camino.find("/", inicio + 1)
+    return plantilla
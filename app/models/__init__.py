@@ -11,4 +11,4 @@ from .pedido import Pedido
 from .pedido_detalle import PedidoDetalle
 from. registro_auditoria import RegistroAuditoria
 from .registro_error import RegistroError
-
+from .venta_resumen import VentaResumen
@@ -12,11 +12,16 @@ class Inventario(Base):
     id_sucursal = Column(Integer, ForeignKey("Sucursal.id_sucursal"))
     cantidad_disponible = Column(Integer, nullable=False)
     cantidad_maxima = Column(Integer, nullable=False)
+    # Umbral de alerta de stock bajo; si es NULL se usa el 25% de la cantidad máxima
+    umbral_stock_bajo = Column(Integer, nullable=True)
     fecha_ultima_actualizacion = Column(TIMESTAMP, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Versión para bloqueo optimista: toda modificación la incrementa
+    version = Column(Integer, nullable=False, default=1, server_default="1")
    
     producto = relationship("Producto", back_populates="inventarios")
     sucursal = relationship("Sucursal", back_populates="inventarios")
     
     __table_args__ = (
         UniqueConstraint("id_producto", "id_sucursal", name="unique_producto_sucursal"),
-    )
\ No newline at end of file
+    )
+    __mapper_args__ = {"version_id_col": version}
\ No newline at end of file
@@ -1,6 +1,6 @@
 from app.utils.database import Base
 from sqlalchemy import (
-    Column, String, Integer, ForeignKey, TIMESTAMP
+    Column, String, Integer, ForeignKey, TIMESTAMP, Index, DECIMAL
 )
 from sqlalchemy.orm import relationship
 
@@ -12,6 +12,15 @@ class Pedido(Base):
     estado = Column(String(50), nullable=False)
     fecha = Column(TIMESTAMP, nullable=False)
     id_sucursal = Column(Integer, ForeignKey("Sucursal.id_sucursal"))
+    # Totales materializados; se mantienen al escribir los detalles del pedido
+    total = Column(DECIMAL(10, 2), nullable=False, default=0, server_default="0")
+    cantidad_items = Column(Integer, nullable=False, default=0, server_default="0")
 
     sucursal = relationship("Sucursal", back_populates="pedidos")
     detalles = relationship("PedidoDetalle", back_populates="pedido")
+
+    # Índices para el listado paginado por cursor con filtros
+    __table_args__ = (
+        Index("ix_pedido_sucursal_estado_id", "id_sucursal", "estado", "id_pedido"),
+        Index("ix_pedido_fecha", "fecha"),
+    )
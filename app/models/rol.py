@@ -9,6 +9,8 @@ class Rol(Base):
     __tablename__ = "Rol"
     id_rol = Column(Integer, primary_key=True, autoincrement=True)
     nombre = Column(String(50), unique=True, nullable=False)
+    # Se incrementa al cambiar los permisos del rol para invalidar los tokens emitidos
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     permisos = relationship("Permiso", secondary="RolPermiso", back_populates="roles")
     usuarios = relationship("Usuario", back_populates="rol")
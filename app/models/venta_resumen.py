@@ -0,0 +1,18 @@
+from app.utils.database import Base
+from sqlalchemy import (
+    Column, Integer, ForeignKey, TIMESTAMP, DECIMAL, Index
+)
+
+# Tabla VentaResumen: ventas agregadas por sucursal, plato y hora
+class VentaResumen(Base):
+    __tablename__ = "VentaResumen"
+    id_sucursal = Column(Integer, ForeignKey("Sucursal.id_sucursal"), primary_key=True)
+    id_plato = Column(Integer, ForeignKey("Plato.id_plato"), primary_key=True)
+    hora = Column(TIMESTAMP, primary_key=True)
+    cantidad = Column(Integer, nullable=False, default=0)
+    ingresos = Column(DECIMAL(12, 2), nullable=False, default=0)
+
+    # Los reportes filtran por rango de horas
+    __table_args__ = (
+        Index("ix_venta_resumen_hora", "hora"),
+    )
@@ -1,20 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from app.utils.database import DatabaseManager
+from app.utils.database import get_db
+from app.utils import auditoria as acciones
+from app.utils.auditoria import auditoria
 from app.facades.administracion_facade import AdministrationFacade
 from app.schemas.user_schema import UsuarioCreate, RolBase, UsuarioResponse
 
 router = APIRouter()
 
-# Dependencia para obtener la sesión de la base de datos
-def get_db():
-    db_instance = DatabaseManager.get_instance()
-    db = db_instance.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/", response_model=UsuarioResponse)
 def create_user(user_data: UsuarioCreate, db: Session = Depends(get_db)):
     """Crea un nuevo usuario."""
@@ -31,10 +24,15 @@ def get_all_users(db: Session = Depends(get_db)):
 def create_role(role_data: RolBase, db: Session = Depends(get_db)):
     """Crea un nuevo rol."""
     facade = AdministrationFacade(db)
-    return facade.create_role(role_data)
+    respuesta = facade.create_role(role_data)
+    # Estas rutas no exigen autenticación, por lo que el evento queda sin usuario
+    auditoria.registrar(None, acciones.ROL_CREADO, nombre=role_data.nombre)
+    return respuesta
 
 @router.post("/roles/{role_id}/permisos", response_model=dict)
 def assign_permissions(role_id: int, permissions: list[int], db: Session = Depends(get_db)):
     """Asigna permisos a un rol."""
     facade = AdministrationFacade(db)
-    return facade.assign_permissions_to_role(role_id, permissions)
+    respuesta = facade.assign_permissions_to_role(role_id, permissions)
+    auditoria.registrar(None, acciones.ROL_PERMISOS_ASIGNADOS, id_rol=role_id, permisos=permissions)
+    return respuesta
@@ -1,24 +1,38 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.utils.database import DatabaseManager
-from app.managers.seguridad_manager import SeguridadManager
-from app.schemas.auth_schema import Token
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.utils.database import get_async_db
+from app.middlewares.jwt_bearer import jwt_bearer
+from app.managers.seguridad_manager import SeguridadManager, SeguridadManagerAsync
+from app.schemas.auth_schema import Token, RefreshTokenRequest
 
 router = APIRouter()
 
-# Dependencia para obtener la sesión de la base de datos
-def get_db():
-    db_instance = DatabaseManager.get_instance()
-    db = db_instance.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-        
 @router.post("/token", response_model=Token)
-def login(username: str, password: str, db: Session = Depends(get_db)):
-    """Autentica un usuario y devuelve un token."""
-    manager = SeguridadManager(db)
-    token = manager.autenticar_usuario(email=username, password=password)
-    return Token(access_token=token, token_type="bearer")
+async def login(username: str, password: str, db: AsyncSession = Depends(get_async_db)):
+    """
+    Autentica un usuario y devuelve un token de acceso y un refresh token.
+    La verificación bcrypt se ejecuta en un pool dedicado, fuera del event loop.
+    """
+    manager = SeguridadManagerAsync(db)
+    return await manager.autenticar_usuario(email=username, password=password)
 
+@router.post("/refresh", response_model=Token)
+async def refrescar_token(datos: RefreshTokenRequest, db: AsyncSession = Depends(get_async_db)):
+    """Renueva el token de acceso con un refresh token, sin volver a enviar la contraseña."""
+    manager = SeguridadManagerAsync(db)
+    return await manager.refrescar_token(datos.refresh_token)
+
+@router.post("/logout", response_model=dict)
+async def logout(
+    datos: Optional[RefreshTokenRequest] = None,
+    credenciales: HTTPAuthorizationCredentials = Depends(jwt_bearer),
+):
+    """
+    Cierra la sesión: revoca el token de acceso del encabezado y, si se envía, el
+    refresh token (que debe ser del mismo usuario), hasta su vencimiento.
+    """
+    manager = SeguridadManager(None)
+    manager.cerrar_sesion(credenciales.credentials, datos.refresh_token if datos is not None else None)
+    return {"message": "Sesión cerrada."}
@@ -1,100 +1,61 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
-from app.middlewares.jwt_bearer import JWTBearer
-from app.utils.database import DatabaseManager
+from app.middlewares.jwt_bearer import requiere_permiso
+from app.security.principal import UsuarioActual
+from app.utils.database import get_db
+from app.utils.respuestas import respuesta_catalogo
 from app.facades.categoria_facade import CategoriaFacade
 from app.schemas import CategoriaCreate, CategoriaResponse
-from app.managers.seguridad_manager import SeguridadManager
-from fastapi.security import OAuth2PasswordBearer
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 router = APIRouter()
 
-def get_db():
-    db_instance = DatabaseManager.get_instance()
-    db = db_instance.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-@router.post("/", response_model=CategoriaResponse,  dependencies=[Depends(JWTBearer())])
+@router.post("/", response_model=CategoriaResponse)
 def crear_categoria(
     categoria_data: CategoriaCreate,
     db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Crear Categoría", "No tienes permisos para crear categorías.")),
 ):
     """Crea una nueva categoría."""
-    security_manager = SeguridadManager(db)
-    usuario_actual = security_manager.validar_token(token)
-
-    if not security_manager.verificar_permisos(usuario_actual, "Crear Categoría"):
-        raise HTTPException(status_code=403, detail="No tienes permisos para crear categorías.")
-
     facade = CategoriaFacade(db)
     return facade.crear_categoria(categoria_data)
 
-@router.get("/", response_model=list[CategoriaResponse],  dependencies=[Depends(JWTBearer())])
+@router.get("/", response_model=list[CategoriaResponse])
 def listar_categorias(
+    request: Request,
     db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Listar Categorías", "No tienes permisos para listar categorías.")),
 ):
-    """Lista todas las categorías."""
-    security_manager = SeguridadManager(db)
-    usuario_actual = security_manager.validar_token(token)
-
-    if not security_manager.verificar_permisos(usuario_actual, "Listar Categorías"):
-        raise HTTPException(status_code=403, detail="No tienes permisos para listar categorías.")
-
+    """Lista todas las categorías; responde 304 si If-None-Match coincide con el ETag vigente."""
     facade = CategoriaFacade(db)
-    return facade.listar_categorias()
+    return respuesta_catalogo(request, facade.listar_categorias_catalogo())
 
-@router.get("/{id_categoria}", response_model=CategoriaResponse,  dependencies=[Depends(JWTBearer())])
+@router.get("/{id_categoria}", response_model=CategoriaResponse)
 def obtener_categoria(
     id_categoria: int,
     db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Consultar Categoría", "No tienes permisos para consultar categorías.")),
 ):
     """Obtiene una categoría por su ID."""
-    security_manager = SeguridadManager(db)
-    usuario_actual = security_manager.validar_token(token)
-
-    if not security_manager.verificar_permisos(usuario_actual, "Consultar Categoría"):
-        raise HTTPException(status_code=403, detail="No tienes permisos para consultar categorías.")
-
     facade = CategoriaFacade(db)
     return facade.obtener_categoria(id_categoria)
 
-@router.put("/{id_categoria}", response_model=CategoriaResponse,  dependencies=[Depends(JWTBearer())])
+@router.put("/{id_categoria}", response_model=CategoriaResponse)
 def actualizar_categoria(
     id_categoria: int,
     categoria_data: CategoriaCreate,
     db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Actualizar Categoría", "No tienes permisos para actualizar categorías.")),
 ):
     """Actualiza una categoría."""
-    security_manager = SeguridadManager(db)
-    usuario_actual = security_manager.validar_token(token)
-
-    if not security_manager.verificar_permisos(usuario_actual, "Actualizar Categoría"):
-        raise HTTPException(status_code=403, detail="No tienes permisos para actualizar categorías.")
-
     facade = CategoriaFacade(db)
     return facade.actualizar_categoria(id_categoria, categoria_data)
 
-@router.delete("/{id_categoria}",  dependencies=[Depends(JWTBearer())])
+@router.delete("/{id_categoria}")
 def eliminar_categoria(
     id_categoria: int,
     db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Eliminar Categoría", "No tienes permisos para eliminar categorías.")),
 ):
     """Elimina una categoría."""
-    security_manager = SeguridadManager(db)
-    usuario_actual = security_manager.validar_token(token)
-
-    if not security_manager.verificar_permisos(usuario_actual, "Eliminar Categoría"):
-        raise HTTPException(status_code=403, detail="No tienes permisos para eliminar categorías.")
-
     facade = CategoriaFacade(db)
     return facade.eliminar_categoria(id_categoria)
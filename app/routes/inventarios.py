@@ -1,147 +1,173 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
 from sqlalchemy.orm import Session
-from app.middlewares.jwt_bearer import JWTBearer
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.middlewares.jwt_bearer import get_usuario_actual_async, requiere_permiso
+from app.security.principal import UsuarioActual
+from app.utils import auditoria as acciones
+from app.utils.auditoria import auditoria
 from app.schemas.inventario_schema import InventarioDetalleResponse
-from app.utils.database import DatabaseManager
-from app.facades.inventario_facade import InventarioFacade
-from app.schemas import InventarioCreate, InventarioUpdate, InventarioResponse
-from fastapi.security import OAuth2PasswordBearer
-from app.managers.seguridad_manager import SeguridadManager
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
+from app.utils.database import get_async_db, get_db
+from app.facades.inventario_facade import InventarioFacade, InventarioFacadeAsync, leer_conteo
+from app.schemas import InventarioCreate, InventarioUpdate, InventarioResponse, RecepcionItem, MovimientoInventarioLoteResponse, ValoracionInventarioResponse
 
 router = APIRouter()
 
-def get_db():
-    db_instance = DatabaseManager.get_instance()
-    db = db_instance.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Límites de las operaciones masivas de inventario
+MAX_ITEMS_RECEPCION = 1000
+MAX_FILAS_CONTEO = 20000
 
-@router.post("/", response_model=InventarioResponse, dependencies=[Depends(JWTBearer())])
+@router.post("/", response_model=InventarioResponse)
 def crear_inventario(
     inventario_data: InventarioCreate,
     db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Crear Inventario", "No tienes permisos para crear inventario.")),
 ):
-    seguridad_manager = SeguridadManager(db)
-    usuario_actual = seguridad_manager.validar_token(token)
-
-    if not seguridad_manager.verificar_permisos(usuario_actual, "Crear Inventario"):
-        raise HTTPException(status_code=403, detail="No tienes permisos para crear inventario.")
-
     facade = InventarioFacade(db)
     return facade.crear_inventario(
         inventario_data.id_producto,
         inventario_data.id_sucursal,
         inventario_data.cantidad_disponible,
         inventario_data.cantidad_maxima,
+        inventario_data.umbral_stock_bajo,
     )
 
-@router.put("/{id_inventario}", response_model=InventarioResponse, dependencies=[Depends(JWTBearer())])
+@router.put("/{id_inventario}", response_model=InventarioResponse)
 def actualizar_inventario(
     id_inventario: int,
     inventario_data: InventarioUpdate,
     db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Actualizar Inventario", "No tienes permisos para actualizar inventario.")),
 ):
     """Actualiza un registro de inventario."""
-    seguridad_manager = SeguridadManager(db)
-    usuario_actual = seguridad_manager.validar_token(token)
-
-    if not seguridad_manager.verificar_permisos(usuario_actual, "Actualizar Inventario"):
-        raise HTTPException(status_code=403, detail="No tienes permisos para actualizar inventario.")
-
     facade = InventarioFacade(db)
     return facade.actualizar_inventario(
         id_inventario,
         inventario_data.cantidad_disponible,
         inventario_data.cantidad_maxima,
+        inventario_data.umbral_stock_bajo,
     )
 
-@router.get("/sucursal/{id_sucursal}", response_model=List[InventarioDetalleResponse], dependencies=[Depends(JWTBearer())])
-def obtener_inventario_por_sucursal(
+@router.get("/sucursal/{id_sucursal}", response_model=List[InventarioDetalleResponse])
+async def obtener_inventario_por_sucursal(
     id_sucursal: int,
-    db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Consultar Inventario", "No tienes permisos para consultar inventario.", get_usuario_actual_async)),
 ):
     """Obtiene el inventario detallado de una sucursal."""
-    seguridad_manager = SeguridadManager(db)
-    usuario_actual = seguridad_manager.validar_token(token)
+    facade = InventarioFacadeAsync(db)
+    return await facade.obtener_inventario_con_detalles(id_sucursal)
 
-    if not seguridad_manager.verificar_permisos(usuario_actual, "Consultar Inventario"):
-        raise HTTPException(status_code=403, detail="No tienes permisos para consultar inventario.")
+
+@router.post("/sucursal/{id_sucursal}/recepcion", response_model=MovimientoInventarioLoteResponse)
+def recepcionar_lote(
+    id_sucursal: int,
+    items: List[RecepcionItem],
+    db: Session = Depends(get_db),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Actualizar Inventario", "No tienes permisos para actualizar inventario.")),
+):
+    """
+    Recepciona una entrega completa (varios productos) en una sucursal, en una sola
+    transacción, con un reporte por ítem.
+    """
+    if len(items) > MAX_ITEMS_RECEPCION:
+        raise HTTPException(status_code=400, detail=f"La recepción no puede superar {MAX_ITEMS_RECEPCION} ítems.")
 
     facade = InventarioFacade(db)
-    return facade.obtener_inventario_con_detalles(id_sucursal)
+    reporte = facade.recepcionar_lote(id_sucursal, items)
+    if reporte["aplicados"]:
+        auditoria.registrar(
+            usuario_actual, acciones.INVENTARIO_RECIBIDO, id_sucursal=id_sucursal,
+            aplicados=reporte["aplicados"], fallidos=reporte["fallidos"],
+            items=[item.model_dump() for item in items],
+        )
+    return reporte
+
+@router.post("/conteo", response_model=MovimientoInventarioLoteResponse)
+def importar_conteo(
+    archivo: UploadFile = File(...),
+    formato: str = "csv",
+    db: Session = Depends(get_db),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Actualizar Inventario", "No tienes permisos para actualizar inventario.")),
+):
+    """
+    Importa un conteo físico de inventario desde un archivo CSV o NDJSON con las columnas
+    id_sucursal, id_producto, cantidad_disponible y opcionalmente cantidad_maxima.
+    """
+    if formato not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="El formato debe ser 'csv' o 'ndjson'.")
 
+    facade = InventarioFacade(db)
+    try:
+        reporte = facade.importar_conteo(leer_conteo(archivo.file, formato), max_filas=MAX_FILAS_CONTEO)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    auditoria.registrar(
+        usuario_actual, acciones.INVENTARIO_CONTEO_IMPORTADO, archivo=archivo.filename,
+        aplicados=reporte["aplicados"], fallidos=reporte["fallidos"],
+    )
+    return reporte
 
-@router.delete("/{id_inventario}", dependencies=[Depends(JWTBearer())])
+@router.delete("/{id_inventario}")
 def eliminar_inventario(
     id_inventario: int,
     db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Eliminar Inventario", "No tienes permisos para eliminar inventario.")),
 ):
     """Elimina un registro de inventario."""
-    seguridad_manager = SeguridadManager(db)
-    usuario_actual = seguridad_manager.validar_token(token)
-
-    if not seguridad_manager.verificar_permisos(usuario_actual, "Eliminar Inventario"):
-        raise HTTPException(status_code=403, detail="No tienes permisos para eliminar inventario.")
-
     facade = InventarioFacade(db)
     facade.eliminar_inventario(id_inventario)
     return {"message": f"Inventario con ID {id_inventario} eliminado exitosamente."}
 
-@router.get("/{id_inventario}", response_model=InventarioDetalleResponse, dependencies=[Depends(JWTBearer())])
-def obtener_inventario_por_id(
+@router.get("/valoracion", response_model=ValoracionInventarioResponse)
+async def valorizar_inventario(
+    id_sucursal: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Consultar Inventario", "No tienes permisos para consultar inventario.", get_usuario_actual_async)),
+):
+    """
+    Valorización del inventario con subtotales por categoría y totales por sucursal,
+    de una sucursal o de todas si no se indica.
+    """
+    facade = InventarioFacadeAsync(db)
+    return await facade.valorizar_inventario(id_sucursal)
+
+@router.get("/{id_inventario}", response_model=InventarioDetalleResponse)
+async def obtener_inventario_por_id(
     id_inventario: int,
-    db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Consultar Inventario", "No tienes permisos para consultar inventario.", get_usuario_actual_async)),
 ):
     """
     Obtiene un inventario específico por su ID.
     """
-    seguridad_manager = SeguridadManager(db)
-    usuario_actual = seguridad_manager.validar_token(token)
-
-    if not seguridad_manager.verificar_permisos(usuario_actual, "Consultar Inventario"):
-        raise HTTPException(status_code=403, detail="No tienes permisos para consultar inventario.")
-
-    facade = InventarioFacade(db)
+    facade = InventarioFacadeAsync(db)
     try:
-        return facade.obtener_inventario_por_id(id_inventario)
+        return await facade.obtener_inventario_por_id(id_inventario)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/{id_inventario}/recepcionar", response_model=InventarioResponse, dependencies=[Depends(JWTBearer())])
+@router.post("/{id_inventario}/recepcionar", response_model=InventarioResponse)
 def recepcionar_unidades(
     id_inventario: int,
     cantidad: int,
     db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Actualizar Inventario", "No tienes permisos para actualizar inventario.")),
 ):
     """
     Recepciona unidades al inventario.
     """
-    seguridad_manager = SeguridadManager(db)
-    usuario_actual = seguridad_manager.validar_token(token)
-
-    if not seguridad_manager.verificar_permisos(usuario_actual, "Actualizar Inventario"):
-        raise HTTPException(status_code=403, detail="No tienes permisos para actualizar inventario.")
-
     facade = InventarioFacade(db)
     try:
-        return facade.recepcionar_unidades(id_inventario, cantidad)
+        inventario = facade.recepcionar_unidades(id_inventario, cantidad)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    auditoria.registrar(usuario_actual, acciones.INVENTARIO_RECIBIDO, id_inventario=id_inventario, cantidad=cantidad)
+    return inventario
 
 
 
@@ -1,151 +1,184 @@
 import os
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.adapters.email_adapter import EmailAdapter
-from app.middlewares.jwt_bearer import JWTBearer
-from app.utils.database import DatabaseManager
-from app.facades.pedido_facade import PedidoFacade
-from app.schemas import PedidoCreate, PedidoUpdate, PedidoResponse
-from app.managers.seguridad_manager import SeguridadManager
-from fastapi.security import OAuth2PasswordBearer
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
+from app.adapters.email_queue import ColaCorreos
+from app.middlewares.jwt_bearer import get_usuario_actual_async, requiere_permiso
+from app.security.principal import UsuarioActual
+from app.utils import auditoria as acciones
+from app.utils.auditoria import auditoria
+from app.utils.database import DatabaseManager, get_async_db, get_db
+from app.utils.metricas import registro_metricas
+from app.facades.pedido_facade import PedidoFacade, PedidoFacadeAsync
+from app.schemas import PedidoCreate, PedidoUpdate, PedidoResponse, PedidoLoteResponse
 
 router = APIRouter()
 
-def get_db():
-    db_instance = DatabaseManager.get_instance()
-    db = db_instance.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Máximo de pedidos aceptados en una sola sincronización por lote
+MAX_PEDIDOS_LOTE = 500
+# Tamaño máximo de página del listado de pedidos
+MAX_PEDIDOS_PAGINA = 100
 
-# Inicializar el adaptador de correo
-email_adapter = EmailAdapter(
+TIPOS_EXPORTACION = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# Inicializar el adaptador de correo: los correos se encolan y se envían en segundo plano
+email_adapter = ColaCorreos(EmailAdapter(
     sender_email=os.getenv("EMAIL_SENDER"),
     password=os.getenv("EMAIL_PASSWORD")
-)
+))
+registro_metricas.registrar_exportador(email_adapter.exportar_metricas)
 
-@router.post("/", response_model=PedidoResponse, dependencies=[Depends(JWTBearer())])
-def registrar_pedido(
+@router.post("/", response_model=PedidoResponse)
+async def registrar_pedido(
     pedido_data: PedidoCreate,
-    db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Registrar Pedidos u Órdenes", "No tienes permisos para registrar pedidos.", get_usuario_actual_async)),
 ):
-    
     """Registra un nuevo pedido."""
-    security_manager = SeguridadManager(db)
-    usuario_actual = security_manager.validar_token(token)
+    facade = PedidoFacadeAsync(db, email_adapter)
 
-    if not security_manager.verificar_permisos(usuario_actual, "Registrar Pedidos u Órdenes"):
-        raise HTTPException(status_code=403, detail="No tienes permisos para registrar pedidos.")
+    pedido = await facade.crear_pedido(pedido_data)
+    auditoria.registrar_sin_espera(usuario_actual, acciones.PEDIDO_CREADO, id_pedido=pedido["id_pedido"], total=pedido["total"])
+    return pedido
 
-    facade = PedidoFacade(db, email_adapter)
+@router.post("/lote", response_model=PedidoLoteResponse)
+def registrar_pedidos_lote(
+    pedidos_data: List[PedidoCreate],
+    db: Session = Depends(get_db),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Registrar Pedidos u Órdenes", "No tienes permisos para registrar pedidos.")),
+):
+    """
+    Registra varios pedidos en una sola transacción (p. ej. un POS que se sincroniza).
+    Devuelve el resultado de cada pedido según su posición en la lista.
+    """
+    if len(pedidos_data) > MAX_PEDIDOS_LOTE:
+        raise HTTPException(status_code=400, detail=f"El lote no puede superar {MAX_PEDIDOS_LOTE} pedidos.")
 
-    return facade.crear_pedido(pedido_data)
+    facade = PedidoFacade(db, email_adapter)
+    lote = facade.crear_pedidos_lote(pedidos_data)
+    for resultado in lote["resultados"]:
+        if resultado["id_pedido"] is not None:
+            auditoria.registrar(usuario_actual, acciones.PEDIDO_CREADO, id_pedido=resultado["id_pedido"], lote=True)
+    return lote
 
-@router.put("/{id_pedido}", response_model=PedidoResponse, dependencies=[Depends(JWTBearer())])
+@router.put("/{id_pedido}", response_model=PedidoResponse)
 def actualizar_pedido(
     id_pedido: int,
     pedido_data: PedidoUpdate,
     db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Actualizar Pedido", "No tienes permisos para actualizar pedidos.")),
 ):
     """
     Actualiza un pedido existente.
     """
-    # Validar el token y permisos
-    security_manager = SeguridadManager(db)
-    usuario_actual = security_manager.validar_token(token)
-
-    if not security_manager.verificar_permisos(usuario_actual, "Actualizar Pedido"):
-        raise HTTPException(status_code=403, detail="No tienes permisos para actualizar pedidos.")
-
     # Actualizar pedido usando el facade
     facade = PedidoFacade(db, email_adapter)
     try:
-        return facade.actualizar_pedido(id_pedido, pedido_data)
+        pedido = facade.actualizar_pedido(id_pedido, pedido_data)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Error interno del servidor.")
+    auditoria.registrar(usuario_actual, acciones.PEDIDO_ACTUALIZADO, id_pedido=id_pedido, estado=pedido_data.estado)
+    return pedido
 
-@router.get("/", response_model=list[PedidoResponse], dependencies=[Depends(JWTBearer())])
+@router.get("/", response_model=list[PedidoResponse])
 def listar_pedidos(
+    response: Response,
+    id_sucursal: Optional[int] = None,
+    estado: Optional[str] = None,
+    fecha_desde: Optional[datetime] = None,
+    fecha_hasta: Optional[datetime] = None,
+    cursor: Optional[int] = None,
+    limite: int = Query(50, ge=1, le=MAX_PEDIDOS_PAGINA),
     db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Listar Pedidos", "No tienes permisos para listar pedidos.")),
 ):
-    """Lista todos los pedidos."""
-    security_manager = SeguridadManager(db)
-    usuario_actual = security_manager.validar_token(token)
-
-    if not security_manager.verificar_permisos(usuario_actual, "Listar Pedidos"):
-        raise HTTPException(status_code=403, detail="No tienes permisos para listar pedidos.")
-
+    """
+    Lista los pedidos por páginas, del más reciente al más antiguo.
+    Si hay más resultados, el encabezado X-Siguiente-Cursor contiene el cursor de la siguiente página.
+    """
     facade = PedidoFacade(db, email_adapter)
 
-    return facade.listar_pedidos()
-
-@router.get("/{id_pedido}", response_model=PedidoResponse, dependencies=[Depends(JWTBearer())])
+    pagina = facade.listar_pedidos(id_sucursal, estado, fecha_desde, fecha_hasta, cursor, limite)
+    if pagina["siguiente_cursor"] is not None:
+        response.headers["X-Siguiente-Cursor"] = str(pagina["siguiente_cursor"])
+    return pagina["pedidos"]
+
+@router.get("/exportar")
+def exportar_pedidos(
+    formato: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    nivel: str = Query("pedidos", pattern="^(pedidos|lineas)$"),
+    id_sucursal: Optional[int] = None,
+    fecha_desde: Optional[datetime] = None,
+    fecha_hasta: Optional[datetime] = None,
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Listar Pedidos", "No tienes permisos para listar pedidos.")),
+):
+    """
+    Exporta pedidos o líneas de pedido en NDJSON o CSV como una respuesta en streaming.
+    """
+    def generar():
+        # La exportación usa su propia sesión: debe seguir abierta mientras se envía la respuesta
+        db = DatabaseManager.get_instance().SessionLocal()
+        try:
+            facade = PedidoFacade(db, email_adapter)
+            yield from facade.exportar_pedidos(formato, nivel, id_sucursal, fecha_desde, fecha_hasta)
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        generar(),
+        media_type=TIPOS_EXPORTACION[formato],
+        headers={"Content-Disposition": f"attachment; filename=pedidos_{nivel}.{formato}"},
+    )
+
+@router.get("/{id_pedido}", response_model=PedidoResponse)
 def obtener_pedido(
     id_pedido: int,
     db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Consultar Pedido", "No tienes permisos para consultar pedidos.")),
 ):
     """Obtiene un pedido por su ID."""
-    security_manager = SeguridadManager(db)
-    usuario_actual = security_manager.validar_token(token)
-
-    if not security_manager.verificar_permisos(usuario_actual, "Consultar Pedido"):
-        raise HTTPException(status_code=403, detail="No tienes permisos para consultar pedidos.")
-
     facade = PedidoFacade(db, email_adapter)
 
     return facade.obtener_pedido(id_pedido)
 
-@router.put("/{id_pedido}/estado", response_model=PedidoResponse, dependencies=[Depends(JWTBearer())])
-def actualizar_estado_pedido(
+@router.put("/{id_pedido}/estado", response_model=PedidoResponse)
+async def actualizar_estado_pedido(
     id_pedido: int,
     estado: str,
-    db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Actualizar Pedido", "No tienes permisos para actualizar el pedido.", get_usuario_actual_async)),
 ):
     """Actualiza el estado de un pedido."""
-    seguridad_manager = SeguridadManager(db)
-    usuario_actual = seguridad_manager.validar_token(token)
-
-    if not seguridad_manager.verificar_permisos(usuario_actual, "Actualizar Pedido"):
-        raise HTTPException(status_code=403, detail="No tienes permisos para actualizar el pedido.")
-
     # Inicializar el PedidoFacade
-    pedido_facade = PedidoFacade(db, email_adapter)
+    pedido_facade = PedidoFacadeAsync(db, email_adapter)
 
     # Actualizar el estado del pedido
     try:
-        pedido = pedido_facade.actualizar_estado_pedido(id_pedido, estado)
-        print(pedido)
-        return pedido_facade.obtener_pedido_response(pedido)
+        pedido = await pedido_facade.actualizar_estado_pedido(id_pedido, estado)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    auditoria.registrar_sin_espera(usuario_actual, acciones.PEDIDO_ESTADO_CAMBIADO, id_pedido=id_pedido, estado=estado)
+    return pedido
 
 
 
-@router.delete("/{id_pedido}", dependencies=[Depends(JWTBearer())])
+@router.delete("/{id_pedido}")
 def eliminar_pedido(
     id_pedido: int,
     db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Eliminar Pedido", "No tienes permisos para eliminar pedidos.")),
 ):
     """Elimina un pedido."""
-    security_manager = SeguridadManager(db)
-    usuario_actual = security_manager.validar_token(token)
-
-    if not security_manager.verificar_permisos(usuario_actual, "Eliminar Pedido"):
-        raise HTTPException(status_code=403, detail="No tienes permisos para eliminar pedidos.")
-
     facade = PedidoFacade(db, email_adapter)
 
-    return facade.eliminar_pedido(id_pedido)
+    respuesta = facade.eliminar_pedido(id_pedido)
+    auditoria.registrar(usuario_actual, acciones.PEDIDO_ELIMINADO, id_pedido=id_pedido)
+    return respuesta
 
 
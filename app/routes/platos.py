@@ -1,110 +1,84 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
-from app.middlewares.jwt_bearer import JWTBearer
+from app.middlewares.jwt_bearer import get_usuario_actual, requiere_permiso
+from app.security.principal import UsuarioActual
 from app.schemas.plato_schema import PlatoPreparadoResponse
-from app.utils.database import DatabaseManager
+from app.utils.database import get_db
+from app.utils.respuestas import respuesta_catalogo
 from app.facades.plato_facade import PlatoFacade
+from app.cache.receta_cache import receta_cache
 from app.schemas import PlatoCreate, PlatoUpdate, PlatoResponse
-from app.managers.seguridad_manager import SeguridadManager
-from fastapi.security import OAuth2PasswordBearer
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 router = APIRouter()
 
-def get_db():
-    db_instance = DatabaseManager.get_instance()
-    db = db_instance.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-@router.post("/", response_model=PlatoResponse, dependencies=[Depends(JWTBearer())])
+@router.post("/", response_model=PlatoResponse)
 def crear_plato(
     plato_data: PlatoCreate,
     db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Crear Plato", "No tienes permisos para crear platos.")),
 ):
     """Crea un nuevo plato."""
-    security_manager = SeguridadManager(db)
-    usuario_actual = security_manager.validar_token(token)
-
-    if not security_manager.verificar_permisos(usuario_actual, "Crear Plato"):
-        raise HTTPException(status_code=403, detail="No tienes permisos para crear platos.")
-
     facade = PlatoFacade(db)
     return facade.crear_plato(plato_data)
 
-@router.get("/", response_model=list[PlatoResponse], dependencies=[Depends(JWTBearer())])
+@router.get("/", response_model=list[PlatoResponse])
 def listar_platos(
+    request: Request,
     db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Listar Platos", "No tienes permisos para listar platos.")),
 ):
-    """Lista todos los platos."""
-    security_manager = SeguridadManager(db)
-    usuario_actual = security_manager.validar_token(token)
-    print(usuario_actual)
-    if not security_manager.verificar_permisos(usuario_actual, "Listar Platos"):
-        raise HTTPException(status_code=403, detail="No tienes permisos para listar platos.")
-
+    """Lista todos los platos; responde 304 si If-None-Match coincide con el ETag vigente."""
     facade = PlatoFacade(db)
-    return facade.listar_platos()
+    return respuesta_catalogo(request, facade.listar_platos_catalogo())
 
-@router.get("/{id_plato}", response_model=PlatoResponse, dependencies=[Depends(JWTBearer())])
+@router.get("/{id_plato}", response_model=PlatoResponse)
 def obtener_plato(
     id_plato: int,
     db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Consultar Plato", "No tienes permisos para consultar platos.")),
 ):
     """Obtiene un plato por su ID."""
-    security_manager = SeguridadManager(db)
-    usuario_actual = security_manager.validar_token(token)
-
-    if not security_manager.verificar_permisos(usuario_actual, "Consultar Plato"):
-        raise HTTPException(status_code=403, detail="No tienes permisos para consultar platos.")
-
     facade = PlatoFacade(db)
-    return facade.obtener_plato(id_plato)
+    return facade.obtener_plato_response(id_plato)
 
-@router.put("/{id_plato}", response_model=PlatoResponse, dependencies=[Depends(JWTBearer())])
+@router.put("/{id_plato}", response_model=PlatoResponse)
 def actualizar_plato(
     id_plato: int,
     plato_data: PlatoUpdate,
     db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Actualizar Plato", "No tienes permisos para actualizar platos.")),
 ):
     """Actualiza un plato."""
-    security_manager = SeguridadManager(db)
-    usuario_actual = security_manager.validar_token(token)
-
-    if not security_manager.verificar_permisos(usuario_actual, "Actualizar Plato"):
-        raise HTTPException(status_code=403, detail="No tienes permisos para actualizar platos.")
-
     facade = PlatoFacade(db)
     return facade.actualizar_plato(id_plato, plato_data)
 
-@router.delete("/{id_plato}", dependencies=[Depends(JWTBearer())])
+@router.delete("/{id_plato}")
 def eliminar_plato(
     id_plato: int,
     db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Eliminar Plato", "No tienes permisos para eliminar platos.")),
 ):
     """Elimina un plato."""
-    security_manager = SeguridadManager(db)
-    usuario_actual = security_manager.validar_token(token)
-
-    if not security_manager.verificar_permisos(usuario_actual, "Eliminar Plato"):
-        raise HTTPException(status_code=403, detail="No tienes permisos para eliminar platos.")
-
     facade = PlatoFacade(db)
     return facade.eliminar_plato(id_plato)
 
-@router.get("/acciones/preparables", response_model=List[PlatoPreparadoResponse], dependencies=[Depends(JWTBearer())])
-def listar_platos_preparables(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
-    """Lista los platos que se pueden preparar según el inventario."""
+@router.get("/acciones/preparables", response_model=List[PlatoPreparadoResponse])
+def listar_platos_preparables(
+    id_sucursal: int,
+    db: Session = Depends(get_db),
+    usuario_actual: UsuarioActual = Depends(get_usuario_actual),
+):
+    """Lista los platos que se pueden preparar según el inventario de la sucursal."""
     facade = PlatoFacade(db)
     try:
-        return facade.listar_platos_preparables()
+        return facade.listar_platos_preparables(id_sucursal)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/acciones/recetas/estadisticas", response_model=dict)
+def estadisticas_cache_recetas(
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Listar Platos", "No tienes permisos para listar platos.")),
+):
+    """Devuelve los contadores de aciertos y fallos de la caché de recetas."""
+    return receta_cache.estadisticas()
@@ -0,0 +1,31 @@
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from app.middlewares.jwt_bearer import requiere_permiso
+from app.security.principal import UsuarioActual
+from app.utils.database import get_db
+from app.facades.reporte_facade import ReporteFacade
+from app.schemas import VentaAgrupadaResponse
+
+router = APIRouter()
+
+@router.get("/ventas", response_model=List[VentaAgrupadaResponse], response_model_exclude_none=True)
+def reporte_ventas(
+    agrupar: List[str] = Query(["plato"]),
+    fecha_desde: Optional[datetime] = None,
+    fecha_hasta: Optional[datetime] = None,
+    id_sucursal: Optional[int] = None,
+    id_plato: Optional[int] = None,
+    db: Session = Depends(get_db),
+    usuario_actual: UsuarioActual = Depends(requiere_permiso("Consultar Reportes", "No tienes permisos para consultar reportes.")),
+):
+    """
+    Unidades vendidas e ingresos agrupados por sucursal, plato, hora y/o día
+    (p. ej. ?agrupar=sucursal&agrupar=dia).
+    """
+    facade = ReporteFacade(db)
+    try:
+        return facade.ventas(agrupar, fecha_desde, fecha_hasta, id_sucursal, id_plato)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,7 +1,8 @@
-from .auth_schema import Token
+from .auth_schema import Token, RefreshTokenRequest
 from .user_schema import UsuarioCreate, UsuarioResponse, RolBase
-from .inventario_schema import InventarioBase, InventarioUpdate, InventarioResponse, InventarioCreate, ProductoDetalle, InventarioDetalleResponse
-from .pedido_schema import PedidoCreate, PedidoResponse, PedidoUpdate, PedidoDetalleResponse
+from .inventario_schema import InventarioBase, InventarioUpdate, InventarioResponse, InventarioCreate, ProductoDetalle, InventarioDetalleResponse, RecepcionItem, MovimientoInventarioLoteResponse, ValoracionInventarioResponse
+from .pedido_schema import PedidoCreate, PedidoResponse, PedidoUpdate, PedidoDetalleResponse, PedidoLoteResponse
 from .plato_schema import PlatoCreate, PlatoResponse, PlatoUpdate, PlatoPreparadoResponse
 from .producto_schema import ProductoBase, ProductoCreate, ProductoResponse, ProductoIDs
-from .categoria_schema import CategoriaBase, CategoriaCreate, CategoriaResponse
\ No newline at end of file
+from .categoria_schema import CategoriaBase, CategoriaCreate, CategoriaResponse
+from .reporte_schema import VentaAgrupadaResponse
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from datetime import datetime
 
 class InventarioBase(BaseModel):
@@ -7,6 +7,7 @@ class InventarioBase(BaseModel):
     id_sucursal: int
     cantidad_disponible: int
     cantidad_maxima: int
+    umbral_stock_bajo: Optional[int] = None
 
 class InventarioCreate(InventarioBase):
     pass
@@ -14,6 +15,7 @@ class InventarioCreate(InventarioBase):
 class InventarioUpdate(BaseModel):
     cantidad_disponible: Optional[int]
     cantidad_maxima: Optional[int]
+    umbral_stock_bajo: Optional[int] = None
 
 class InventarioResponse(InventarioBase):
     id_inventario: int
@@ -34,9 +36,53 @@ class InventarioDetalleResponse(BaseModel):
     id_sucursal: int
     cantidad_disponible: int
     cantidad_maxima: int
+    umbral_stock_bajo: Optional[int] = None
     fecha_ultima_actualizacion: datetime
     producto: ProductoDetalle
     costo_total: float
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class RecepcionItem(BaseModel):
+    id_producto: int
+    cantidad: int = Field(..., gt=0)
+
+class MovimientoInventarioResultado(BaseModel):
+    indice: int
+    id_sucursal: Optional[int] = None
+    id_producto: Optional[int] = None
+    accion: Optional[str] = None
+    error: Optional[str] = None
+
+class MovimientoInventarioLoteResponse(BaseModel):
+    aplicados: int
+    fallidos: int
+    resultados: List[MovimientoInventarioResultado]
+
+
+class ValoracionProducto(BaseModel):
+    id_inventario: int
+    id_producto: int
+    nombre: str
+    unidad_medida: Optional[str] = None
+    precio: float
+    cantidad_disponible: float
+    costo_total: float
+
+class ValoracionCategoria(BaseModel):
+    id_categoria: Optional[int] = None
+    nombre: Optional[str] = None
+    subtotal: float
+    productos: List[ValoracionProducto]
+
+class ValoracionSucursal(BaseModel):
+    id_sucursal: int
+    nombre: str
+    total: float
+    categorias: List[ValoracionCategoria]
+
+class ValoracionInventarioResponse(BaseModel):
+    total_general: float
+    sucursales: List[ValoracionSucursal]
@@ -33,3 +33,14 @@ class PedidoResponse(PedidoBase):
 
     class Config:
         from_attributes = True
+
+
+class PedidoLoteResultado(BaseModel):
+    indice: int
+    id_pedido: Optional[int] = None
+    error: Optional[str] = None
+
+class PedidoLoteResponse(BaseModel):
+    creados: int
+    fallidos: int
+    resultados: List[PedidoLoteResultado]
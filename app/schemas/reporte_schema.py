@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class VentaAgrupadaResponse(BaseModel):
+    id_sucursal: Optional[int] = None
+    sucursal: Optional[str] = None
+    id_plato: Optional[int] = None
+    plato: Optional[str] = None
+    periodo: Optional[str] = None
+    cantidad: int
+    ingresos: float
@@ -1,10 +1,13 @@
 import os
+import uuid
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from passlib.hash import bcrypt
 from app.models.usuario import Usuario
 from app.models.rol import Rol
 from app.models.permiso import Permiso
+from app.cache.destinatarios_cache import destinatarios_cache
+from app.cache.tokens_revocados import RevocacionNoDisponibleError, tokens_revocados
 from fastapi import HTTPException
 from jwt import encode, decode, exceptions
 
@@ -42,6 +45,7 @@ class SecurityManager:
         self.db.add(user)
         self.db.commit()
         self.db.refresh(user)
+        destinatarios_cache.invalidar()
         return user
 
     def updateUsuario(self, user_id: int, user_data: dict) -> Usuario:
@@ -53,12 +57,19 @@ class SecurityManager:
             setattr(user, key, value)
         self.db.commit()
         self.db.refresh(user)
+        destinatarios_cache.invalidar()
         return user
 
     def validarToken(self, token: str) -> Usuario:
         """Valida un token JWT y devuelve el usuario correspondiente."""
         try:
             data = decode(token, key=SECRET_KEY, algorithms=["HS256"])
+            try:
+                revocado = tokens_revocados.esta_revocado(data.get("jti"))
+            except RevocacionNoDisponibleError as e:
+                raise HTTPException(status_code=503, detail=str(e))
+            if revocado:
+                raise HTTPException(status_code=401, detail="Token revocado")
             user = self.db.query(Usuario).get(data["user_id"])
             if not user:
                 raise HTTPException(status_code=401, detail="Token inválido")
@@ -69,9 +80,16 @@ class SecurityManager:
             raise HTTPException(status_code=401, detail="Token inválido")
 
     def revocarToken(self, token: str):
-        """Revoca un token (actualmente no implementado en este ejemplo)."""
-        # Aquí podríamos agregar lógica para invalidar un token almacenándolo en una lista negra.
-        raise NotImplementedError("La revocación de tokens no está implementada.")
+        """Revoca un token hasta su vencimiento agregando su jti a la lista de revocación."""
+        try:
+            data = decode(token, key=SECRET_KEY, algorithms=["HS256"])
+        except exceptions.ExpiredSignatureError:
+            raise HTTPException(status_code=401, detail="Token expirado")
+        except exceptions.DecodeError:
+            raise HTTPException(status_code=401, detail="Token inválido")
+        if not data.get("jti"):
+            raise HTTPException(status_code=400, detail="El token no admite revocación")
+        tokens_revocados.revocar(data["jti"], data["exp"])
 
     def _validarFormatoPassword(self, password: str) -> bool:
         """Valida si una contraseña cumple con un formato seguro."""
@@ -88,5 +106,5 @@ class SecurityManager:
     def _crearToken(self, data: dict, expires_in_minutes: int = 60) -> str:
         """Crea un token JWT."""
         to_encode = data.copy()
-        to_encode.update({"exp": datetime.utcnow() + timedelta(minutes=expires_in_minutes)})
+        to_encode.update({"exp": datetime.utcnow() + timedelta(minutes=expires_in_minutes), "jti": uuid.uuid4().hex})
         return encode(payload=to_encode, key=SECRET_KEY, algorithm="HS256")
@@ -0,0 +1,24 @@
+class UsuarioActual:
+    """
+    Representación compacta del usuario autenticado en una petición.
+
+    Se construye una sola vez por petición a partir del token y contiene el
+    conjunto de permisos ya resuelto, de modo que las rutas no vuelven a
+    consultar Usuario, Rol ni Permiso.
+    """
+    __slots__ = ("id_usuario", "nombre", "email", "id_rol", "rol", "permisos")
+
+    def __init__(self, id_usuario: int, nombre: str, email: str, id_rol: int, rol: str, permisos: frozenset):
+        self.id_usuario = id_usuario
+        self.nombre = nombre
+        self.email = email
+        self.id_rol = id_rol
+        self.rol = rol
+        self.permisos = permisos
+
+    def tiene_permiso(self, permiso: str) -> bool:
+        """Verifica si el usuario tiene el permiso especificado."""
+        return permiso in self.permisos
+
+    def __repr__(self):
+        return f"<UsuarioActual(id={self.id_usuario}, email={self.email}, rol={self.rol})>"
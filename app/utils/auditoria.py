@@ -0,0 +1,79 @@
+import json
+import os
+from datetime import datetime
+from typing import Any, Optional
+from app.models.registro_auditoria import RegistroAuditoria
+from app.security.principal import UsuarioActual
+from app.utils.escritura_lotes import EscrituraPorLotes
+from app.utils.metricas import registro_metricas
+
+# Eventos que se juntan antes de escribir un lote en Registroauditoria
+AUDITORIA_TAMANO_LOTE = int(os.getenv("AUDITORIA_TAMANO_LOTE", "200"))
+# Segundos máximos que un evento espera en memoria antes de escribirse
+AUDITORIA_INTERVALO = float(os.getenv("AUDITORIA_INTERVALO", "2"))
+# Eventos en memoria como máximo; por encima se aplica la espera y luego se descartan
+AUDITORIA_CAPACIDAD = int(os.getenv("AUDITORIA_CAPACIDAD", "20000"))
+# Segundos que una petición espera como máximo si la cola está llena (p. ej. base de datos caída)
+AUDITORIA_ESPERA_MAXIMA = float(os.getenv("AUDITORIA_ESPERA_MAXIMA", "0.05"))
+
+# Acciones registradas
+PEDIDO_CREADO = "pedido_creado"
+PEDIDO_ACTUALIZADO = "pedido_actualizado"
+PEDIDO_ESTADO_CAMBIADO = "pedido_estado_cambiado"
+PEDIDO_ELIMINADO = "pedido_eliminado"
+INVENTARIO_RECIBIDO = "inventario_recibido"
+INVENTARIO_CONTEO_IMPORTADO = "inventario_conteo_importado"
+ROL_CREADO = "rol_creado"
+ROL_PERMISOS_ASIGNADOS = "rol_permisos_asignados"
+
+
+class Auditoria:
+    """
+    Registro de auditoría: quién hizo qué y cuándo, en Registroauditoria.
+
+    Las rutas registran el evento después de que el facade confirmó la operación;
+    el evento solo se encola y se escribe por lotes desde un hilo en segundo plano,
+    sin agregar un commit a la petición.
+    """
+
+    def __init__(self, escritura: Optional[EscrituraPorLotes] = None):
+        self.escritura = escritura or EscrituraPorLotes(
+            RegistroAuditoria.__table__,
+            "registro-auditoria",
+            tamano_lote=AUDITORIA_TAMANO_LOTE,
+            intervalo=AUDITORIA_INTERVALO,
+            capacidad=AUDITORIA_CAPACIDAD,
+            espera_maxima=AUDITORIA_ESPERA_MAXIMA,
+        )
+
+    def registrar(self, usuario: Optional[UsuarioActual], accion: str, **detalle: Any) -> bool:
+        """
+        Encola un evento de auditoría. `detalle` se guarda como JSON. Retorna False
+        si el evento se descartó por estar la cola llena; si lo está, espera a lo sumo
+        AUDITORIA_ESPERA_MAXIMA segundos, por lo que solo debe usarse desde rutas síncronas.
+        """
+        return self.escritura.registrar(self._fila(usuario, accion, detalle))
+
+    def registrar_sin_espera(self, usuario: Optional[UsuarioActual], accion: str, **detalle: Any) -> bool:
+        """Variante para rutas async: si la cola está llena el evento se descarta y se cuenta."""
+        return self.escritura.registrar(self._fila(usuario, accion, detalle), esperar=False)
+
+    @staticmethod
+    def _fila(usuario: Optional[UsuarioActual], accion: str, detalle: dict) -> dict:
+        return {
+            "id_usuario": usuario.id_usuario if usuario is not None else None,
+            "accion": accion,
+            "fecha": datetime.utcnow(),
+            "detalle": json.dumps(detalle, default=str, ensure_ascii=False) if detalle else None,
+        }
+
+    def estadisticas(self) -> dict:
+        return self.escritura.estadisticas()
+
+    def detener(self):
+        """Escribe los eventos pendientes; se llama al apagar el servidor."""
+        self.escritura.detener()
+
+
+auditoria = Auditoria()
+registro_metricas.registrar_exportador(auditoria.escritura.exportar_metricas)
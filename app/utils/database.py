@@ -1,10 +1,17 @@
 from dotenv import load_dotenv
 import os
+import ssl
+import threading
+import time
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy import text
 from sqlalchemy.ext.declarative import declarative_base
+from typing import List
+from app.utils.metricas import Metrica, instrumentar_motor, registro_metricas
 
 # Carga las variables de entorno desde .env
 load_dotenv()
@@ -12,6 +19,23 @@ load_dotenv()
 # Obtiene la URL de la base de datos desde las variables de entorno, eliminando el parámetro ssl-mode
 DATABASE_URL = os.getenv("DATABASE_URL").replace('?ssl-mode=REQUIRED', '')
 
+
+def _url_asincrona(url: str) -> str:
+    """Deriva la URL con driver asíncrono (aiomysql / aiosqlite) a partir de la URL síncrona."""
+    equivalencias = (
+        ("mysql+pymysql://", "mysql+aiomysql://"),
+        ("mysql://", "mysql+aiomysql://"),
+        ("sqlite://", "sqlite+aiosqlite://"),
+    )
+    for sincrona, asincrona in equivalencias:
+        if url.startswith(sincrona):
+            return asincrona + url[len(sincrona):]
+    return url
+
+
+# URL para la capa asíncrona; por defecto se deriva de DATABASE_URL
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _url_asincrona(DATABASE_URL)
+
 # Configura los argumentos para SSL si es necesario
 ssl_args = {
     "ssl": {
@@ -19,9 +43,55 @@ ssl_args = {
     }
 }
 
+# Configuración del pool de conexiones (ajustar según el número de workers y el límite del servidor)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Reciclar conexiones antes de que el servidor MySQL administrado las cierre por inactividad
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
 Base = declarative_base()
 
 
+class MetricasPool:
+    """Contadores acumulados de obtención de conexiones del pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.tiempo_espera_total = 0.0
+        self.tiempo_espera_max = 0.0
+
+    def registrar(self, espera: float, timeout: bool = False):
+        with self._lock:
+            if timeout:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.tiempo_espera_total += espera
+            if espera > self.tiempo_espera_max:
+                self.tiempo_espera_max = espera
+
+
+metricas_pool = MetricasPool()
+
+
+class PoolInstrumentado(QueuePool):
+    """QueuePool que mide el tiempo de obtención de conexiones y los timeouts."""
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            conexion = super()._do_get()
+        except PoolTimeoutError:
+            metricas_pool.registrar(time.perf_counter() - inicio, timeout=True)
+            raise
+        metricas_pool.registrar(time.perf_counter() - inicio)
+        return conexion
+
+
 class DatabaseManager:
     __instance = None
 
@@ -31,10 +101,21 @@ class DatabaseManager:
         else:
             try:
                 # Inicializa la conexión con la base de datos
-                self.connection = create_engine(DATABASE_URL, connect_args=ssl_args)
+                self.connection = create_engine(
+                    DATABASE_URL,
+                    connect_args=ssl_args,
+                    poolclass=PoolInstrumentado,
+                    pool_size=DB_POOL_SIZE,
+                    max_overflow=DB_MAX_OVERFLOW,
+                    pool_timeout=DB_POOL_TIMEOUT,
+                    pool_recycle=DB_POOL_RECYCLE,
+                    pool_pre_ping=DB_POOL_PRE_PING,
+                )
+                instrumentar_motor(self.connection)
                 # Configura el SessionLocal
                 self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.connection)
                 DatabaseManager.__instance = self
+                registro_metricas.registrar_exportador(self.exportar_metricas)
             except SQLAlchemyError as e:
                 raise ConnectionError(f"Error connecting to the database: {str(e)}")
 
@@ -47,6 +128,48 @@ class DatabaseManager:
     def get_connection(self):
         return self.connection
 
+    def obtener_metricas_pool(self) -> dict:
+        """Estado actual del pool de conexiones y contadores acumulados de obtención."""
+        pool = self.connection.pool
+        metricas = {
+            "configuracion": {
+                "pool_size": DB_POOL_SIZE,
+                "max_overflow": DB_MAX_OVERFLOW,
+                "pool_timeout": DB_POOL_TIMEOUT,
+                "pool_recycle": DB_POOL_RECYCLE,
+                "pool_pre_ping": DB_POOL_PRE_PING,
+            },
+            "checkouts": metricas_pool.checkouts,
+            "timeouts": metricas_pool.timeouts,
+            "tiempo_espera_total_s": round(metricas_pool.tiempo_espera_total, 6),
+            "tiempo_espera_max_s": round(metricas_pool.tiempo_espera_max, 6),
+            "tiempo_espera_promedio_s": round(metricas_pool.tiempo_espera_total / metricas_pool.checkouts, 6) if metricas_pool.checkouts else 0.0,
+        }
+        if isinstance(pool, QueuePool):
+            metricas.update({
+                "tamano": pool.size(),
+                "en_uso": pool.checkedout(),
+                "disponibles": pool.checkedin(),
+                "overflow": pool.overflow(),
+            })
+        return metricas
+
+    def exportar_metricas(self) -> List[Metrica]:
+        """Contadores acumulados de obtención de conexiones y estado actual del pool."""
+        metricas = [
+            ("db_pool_checkouts_total", "counter", "Conexiones obtenidas del pool.", metricas_pool.checkouts),
+            ("db_pool_timeouts_total", "counter", "Timeouts al obtener una conexión del pool.", metricas_pool.timeouts),
+            ("db_pool_wait_seconds_total", "counter", "Tiempo acumulado de espera por conexiones.", metricas_pool.tiempo_espera_total),
+        ]
+        pool = self.connection.pool
+        if isinstance(pool, QueuePool):
+            metricas += [
+                ("db_pool_checked_out", "gauge", "Conexiones del pool en uso.", pool.checkedout()),
+                ("db_pool_checked_in", "gauge", "Conexiones libres en el pool.", pool.checkedin()),
+                ("db_pool_overflow", "gauge", "Conexiones de overflow abiertas.", pool.overflow()),
+            ]
+        return metricas
+
     def realizar_backup(self, backup_path: str):
         """Realiza un backup de la base de datos."""
         try:
@@ -65,4 +188,66 @@ class DatabaseManager:
                 conn.execute(text(restore_query))
             print(f"Base de datos restaurada exitosamente desde: {backup_path}")
         except SQLAlchemyError as e:
-            raise Exception(f"Error restaurando backup: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Error restaurando backup: {str(e)}")
+
+
+class AsyncDatabaseManager:
+    """
+    Variante asíncrona de DatabaseManager (AsyncEngine / AsyncSession).
+
+    Las rutas async la usan para no bloquear el event loop; la lógica de los facades
+    síncronos se reutiliza mediante AsyncSession.run_sync.
+    """
+    __instance = None
+
+    def __init__(self):
+        if AsyncDatabaseManager.__instance is not None:
+            raise Exception("This class is a singleton!")
+        try:
+            if ASYNC_DATABASE_URL.startswith("sqlite"):
+                self.connection = create_async_engine(ASYNC_DATABASE_URL)
+            else:
+                self.connection = create_async_engine(
+                    ASYNC_DATABASE_URL,
+                    connect_args={"ssl": ssl.create_default_context()},
+                    pool_size=DB_POOL_SIZE,
+                    max_overflow=DB_MAX_OVERFLOW,
+                    pool_timeout=DB_POOL_TIMEOUT,
+                    pool_recycle=DB_POOL_RECYCLE,
+                    pool_pre_ping=DB_POOL_PRE_PING,
+                )
+            instrumentar_motor(self.connection.sync_engine)
+            self.SessionLocal = sessionmaker(
+                bind=self.connection, class_=AsyncSession, autoflush=False, expire_on_commit=False
+            )
+            AsyncDatabaseManager.__instance = self
+        except SQLAlchemyError as e:
+            raise ConnectionError(f"Error connecting to the database: {str(e)}")
+
+    @staticmethod
+    def get_instance():
+        if AsyncDatabaseManager.__instance is None:
+            AsyncDatabaseManager()
+        return AsyncDatabaseManager.__instance
+
+    def get_connection(self):
+        return self.connection
+
+
+def get_db():
+    """Dependencia de FastAPI que entrega una sesión por petición.
+
+    Al ser una única función compartida, FastAPI la cachea dentro de la petición:
+    la autenticación y la ruta reutilizan la misma sesión.
+    """
+    db = DatabaseManager.get_instance().SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    """Dependencia de FastAPI que entrega una AsyncSession por petición."""
+    async with AsyncDatabaseManager.get_instance().SessionLocal() as db:
+        yield db
@@ -0,0 +1,138 @@
+import queue
+import threading
+import time
+from typing import List, Optional
+from sqlalchemy import Table, insert
+from app.utils.database import DatabaseManager
+from app.utils.metricas import Metrica
+
+
+class EscrituraPorLotes:
+    """
+    Inserta filas en una tabla desde un hilo en segundo plano, agrupadas en lotes.
+
+    Quien registra una fila solo la encola y retorna de inmediato; el hilo junta
+    hasta `tamano_lote` filas, o las que lleguen en `intervalo` segundos, y las
+    inserta con un único INSERT por lote en su propia transacción. Si la cola está
+    llena, quien registra espera a lo sumo `espera_maxima` segundos a que se libere
+    lugar y, si no lo hay, la fila se descarta; ambos casos se cuentan.
+    """
+
+    def __init__(
+        self,
+        tabla: Table,
+        nombre: str,
+        tamano_lote: int = 100,
+        intervalo: float = 1.0,
+        capacidad: int = 10000,
+        espera_maxima: float = 0.0,
+    ):
+        self.tabla = tabla
+        self.nombre = nombre
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self.espera_maxima = espera_maxima
+        self._cola: queue.Queue = queue.Queue(maxsize=capacidad)
+        self._hilo: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.escritos = 0
+        self.fallidos = 0
+        self.descartados = 0
+        self.esperas = 0
+
+    def registrar(self, fila: dict, esperar: bool = True) -> bool:
+        """
+        Encola la fila; retorna False si se descartó por estar la cola llena. Desde
+        código async debe usarse esperar=False: la espera bloquearía el event loop.
+        """
+        self._iniciar()
+        try:
+            self._cola.put_nowait(fila)
+            return True
+        except queue.Full:
+            pass
+        if esperar and self.espera_maxima > 0:
+            self.esperas += 1
+            try:
+                self._cola.put(fila, timeout=self.espera_maxima)
+                return True
+            except queue.Full:
+                pass
+        self.descartados += 1
+        return False
+
+    def pendientes(self) -> int:
+        return self._cola.qsize()
+
+    def estadisticas(self) -> dict:
+        """Contadores de filas escritas, fallidas, descartadas y esperas por cola llena."""
+        return {
+            "pendientes": self.pendientes(),
+            "capacidad": self._cola.maxsize,
+            "esperas": self.esperas,
+            "escritos": self.escritos,
+            "fallidos": self.fallidos,
+            "descartados": self.descartados,
+        }
+
+    def exportar_metricas(self) -> List[Metrica]:
+        """Métricas de Prometheus con el nombre del escritor como prefijo."""
+        prefijo = self.nombre.replace("-", "_")
+        return [
+            (f"{prefijo}_pending", "gauge", f"Filas pendientes de escribir en {self.tabla.name}.", self.pendientes()),
+            (f"{prefijo}_capacity", "gauge", "Capacidad de la cola de escritura.", self._cola.maxsize),
+            (f"{prefijo}_written_total", "counter", f"Filas escritas en {self.tabla.name}.", self.escritos),
+            (f"{prefijo}_failed_total", "counter", "Filas perdidas por un fallo al escribir el lote.", self.fallidos),
+            (f"{prefijo}_dropped_total", "counter", "Filas descartadas por estar la cola llena.", self.descartados),
+            (f"{prefijo}_backpressure_waits_total", "counter", "Veces que se esperó por la cola llena.", self.esperas),
+        ]
+
+    def detener(self, timeout: float = 10.0):
+        """Escribe las filas pendientes y detiene el hilo, esperando a lo sumo `timeout` segundos."""
+        if self._hilo is None:
+            return
+        limite = time.monotonic() + timeout
+        try:
+            self._cola.put(None, timeout=timeout)
+        except queue.Full:
+            print(f"No se pudo detener {self.nombre}: la cola sigue llena; se pierden {self.pendientes()} registros")
+        else:
+            self._hilo.join(max(0.0, limite - time.monotonic()))
+        self._hilo = None
+
+    def _iniciar(self):
+        if self._hilo is not None:
+            return
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._trabajar, name=self.nombre, daemon=True)
+                self._hilo.start()
+
+    def _trabajar(self):
+        while True:
+            lote = [self._cola.get()]
+            limite = time.monotonic() + self.intervalo
+            while len(lote) < self.tamano_lote and lote[-1] is not None:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+
+            detener = lote[-1] is None
+            self._escribir([fila for fila in lote if fila is not None])
+            if detener:
+                return
+
+    def _escribir(self, lote: List[dict]):
+        if not lote:
+            return
+        try:
+            with DatabaseManager.get_instance().connection.begin() as conexion:
+                conexion.execute(insert(self.tabla), lote)
+            self.escritos += len(lote)
+        except Exception as e:
+            self.fallidos += len(lote)
+            print(f"Error al escribir {len(lote)} registros en {self.tabla.name}: {str(e)}")
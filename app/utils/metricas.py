@@ -0,0 +1,202 @@
+import bisect
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event
+
+# Límites (en segundos) de los buckets de los histogramas de latencia y tiempo en base de datos
+METRICAS_BUCKETS = tuple(
+    float(limite) for limite in os.getenv(
+        "METRICAS_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10"
+    ).split(",")
+)
+# Límites de los buckets del histograma de sentencias SQL por petición
+METRICAS_BUCKETS_CONSULTAS = tuple(
+    float(limite) for limite in os.getenv(
+        "METRICAS_BUCKETS_CONSULTAS", "1,2,3,5,8,13,21,34,55,100"
+    ).split(",")
+)
+
+
+# Métrica suelta de un componente: (nombre, tipo, descripción, valor). El tipo es
+# "counter" para totales acumulados (su nombre termina en _total) o "gauge" para
+# valores instantáneos, como los elementos pendientes en una cola.
+Metrica = Tuple[str, str, str, float]
+
+
+class Histograma:
+    """Histograma acumulado con buckets fijos, en el formato de Prometheus."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.conteos = [0] * (len(buckets) + 1)
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float):
+        self.conteos[bisect.bisect_left(self.buckets, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+    def acumulados(self) -> List[Tuple[str, int]]:
+        lineas = []
+        acumulado = 0
+        for limite, conteo in zip(self.buckets, self.conteos):
+            acumulado += conteo
+            lineas.append((_formatear(limite), acumulado))
+        lineas.append(("+Inf", self.total))
+        return lineas
+
+
+class MedicionPeticion:
+    """Sentencias SQL y tiempo en base de datos acumulados durante una petición."""
+
+    __slots__ = ("consultas", "tiempo_db")
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo_db = 0.0
+
+
+# Medición de la petición en curso. Las rutas síncronas se ejecutan en el threadpool
+# con una copia del contexto, por lo que comparten el mismo objeto con el middleware.
+medicion_actual: ContextVar[Optional[MedicionPeticion]] = ContextVar("medicion_actual", default=None)
+
+
+class RegistroMetricas:
+    """
+    Métricas por ruta (latencia, sentencias SQL y tiempo en base de datos por petición)
+    y contadores globales de SQL, expuestas en formato de texto de Prometheus.
+
+    Los demás componentes (pool, cachés, colas) registran con `registrar_exportador`
+    una función que devuelve sus propias métricas; se evalúa en cada exportación.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencia: Dict[Tuple[str, str], Histograma] = {}
+        self._consultas: Dict[Tuple[str, str], Histograma] = {}
+        self._tiempo_db: Dict[Tuple[str, str], Histograma] = {}
+        self._peticiones: Dict[Tuple[str, str, str], int] = {}
+        self.sentencias_total = 0
+        self.sentencias_fuera_de_peticion = 0
+        self.tiempo_db_total = 0.0
+        self._exportadores: List[Callable[[], Iterable[Metrica]]] = [self._metricas_sql]
+
+    def registrar_exportador(self, exportador: Callable[[], Iterable[Metrica]]):
+        """Agrega una función que devuelve las métricas de un componente."""
+        self._exportadores.append(exportador)
+
+    def registrar_peticion(self, metodo: str, ruta: str, estado: int, duracion: float, medicion: MedicionPeticion):
+        clave = (metodo, ruta)
+        with self._lock:
+            self._histograma(self._latencia, clave, METRICAS_BUCKETS).observar(duracion)
+            self._histograma(self._consultas, clave, METRICAS_BUCKETS_CONSULTAS).observar(medicion.consultas)
+            self._histograma(self._tiempo_db, clave, METRICAS_BUCKETS).observar(medicion.tiempo_db)
+            clave_estado = (metodo, ruta, str(estado))
+            self._peticiones[clave_estado] = self._peticiones.get(clave_estado, 0) + 1
+
+    def registrar_sentencia(self, duracion: float):
+        medicion = medicion_actual.get()
+        if medicion is not None:
+            medicion.consultas += 1
+            medicion.tiempo_db += duracion
+        with self._lock:
+            self.sentencias_total += 1
+            self.tiempo_db_total += duracion
+            if medicion is None:
+                self.sentencias_fuera_de_peticion += 1
+
+    @staticmethod
+    def _histograma(histogramas: dict, clave: tuple, buckets: Tuple[float, ...]) -> Histograma:
+        histograma = histogramas.get(clave)
+        if histograma is None:
+            histograma = histogramas[clave] = Histograma(buckets)
+        return histograma
+
+    def exportar(self) -> str:
+        """Genera el texto de exposición de Prometheus."""
+        lineas: List[str] = []
+        with self._lock:
+            self._exportar_histogramas(
+                lineas, "http_request_duration_seconds", "Latencia de las peticiones HTTP por ruta.", self._latencia
+            )
+            self._exportar_histogramas(
+                lineas, "http_request_db_queries", "Sentencias SQL ejecutadas por petición.", self._consultas
+            )
+            self._exportar_histogramas(
+                lineas, "http_request_db_seconds", "Tiempo en base de datos por petición.", self._tiempo_db
+            )
+            lineas.append("# HELP http_requests_total Peticiones HTTP atendidas.")
+            lineas.append("# TYPE http_requests_total counter")
+            for (metodo, ruta, estado), total in sorted(self._peticiones.items()):
+                lineas.append(
+                    f'http_requests_total{{method="{metodo}",route="{_escapar(ruta)}",status="{estado}"}} {total}'
+                )
+        for exportador in self._exportadores:
+            try:
+                metricas = list(exportador())
+            except Exception as e:
+                # Un componente con error no debe dejar sin métricas a los demás
+                print(f"Error al exportar métricas: {str(e)}")
+                continue
+            for nombre, tipo, descripcion, valor in metricas:
+                lineas.append(f"# HELP {nombre} {descripcion}")
+                lineas.append(f"# TYPE {nombre} {tipo}")
+                lineas.append(f"{nombre} {_formatear(valor)}")
+        return "\n".join(lineas) + "\n"
+
+    def _metricas_sql(self) -> List[Metrica]:
+        with self._lock:
+            return [
+                ("db_statements_total", "counter", "Sentencias SQL ejecutadas.", self.sentencias_total),
+                ("db_statements_outside_request_total", "counter", "Sentencias SQL ejecutadas fuera de una petición HTTP.", self.sentencias_fuera_de_peticion),
+                ("db_statement_seconds_total", "counter", "Tiempo acumulado de ejecución de sentencias SQL.", self.tiempo_db_total),
+            ]
+
+    @staticmethod
+    def _exportar_histogramas(lineas: List[str], nombre: str, descripcion: str, histogramas: dict):
+        lineas.append(f"# HELP {nombre} {descripcion}")
+        lineas.append(f"# TYPE {nombre} histogram")
+        for (metodo, ruta), histograma in sorted(histogramas.items()):
+            etiquetas = f'method="{metodo}",route="{_escapar(ruta)}"'
+            for limite, acumulado in histograma.acumulados():
+                lineas.append(f'{nombre}_bucket{{{etiquetas},le="{limite}"}} {acumulado}')
+            lineas.append(f"{nombre}_sum{{{etiquetas}}} {_formatear(histograma.suma)}")
+            lineas.append(f"{nombre}_count{{{etiquetas}}} {histograma.total}")
+
+
+def _formatear(valor: float) -> str:
+    return repr(float(valor)) if not float(valor).is_integer() else str(int(valor))
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registro_metricas = RegistroMetricas()
+
+
+def instrumentar_motor(engine):
+    """
+    Registra los eventos de SQLAlchemy que cuentan y cronometran cada sentencia.
+    Para un AsyncEngine se debe pasar su `sync_engine`.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("inicio_sentencia", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _despues(conn, cursor, statement, parameters, context, executemany):
+        inicios = conn.info.get("inicio_sentencia")
+        if inicios:
+            registro_metricas.registrar_sentencia(time.perf_counter() - inicios.pop())
+
+    @event.listens_for(engine, "handle_error")
+    def _error(contexto):
+        # Descartar el inicio de una sentencia fallida para no desalinear la pila
+        conexion = contexto.connection
+        if conexion is not None and conexion.info.get("inicio_sentencia"):
+            conexion.info["inicio_sentencia"].pop()
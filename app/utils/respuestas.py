@@ -0,0 +1,39 @@
+from functools import lru_cache
+from typing import Any, Iterable, List
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from app.cache.catalogo_cache import EntradaCatalogo
+
+
+@lru_cache(maxsize=None)
+def _adaptador_lista(esquema: type) -> TypeAdapter:
+    return TypeAdapter(List[esquema])
+
+
+def serializar_lista(esquema: type, datos: Iterable[Any]) -> bytes:
+    """Serializa a JSON una lista de objetos ORM o diccionarios con el esquema de respuesta."""
+    adaptador = _adaptador_lista(esquema)
+    return adaptador.dump_json(adaptador.validate_python(list(datos), from_attributes=True))
+
+
+def _etag_coincide(if_none_match: str, etag: str) -> bool:
+    # If-None-Match usa comparación débil: se ignora el prefijo W/
+    for candidato in if_none_match.split(","):
+        candidato = candidato.strip()
+        if candidato == "*" or candidato.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def respuesta_catalogo(request: Request, entrada: EntradaCatalogo) -> Response:
+    """
+    Responde un catálogo en caché con su ETag, o 304 si el cliente ya tiene esa versión.
+
+    El catálogo no se consulta en un acierto; la autenticación de la ruta sí consulta
+    la base de datos salvo con PERMISOS_DESDE_TOKEN activo.
+    """
+    cabeceras = {"ETag": entrada.etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_coincide(if_none_match, entrada.etag):
+        return Response(status_code=304, headers=cabeceras)
+    return Response(content=entrada.cuerpo, media_type="application/json", headers=cabeceras)
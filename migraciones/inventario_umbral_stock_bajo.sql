@@ -0,0 +1,4 @@
+-- Umbral de stock bajo por fila de Inventario (Inventario.umbral_stock_bajo).
+-- NULL conserva el comportamiento anterior: 25% de la cantidad máxima.
+ALTER TABLE `Inventario`
+    ADD COLUMN `umbral_stock_bajo` INT NULL;
@@ -0,0 +1,5 @@
+-- Versión de las filas de Inventario (bloqueo optimista, Inventario.version).
+-- Las bases creadas por fuera de la aplicación deben aplicarla antes de desplegar:
+-- sin la columna, toda consulta de Inventario falla.
+ALTER TABLE `Inventario`
+    ADD COLUMN `version` INT NOT NULL DEFAULT 1;
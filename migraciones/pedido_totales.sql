@@ -0,0 +1,6 @@
+-- Totales materializados de Pedido (Pedido.total, Pedido.cantidad_items).
+-- Después de agregar las columnas, los pedidos existentes quedan en 0 hasta
+-- recalcularlos con: python -m app.commands.recalcular_totales_pedidos
+ALTER TABLE `Pedido`
+    ADD COLUMN `total` DECIMAL(10, 2) NOT NULL DEFAULT 0,
+    ADD COLUMN `cantidad_items` INT NOT NULL DEFAULT 0;
@@ -0,0 +1,16 @@
+-- Resumen de ventas por sucursal, plato y hora (VentaResumen).
+-- Después de crear la tabla se llena con: python -m app.commands.reconstruir_ventas
+-- `hora` lleva DEFAULT explícito para que MySQL no le agregue ON UPDATE
+-- CURRENT_TIMESTAMP (forma parte de la clave primaria).
+CREATE TABLE `VentaResumen` (
+    `id_sucursal` INT NOT NULL,
+    `id_plato` INT NOT NULL,
+    `hora` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    `cantidad` INT NOT NULL DEFAULT 0,
+    `ingresos` DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (`id_sucursal`, `id_plato`, `hora`),
+    FOREIGN KEY (`id_sucursal`) REFERENCES `Sucursal` (`id_sucursal`),
+    FOREIGN KEY (`id_plato`) REFERENCES `Plato` (`id_plato`)
+);
+
+CREATE INDEX `ix_venta_resumen_hora` ON `VentaResumen` (`hora`);
@@ -0,0 +1,87 @@
+import os
+import tempfile
+
+# La aplicación lee la configuración al importarse: las pruebas usan un SQLite temporal
+# (nunca la base de datos del .env), la caché en memoria y un costo de bcrypt mínimo
+_directorio = tempfile.mkdtemp(prefix="konrad-pruebas-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_directorio}/pruebas.db"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ["CACHE_BACKEND"] = "memoria"
+os.environ["BCRYPT_ROUNDS"] = "4"
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+import app.models as modelos
+from app.utils.database import Base, DatabaseManager
+from app.utils.metricas import instrumentar_motor
+
+PERMISOS_ADMIN = [
+    "Registrar Pedidos u Órdenes",
+    "Actualizar Pedido",
+    "Consultar Pedido",
+    "Listar Pedidos",
+    "Consultar Inventario",
+]
+
+
+@pytest.fixture(scope="session")
+def base_datos():
+    """Crea el esquema y los datos mínimos: un administrador, una sucursal y un plato con receta."""
+    from app.managers.seguridad_manager import pwd_context
+
+    # El motor de DatabaseManager usa argumentos SSL de MySQL; para SQLite se reemplaza
+    motor = create_engine(os.environ["DATABASE_URL"], connect_args={"check_same_thread": False})
+    instrumentar_motor(motor)
+    Base.metadata.create_all(motor)
+    manager = DatabaseManager.get_instance()
+    manager.connection = motor
+    manager.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=motor)
+
+    db = manager.SessionLocal()
+    rol = modelos.Rol(nombre="Administrador")
+    rol.permisos = [modelos.Permiso(nombre=nombre) for nombre in PERMISOS_ADMIN]
+    db.add(rol)
+    db.add(modelos.Usuario(nombre="Admin", email="admin@konrad.test", password=pwd_context.hash("Secret123"), rol=rol))
+    db.add(modelos.Sucursal(nombre="Centro", direccion="Calle 1", telefono="123"))
+    kg = modelos.UnidadMedida(nombre="kg")
+    g = modelos.UnidadMedida(nombre="g")
+    unidad = modelos.UnidadMedida(nombre="unidad")
+    db.add_all([kg, g, unidad])
+    db.flush()
+    db.add(modelos.ConversionUnidades(id_unidad_base=kg.id_unidad, id_unidad_convertida=g.id_unidad, factor_conversion=1000))
+    categoria = modelos.CategoriaProducto(nombre="Básicos")
+    db.add(categoria)
+    db.flush()
+    carne = modelos.Producto(nombre="Carne", id_categoria=categoria.id_categoria, id_unidad_medida=kg.id_unidad, precio=10)
+    pan = modelos.Producto(nombre="Pan", id_categoria=categoria.id_categoria, id_unidad_medida=unidad.id_unidad, precio=1)
+    db.add_all([carne, pan])
+    db.flush()
+    db.add(modelos.Inventario(id_producto=carne.id_producto, id_sucursal=1, cantidad_disponible=10, cantidad_maxima=20))
+    db.add(modelos.Inventario(id_producto=pan.id_producto, id_sucursal=1, cantidad_disponible=50, cantidad_maxima=100))
+    plato = modelos.Plato(nombre="Hamburguesa", descripcion="Clásica", precio=15)
+    db.add(plato)
+    db.flush()
+    db.add(modelos.PlatoProducto(id_plato=plato.id_plato, id_producto=carne.id_producto, cantidad=200, id_unidad_medida=g.id_unidad))
+    db.add(modelos.PlatoProducto(id_plato=plato.id_plato, id_producto=pan.id_producto, cantidad=2, id_unidad_medida=unidad.id_unidad))
+    db.commit()
+    db.close()
+    yield manager
+    motor.dispose()
+
+
+@pytest.fixture(scope="module")
+def cliente(base_datos):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    # Con el bloque `with` todas las peticiones comparten el event loop (y el motor aiosqlite)
+    with TestClient(app) as cliente:
+        yield cliente
+
+
+@pytest.fixture(scope="module")
+def encabezados(cliente):
+    respuesta = cliente.post("/api/auth/token", params={"username": "admin@konrad.test", "password": "Secret123"})
+    assert respuesta.status_code == 200, respuesta.text
+    return {"Authorization": f"Bearer {respuesta.json()['access_token']}"}
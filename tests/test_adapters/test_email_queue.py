@@ -0,0 +1,79 @@
+from app.adapters.email_adapter import EmailAdapter
+from app.adapters.email_queue import ColaCorreos, VentanaDeduplicacion
+
+
+class SMTPFalso:
+    """Servidor SMTP en memoria; falla los primeros `fallos` envíos."""
+
+    def __init__(self, registro: "AdaptadorFalso"):
+        self.registro = registro
+        self.cerrado = False
+
+    def sendmail(self, remitente, destinatario, contenido):
+        if self.registro.fallos > 0:
+            self.registro.fallos -= 1
+            raise OSError("conexión reiniciada")
+        self.registro.enviados.append(destinatario)
+
+    def quit(self):
+        self.cerrado = True
+
+
+class AdaptadorFalso(EmailAdapter):
+    def __init__(self, fallos: int = 0):
+        super().__init__(sender_email="alertas@konrad.test", password="")
+        self.fallos = fallos
+        self.conexiones = []
+        self.enviados = []
+
+    def conectar(self):
+        servidor = SMTPFalso(self)
+        self.conexiones.append(servidor)
+        return servidor
+
+
+def test_envia_por_lotes_con_una_conexion():
+    adaptador = AdaptadorFalso()
+    cola = ColaCorreos(adaptador, tamano_lote=3)
+
+    for indice in range(7):
+        assert cola.enviar_correo(f"jefe{indice}@konrad.test", "Alerta", "Stock bajo")
+    cola.detener(timeout=5)
+
+    assert adaptador.enviados == [f"jefe{indice}@konrad.test" for indice in range(7)]
+    assert cola.enviados == 7
+    assert len(adaptador.conexiones) == 1
+    assert adaptador.conexiones[0].cerrado
+
+
+def test_reintenta_con_una_conexion_nueva():
+    adaptador = AdaptadorFalso(fallos=2)
+    cola = ColaCorreos(adaptador, max_reintentos=3, espera_base=0)
+
+    cola.enviar_correo("jefe@konrad.test", "Alerta", "Stock bajo")
+    cola.detener(timeout=5)
+
+    assert adaptador.enviados == ["jefe@konrad.test"]
+    assert (cola.enviados, cola.fallidos) == (1, 0)
+    assert len(adaptador.conexiones) == 3
+
+
+def test_descarta_tras_agotar_los_reintentos():
+    adaptador = AdaptadorFalso(fallos=10)
+    cola = ColaCorreos(adaptador, max_reintentos=2, espera_base=0)
+
+    cola.enviar_correo("jefe@konrad.test", "Alerta", "Stock bajo")
+    cola.enviar_correo("otro@konrad.test", "Alerta", "Stock bajo")
+    cola.detener(timeout=5)
+
+    assert adaptador.enviados == []
+    assert (cola.enviados, cola.fallidos) == (0, 2)
+
+
+def test_ventana_libera_alertas_no_enviadas():
+    ventana = VentanaDeduplicacion(segundos=60)
+
+    assert ventana.filtrar_nuevas([(1, 1), (1, 2)]) == [(1, 1), (1, 2)]
+    assert ventana.filtrar_nuevas([(1, 1)]) == []
+    ventana.liberar([(1, 1)])
+    assert ventana.filtrar_nuevas([(1, 1), (1, 2)]) == [(1, 1)]
@@ -0,0 +1,66 @@
+import threading
+import time
+import fakeredis
+import pytest
+from app.cache.backend import RedisBackend
+from app.cache.catalogo_cache import CatalogoCache
+from app.cache.rol_cache import RolCache
+
+
+def _esperar(condicion, segundos: float = 2.0) -> bool:
+    limite = time.monotonic() + segundos
+    while time.monotonic() < limite:
+        if condicion():
+            return True
+        time.sleep(0.01)
+    return condicion()
+
+
+@pytest.fixture
+def workers():
+    """Dos backends sobre el mismo Redis, como dos workers de uvicorn."""
+    servidor = fakeredis.FakeServer()
+    backends = []
+    for _ in range(2):
+        backend = RedisBackend(cliente=fakeredis.FakeRedis(server=servidor), prefijo="pruebas")
+        suscrito = threading.Event()
+        backend.al_suscribirse(suscrito.set)
+        backend.suscrito = suscrito
+        backends.append(backend)
+    return backends
+
+
+def test_invalidacion_de_rol_llega_al_otro_worker(workers):
+    backend_a, backend_b = workers
+    rol_a, rol_b = RolCache(backend_a), RolCache(backend_b)
+    assert backend_b.suscrito.wait(2)
+
+    rol_a.guardar(1, 3, frozenset({"Listar Pedidos"}))
+    # El otro worker lo lee del backend compartido y lo conserva en memoria
+    assert rol_b.obtener(1) == (3, frozenset({"Listar Pedidos"}))
+
+    rol_a.invalidar(1)
+
+    assert _esperar(lambda: rol_b.obtener(1) is None)
+
+
+def test_invalidacion_de_catalogo_llega_al_otro_worker(workers):
+    backend_a, backend_b = workers
+    catalogo_a, catalogo_b = CatalogoCache(backend_a), CatalogoCache(backend_b)
+    assert backend_b.suscrito.wait(2)
+    cargas = []
+
+    def cargar(cuerpo: bytes):
+        def _cargar():
+            cargas.append(cuerpo)
+            return cuerpo
+        return _cargar
+
+    primera = catalogo_a.obtener("productos", cargar(b"[1]"))
+    # El segundo worker usa el cuerpo compartido sin cargarlo de la base de datos
+    assert catalogo_b.obtener("productos", cargar(b"[2]")).etag == primera.etag
+    assert cargas == [b"[1]"]
+
+    catalogo_a.invalidar("productos")
+
+    assert _esperar(lambda: catalogo_b.obtener("productos", cargar(b"[3]")).cuerpo == b"[3]")
@@ -0,0 +1,16 @@
+import time
+from app.cache.backend import MemoriaBackend
+from app.cache.catalogo_cache import CatalogoCache
+
+
+def test_catalogo_obsoleto_vence_en_memoria_y_en_el_backend():
+    backend = MemoriaBackend()
+    # Un worker guarda una lectura anterior a una invalidación que nunca le llegó
+    catalogo = CatalogoCache(backend, ttl=0.05)
+    assert catalogo.obtener("productos", lambda: b"[1]").cuerpo == b"[1]"
+
+    time.sleep(0.06)
+
+    # Ni la entrada local ni la compartida sobreviven al TTL: se vuelve a cargar
+    assert backend.obtener("catalogo:productos") is None
+    assert catalogo.obtener("productos", lambda: b"[1, 2]").cuerpo == b"[1, 2]"
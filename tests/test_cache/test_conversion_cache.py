@@ -0,0 +1,27 @@
+from app.cache.backend import MemoriaBackend
+from app.cache.conversion_cache import ConversionCache
+
+
+class ConsultaFalsa:
+    """Sesión mínima: devuelve las conversiones y ejecuta `durante` al consultarlas."""
+
+    def __init__(self, conversiones, durante=None):
+        self.conversiones = conversiones
+        self.durante = durante
+
+    def query(self, *columnas):
+        return self
+
+    def all(self):
+        if self.durante is not None:
+            self.durante()
+        return self.conversiones
+
+
+def test_no_guarda_una_matriz_invalidada_durante_la_construccion():
+    cache = ConversionCache(MemoriaBackend())
+    # La invalidación tras el commit llega mientras se leen las conversiones anteriores
+    anterior = ConsultaFalsa([(1, 2, 1000)], durante=lambda: cache.invalidar(difundir=False))
+
+    assert cache.factor(anterior, 1, 2) == 1000
+    assert cache.factor(ConsultaFalsa([(1, 2, 100)]), 1, 2) == 100
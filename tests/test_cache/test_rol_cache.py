@@ -0,0 +1,47 @@
+import time
+from app.cache.backend import MemoriaBackend
+from app.cache.rol_cache import RolCache
+
+
+def test_entrada_local_vence_y_se_relee_del_backend():
+    backend = MemoriaBackend()
+    cache = RolCache(backend, ttl=0.05)
+    cache.guardar(1, 2, frozenset({"Listar Pedidos"}))
+
+    # Simula un aviso de invalidación perdido: el backend cambia sin avisar
+    backend.eliminar(["rol:1"])
+    assert cache.obtener(1) == (2, frozenset({"Listar Pedidos"}))
+
+    time.sleep(0.06)
+    assert cache.obtener(1) is None
+
+
+def test_no_retrocede_de_version_mientras_la_entrada_es_vigente():
+    cache = RolCache(MemoriaBackend(), ttl=60)
+    cache.guardar(1, 3, frozenset({"Actualizar Pedido"}))
+    cache.guardar(1, 2, frozenset())
+
+    assert cache.obtener(1) == (3, frozenset({"Actualizar Pedido"}))
+
+
+class BackendContador(MemoriaBackend):
+    def __init__(self):
+        super().__init__()
+        self.escrituras = 0
+
+    def guardar(self, clave, valor, ttl=None):
+        self.escrituras += 1
+        super().guardar(clave, valor, ttl)
+
+
+def test_misma_version_no_escribe_en_el_backend():
+    backend = BackendContador()
+    cache = RolCache(backend, ttl=60)
+
+    for _ in range(100):
+        cache.guardar(1, 2, frozenset({"Listar Pedidos"}))
+    assert backend.escrituras == 1
+
+    cache.guardar(1, 3, frozenset())
+    assert backend.escrituras == 2
+    assert cache.obtener(1) == (3, frozenset())
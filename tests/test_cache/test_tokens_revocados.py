@@ -0,0 +1,42 @@
+import time
+import fakeredis
+import pytest
+from app.cache.backend import RedisBackend
+from app.cache.tokens_revocados import RevocacionNoDisponibleError, TokensRevocados
+
+
+def test_un_proceso_nuevo_reconstruye_la_lista_desde_las_claves_por_jti():
+    servidor = fakeredis.FakeServer()
+    existente = TokensRevocados(RedisBackend(cliente=fakeredis.FakeRedis(server=servidor), prefijo="pruebas"))
+    assert existente.revocar("jti-1", time.time() + 60)
+    assert not existente.revocar("jti-1", time.time() + 60)
+
+    nuevo = TokensRevocados(RedisBackend(cliente=fakeredis.FakeRedis(server=servidor), prefijo="pruebas"))
+
+    assert nuevo.esta_revocado("jti-1")
+    assert not nuevo.esta_revocado("jti-2")
+    # La revocación es atómica entre procesos: el segundo no vuelve a ganarla
+    assert not nuevo.revocar("jti-1", time.time() + 60)
+
+
+class BackendCaido(RedisBackend):
+    def __init__(self):
+        super().__init__(cliente=fakeredis.FakeRedis(server=fakeredis.FakeServer()), prefijo="pruebas")
+        self.disponible = False
+
+    def listar_vigencias(self, prefijo):
+        if not self.disponible:
+            raise ConnectionError("Redis no responde")
+        return super().listar_vigencias(prefijo)
+
+
+def test_sin_sincronizar_falla_cerrado_y_reintenta(monkeypatch):
+    monkeypatch.setattr("app.cache.tokens_revocados.SINCRONIZACION_REINTENTO_SEGUNDOS", 0)
+    backend = BackendCaido()
+    revocados = TokensRevocados(backend)
+
+    with pytest.raises(RevocacionNoDisponibleError):
+        revocados.esta_revocado("jti-1")
+
+    backend.disponible = True
+    assert not revocados.esta_revocado("jti-1")
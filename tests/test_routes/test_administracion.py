@@ -0,0 +1,23 @@
+import app.models as modelos
+
+
+def test_asignar_permisos_incrementa_la_version_del_rol(cliente, base_datos):
+    db = base_datos.SessionLocal()
+    try:
+        rol = modelos.Rol(nombre="Cajero")
+        db.add(rol)
+        db.commit()
+        id_rol = rol.id_rol
+    finally:
+        db.close()
+
+    assert cliente.post(f"/api/usuarios/roles/{id_rol}/permisos", json=[1]).status_code == 200
+    assert cliente.post(f"/api/usuarios/roles/{id_rol}/permisos", json=[2]).status_code == 200
+
+    db = base_datos.SessionLocal()
+    try:
+        rol = db.query(modelos.Rol).get(id_rol)
+        assert rol.version == 3
+        assert {permiso.id_permiso for permiso in rol.permisos} == {1, 2}
+    finally:
+        db.close()
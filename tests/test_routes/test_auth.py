@@ -0,0 +1,72 @@
+from datetime import timedelta
+from app.managers.seguridad_manager import REFRESH_TOKEN_EXPIRE_DAYS, SeguridadManager
+
+
+def _iniciar_sesion(cliente) -> dict:
+    respuesta = cliente.post("/api/auth/token", params={"username": "admin@konrad.test", "password": "Secret123"})
+    assert respuesta.status_code == 200, respuesta.text
+    return respuesta.json()
+
+
+def _bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_login_con_password_incorrecta(cliente, base_datos):
+    respuesta = cliente.post("/api/auth/token", params={"username": "admin@konrad.test", "password": "Otra1234"})
+
+    assert respuesta.status_code == 401
+
+
+def test_refresh_rota_el_token_y_rechaza_su_reutilizacion(cliente, base_datos):
+    tokens = _iniciar_sesion(cliente)
+
+    renovados = cliente.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert renovados.status_code == 200, renovados.text
+    nuevos = renovados.json()
+    assert nuevos["refresh_token"] != tokens["refresh_token"]
+    assert cliente.get("/api/pedidos/", headers=_bearer(nuevos["access_token"])).status_code == 200
+
+    # El refresh token ya usado queda revocado; el nuevo sigue sirviendo
+    reutilizado = cliente.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert reutilizado.status_code == 401
+    assert cliente.post("/api/auth/refresh", json={"refresh_token": nuevos["refresh_token"]}).status_code == 200
+
+
+def test_refresh_no_acepta_un_token_de_acceso(cliente, base_datos):
+    tokens = _iniciar_sesion(cliente)
+
+    respuesta = cliente.post("/api/auth/refresh", json={"refresh_token": tokens["access_token"]})
+
+    assert respuesta.status_code == 401
+
+
+def test_logout_revoca_el_token_de_acceso_y_el_refresh_token(cliente, base_datos):
+    tokens = _iniciar_sesion(cliente)
+    assert cliente.get("/api/pedidos/", headers=_bearer(tokens["access_token"])).status_code == 200
+
+    respuesta = cliente.post(
+        "/api/auth/logout",
+        headers=_bearer(tokens["access_token"]),
+        json={"refresh_token": tokens["refresh_token"]},
+    )
+
+    assert respuesta.status_code == 200, respuesta.text
+    revocado = cliente.get("/api/pedidos/", headers=_bearer(tokens["access_token"]))
+    assert revocado.status_code == 401
+    assert revocado.json()["detail"] == "Token revocado"
+    assert cliente.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+
+
+def test_logout_rechaza_el_refresh_token_de_otro_usuario(cliente, base_datos):
+    tokens = _iniciar_sesion(cliente)
+    ajeno = SeguridadManager(None)._generar_token(
+        {"email": "otro@konrad.test", "id_usuario": 999, "tipo": "refresh"},
+        timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+
+    respuesta = cliente.post("/api/auth/logout", headers=_bearer(tokens["access_token"]), json={"refresh_token": ajeno})
+
+    assert respuesta.status_code == 403
+    # Nada se revocó: el token de acceso sigue siendo válido
+    assert cliente.get("/api/pedidos/", headers=_bearer(tokens["access_token"])).status_code == 200
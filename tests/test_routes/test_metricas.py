@@ -0,0 +1,23 @@
+def _tipos(texto: str) -> dict:
+    return {
+        linea.split()[2]: linea.split()[3]
+        for linea in texto.splitlines()
+        if linea.startswith("# TYPE ")
+    }
+
+
+def test_metrics_expone_contadores_y_gauges(cliente, encabezados):
+    cliente.get("/api/pedidos/9999", headers=encabezados)
+
+    respuesta = cliente.get("/metrics")
+
+    assert respuesta.status_code == 200
+    tipos = _tipos(respuesta.text)
+    for nombre in ("db_pool_checkouts_total", "receta_cache_hits_total", "registro_errores_written_total",
+                   "registro_auditoria_dropped_total", "cola_correos_sent_total"):
+        assert tipos[nombre] == "counter"
+    for nombre in ("db_pool_checked_out", "revoked_tokens", "registro_auditoria_pending", "cola_correos_capacity"):
+        assert tipos[nombre] == "gauge"
+    assert "db_statements_total 0\n" not in respuesta.text
+    # Los contadores de Prometheus llevan el sufijo _total
+    assert all(nombre.endswith("_total") for nombre, tipo in tipos.items() if tipo == "counter")
@@ -0,0 +1,106 @@
+import pytest
+import app.models as modelos
+
+
+def _inventario(base_datos) -> dict:
+    db = base_datos.SessionLocal()
+    try:
+        return {fila.id_producto: fila.cantidad_disponible for fila in db.query(modelos.Inventario).filter_by(id_sucursal=1)}
+    finally:
+        db.close()
+
+
+def test_registrar_pedido_async(cliente, encabezados):
+    respuesta = cliente.post(
+        "/api/pedidos/",
+        headers=encabezados,
+        json={"mesa": 4, "id_sucursal": 1, "detalles": [{"id_plato": 1, "cantidad": 2}]},
+    )
+
+    assert respuesta.status_code == 200, respuesta.text
+    pedido = respuesta.json()
+    assert pedido["estado"] == "pendiente"
+    assert pedido["total"] == 30
+    assert pedido["detalles"] == [{"id_plato": 1, "cantidad": 2, "precio_unitario": 15, "subtotal": 30}]
+
+    guardado = cliente.get(f"/api/pedidos/{pedido['id_pedido']}", headers=encabezados)
+    assert guardado.status_code == 200
+    assert guardado.json()["total"] == 30
+
+
+def test_preparar_pedido_async_descuenta_inventario(cliente, encabezados, base_datos):
+    pedido = cliente.post(
+        "/api/pedidos/",
+        headers=encabezados,
+        json={"mesa": 5, "id_sucursal": 1, "detalles": [{"id_plato": 1, "cantidad": 3}]},
+    ).json()
+    antes = _inventario(base_datos)
+
+    respuesta = cliente.put(f"/api/pedidos/{pedido['id_pedido']}/estado", headers=encabezados, params={"estado": "preparado"})
+
+    assert respuesta.status_code == 200, respuesta.text
+    assert respuesta.json()["estado"] == "preparado"
+    despues = _inventario(base_datos)
+    # 3 hamburguesas: 600 g de carne (inventario en kg) y 6 panes
+    assert antes[1] - despues[1] == pytest.approx(0.6)
+    assert antes[2] - despues[2] == 6
+
+
+def test_estado_de_pedido_inexistente(cliente, encabezados):
+    respuesta = cliente.put("/api/pedidos/9999/estado", headers=encabezados, params={"estado": "preparado"})
+
+    assert respuesta.status_code == 400
+    assert "no existe" in respuesta.json()["detail"]
+
+
+def _estado(base_datos, id_pedido: int) -> str:
+    db = base_datos.SessionLocal()
+    try:
+        return db.query(modelos.Pedido).get(id_pedido).estado
+    finally:
+        db.close()
+
+
+def test_preparar_pedido_sin_stock_deshace_el_cambio_de_estado(cliente, encabezados, base_datos):
+    pedido = cliente.post(
+        "/api/pedidos/",
+        headers=encabezados,
+        json={"mesa": 6, "id_sucursal": 1, "detalles": [{"id_plato": 1, "cantidad": 1000}]},
+    ).json()
+    antes = _inventario(base_datos)
+
+    respuesta = cliente.put(f"/api/pedidos/{pedido['id_pedido']}/estado", headers=encabezados, params={"estado": "preparado"})
+
+    assert respuesta.status_code == 400
+    assert "No hay suficiente inventario" in respuesta.json()["detail"]
+    assert _estado(base_datos, pedido["id_pedido"]) == "pendiente"
+    assert _inventario(base_datos) == antes
+
+
+def test_conflicto_de_bloqueo_reintenta_la_transaccion_completa(cliente, encabezados, base_datos, monkeypatch):
+    from sqlalchemy.exc import OperationalError
+    from app.facades.inventario_facade import InventarioFacade
+
+    pedido = cliente.post(
+        "/api/pedidos/",
+        headers=encabezados,
+        json={"mesa": 7, "id_sucursal": 1, "detalles": [{"id_plato": 1, "cantidad": 1}]},
+    ).json()
+    antes = _inventario(base_datos)
+    original = InventarioFacade._filas_actualizadas
+    intentos = []
+
+    def con_interbloqueo(self, sentencia, parametros):
+        intentos.append(1)
+        if len(intentos) == 1:
+            raise OperationalError("UPDATE Inventario", {}, Exception(1213, "Deadlock found when trying to get lock"))
+        return original(self, sentencia, parametros)
+
+    monkeypatch.setattr(InventarioFacade, "_filas_actualizadas", con_interbloqueo)
+    respuesta = cliente.put(f"/api/pedidos/{pedido['id_pedido']}/estado", headers=encabezados, params={"estado": "preparado"})
+
+    assert respuesta.status_code == 200, respuesta.text
+    assert len(intentos) == 2
+    assert _estado(base_datos, pedido["id_pedido"]) == "preparado"
+    # El primer intento se deshizo: el inventario se descuenta una sola vez
+    assert antes[2] - _inventario(base_datos)[2] == 2